@@ -1,4 +1,5 @@
 # api/mobile_views.py
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
@@ -62,21 +63,39 @@ class MobileDashboardAPI(APIView):
 
 class MobilePushNotificationAPI(APIView):
     """API для push-уведомлений"""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        """Отправка push-уведомления"""
-        device_token = request.data.get('device_token')
-        message = request.data.get('message')
-        room_id = request.data.get('room_id')
-
-        # Здесь интеграция с Firebase Cloud Messaging или аналогичным сервисом
-        result = send_push_notification(device_token, message)
+        """
+        Поставить push-уведомление в очередь (один токен или device_tokens).
+        Отправляет воркер (manage.py send_push_notifications), ответ - сразу.
+        """
+        from core.services.push import enqueue
+        from .serializers import PushNotificationRequestSerializer
+
+        params = PushNotificationRequestSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        queued = enqueue(data['tokens'], data['message'], room_id=data['room_id'], provider=data['provider'])
 
         return Response({
-            'success': result['success'],
-            'message_id': result.get('message_id'),
+            'success': True,
+            'message_id': queued[0]['id'],
+            'queued': len(queued),
+            'notifications': queued,
             'timestamp': timezone.now().isoformat()
-        })
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def get(self, request):
+        """Статус доставки по ?ids=1,2,3 (без токенов устройств)"""
+        from core.models import PushNotification
+
+        ids = [int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip().isdigit()]
+        notifications = PushNotification.objects.filter(id__in=ids).values(
+            'id', 'status', 'attempts', 'sent_at', 'provider_message_id', 'last_error',
+        )
+        return Response({'notifications': list(notifications)})
 
 
 class VoiceAssistantAPI(APIView):
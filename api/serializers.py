@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from core.models import Room, OccupancyLog, WeatherCache, EnergyLog, Recommendation
+from core.services.push import PROVIDERS
 
 
 class RoomSerializer(serializers.ModelSerializer):
@@ -56,8 +57,24 @@ class EnergyLogSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class PriorityField(serializers.ChoiceField):
+    """Приоритет в API - прежние строки 'low' / 'medium' / 'high', в БД - число"""
+
+    def __init__(self, **kwargs):
+        super().__init__(choices=list(Recommendation.PRIORITY_BY_NAME), **kwargs)
+
+    def to_representation(self, value):
+        return Recommendation.PRIORITY_NAMES.get(value, value)
+
+    def to_internal_value(self, data):
+        if isinstance(data, int) and data in Recommendation.PRIORITY_NAMES:
+            return data
+        return Recommendation.PRIORITY_BY_NAME[super().to_internal_value(data)]
+
+
 class RecommendationSerializer(serializers.ModelSerializer):
     room_name = serializers.CharField(source='room.name', read_only=True)
+    priority = PriorityField(required=False)
 
     class Meta:
         model = Recommendation
@@ -76,4 +93,45 @@ class EnergySavingsSerializer(serializers.Serializer):
     room_id = serializers.IntegerField()
     energy_saved_kwh = serializers.FloatField()
     co2_saved_kg = serializers.FloatField()
-    money_saved = serializers.FloatField()
\ No newline at end of file
+    money_saved = serializers.FloatField()
+
+
+class BulkHeatingSerializer(serializers.Serializer):
+    heating = serializers.BooleanField()
+    room_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    building = serializers.IntegerField(required=False)
+    floor = serializers.IntegerField(required=False)
+    unoccupied = serializers.BooleanField(required=False, default=False)
+    all = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        # Без явного выбора комнат не трогаем всё здание целиком по ошибке
+        if not (data.get('all') or data.get('unoccupied')
+                or any(key in data for key in ('room_ids', 'building', 'floor'))):
+            raise serializers.ValidationError("Specify room_ids, a filter (building, floor, unoccupied) or all=true")
+        return data
+
+
+class PushNotificationRequestSerializer(serializers.Serializer):
+    device_token = serializers.CharField(max_length=255, required=False)
+    device_tokens = serializers.ListField(child=serializers.CharField(max_length=255), required=False,
+                                          allow_empty=False, max_length=10000)
+    message = serializers.CharField()
+    room_id = serializers.PrimaryKeyRelatedField(queryset=Room.objects.all(), required=False, allow_null=True)
+    provider = serializers.ChoiceField(choices=list(PROVIDERS), required=False, default='fcm')
+
+    def validate(self, data):
+        tokens = list(data.get('device_tokens', []))
+        if data.get('device_token'):
+            tokens.insert(0, data['device_token'])
+        if not tokens:
+            raise serializers.ValidationError("Specify device_token or device_tokens")
+        data['tokens'] = tokens
+        room = data.get('room_id')
+        data['room_id'] = room.pk if room else None
+        return data
+
+
+class ApplyRecommendationsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=10000)
+    dispatch = serializers.BooleanField(required=False, default=False)
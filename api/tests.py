@@ -1,3 +1,133 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Building, PushNotification, Recommendation, Room
+
+
+class ApplyRecommendationsAPITests(TestCase):
+    """Пакетное применение рекомендаций: одна транзакция, число запросов не растёт с пакетом"""
+
+    def setUp(self):
+        building = Building.objects.create(name='Main', total_area=10000)
+        self.rooms = Room.objects.bulk_create(
+            Room(name=f'Room {i}', building=building, area=30, wall_material='brick', heating_status=True)
+            for i in range(500)
+        )
+        self.staff = APIClient()
+        self.staff.force_authenticate(get_user_model().objects.create(username='staff', is_staff=True))
+
+    def recommend(self, rooms, savings=1.0):
+        return [r.id for r in Recommendation.objects.bulk_create(
+            Recommendation(room=room, message='Room will be free', recommended_action='Turn off heating now',
+                           estimated_savings=savings)
+            for room in rooms
+        )]
+
+    def apply_many(self, ids):
+        return self.staff.post('/api/recommendations/apply_many/', {'ids': ids}, format='json')
+
+    def test_requires_staff(self):
+        ids = self.recommend(self.rooms[:1])
+        user = APIClient()
+        user.force_authenticate(get_user_model().objects.create(username='user'))
+        self.assertEqual(user.post('/api/recommendations/apply_many/', {'ids': ids}, format='json').status_code, 403)
+        self.assertFalse(Recommendation.objects.get(id=ids[0]).is_applied)
+
+    def test_throughput_does_not_depend_on_batch_size(self):
+        warm, small, large = (self.recommend(rooms) for rooms in (self.rooms[:5], self.rooms[5:15], self.rooms[15:]))
+        self.apply_many(warm)  # первый вызов заводит строки счётчиков impact
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.apply_many(small).json()['applied'], 10)
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as many:
+            response = self.apply_many(large)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(response.json()['applied'], 485)
+        # 485 рекомендаций - одной транзакцией; запросов столько же, сколько на 10
+        # (плюс пакеты bulk_create по лимиту параметров SQLite), а не по запросу на строку
+        self.assertLessEqual(len(many), len(few) + 5)
+        self.assertLess(elapsed, 2.0)
+        self.assertFalse(Room.objects.filter(id__in=[r.id for r in self.rooms], heating_status=True).exists())
+
+    def test_conflicting_recommendations_for_one_room(self):
+        low, high = self.recommend(self.rooms[:1], 1.0) + self.recommend(self.rooms[:1], 5.0)
+        results = {r['id']: r['status'] for r in self.apply_many([low, high]).json()['results']}
+        self.assertEqual(results, {high: 'applied', low: 'superseded'})
+        self.assertEqual(self.apply_many([high]).json()['results'][0]['status'], 'already_applied')
+
+    def test_single_apply_reports_conflict(self):
+        rec_id = self.recommend(self.rooms[:1])[0]
+        self.assertEqual(self.staff.post(f'/api/recommendations/{rec_id}/apply/').status_code, 200)
+        self.assertEqual(self.staff.post(f'/api/recommendations/{rec_id}/apply/').status_code, 409)
+
+
+class HeatingScheduleAPITests(TestCase):
+    """Параметр ?building= графика прогрева проверяется: 400 / 404 вместо 500"""
+
+    def test_building_param(self):
+        building = Building.objects.create(name='Main', total_area=100)
+        Room.objects.create(name='Office', building=building, area=40, wall_material='brick')
+        self.assertEqual(self.client.get('/api/heating-schedule/', {'building': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/heating-schedule/', {'building': building.id + 1}).status_code, 404)
+        self.assertEqual(self.client.get('/api/heating-schedule/', {'building': building.id}).status_code, 200)
+
+
+class MobilePushNotificationAPITests(TestCase):
+    """API push-уведомлений только ставит их в outbox"""
+
+    def setUp(self):
+        user = get_user_model().objects.create(username='mobile')
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+    def test_requires_token(self):
+        response = APIClient().post('/api/mobile/push/', {'device_token': 'x', 'message': 'x'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_unknown_room_is_rejected(self):
+        response = self.api.post('/api/mobile/push/', {'device_token': 'x', 'message': 'x', 'room_id': 999999},
+                                 format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('room_id', response.json())
+
+    def test_enqueues_without_sending(self):
+        payload = {'device_tokens': ['a', 'b', 'a'], 'message': 'Heating off tonight'}
+        response = self.api.post('/api/mobile/push/', payload, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['queued'], 2)
+        # Повтор в том же окне не создаёт дублей
+        self.api.post('/api/mobile/push/', payload, format='json')
+        self.assertEqual(PushNotification.objects.filter(status=PushNotification.PENDING).count(), 2)
+
+    def test_status_hides_device_tokens(self):
+        queued = self.api.post('/api/mobile/push/', {'device_token': 'secret-token', 'message': 'x'},
+                               format='json').json()
+        response = self.api.get('/api/mobile/push/', {'ids': str(queued['message_id'])})
+        notifications = response.json()['notifications']
+        self.assertEqual([n['status'] for n in notifications], [PushNotification.PENDING])
+        self.assertNotIn('device_token', notifications[0])
+        self.assertNotIn('secret-token', response.content.decode())
+
+
+class WeatherForecastAPITests(TestCase):
+    """Горизонт прогноза ?hours= проверяется: 400 на мусор и неположительные, сверху - не больше 48"""
+
+    def forecast(self, hours):
+        return self.client.get('/api/weather/forecast/', {'hours': hours})
+
+    def test_bad_hours_are_rejected(self):
+        for hours in ('abc', '0', '-3'):
+            response = self.forecast(hours)
+            self.assertEqual(response.status_code, 400, hours)
+            self.assertIn('hours', response.json())
 
-# Create your tests here.
+    def test_hours_are_clamped(self):
+        response = self.forecast('12').json()
+        self.assertEqual((response['hours'], len(response['hourly'])), (12, 12))
+        self.assertEqual(self.forecast('500').json()['hours'], 48)
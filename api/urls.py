@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import mobile_views, views
 
 router = DefaultRouter()
 router.register(r'rooms', views.RoomViewSet)
@@ -11,4 +11,7 @@ router.register(r'recommendations', views.RecommendationViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/', views.DashboardAPIView.as_view(), name='api_dashboard'),
+    path('heating-schedule/', views.HeatingScheduleAPIView.as_view(), name='api_heating_schedule'),
+    path('forecast/', views.EnergyForecastAPIView.as_view(), name='api_forecast'),
+    path('mobile/push/', mobile_views.MobilePushNotificationAPI.as_view(), name='api_mobile_push'),
 ]
\ No newline at end of file
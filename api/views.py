@@ -1,35 +1,51 @@
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAll
+from rest_framework.permissions import IsAdminUser
 from django.utils import timezone
-from core.models import Room, OccupancyLog, WeatherCache, EnergyLog, Recommendation
+from datetime import timedelta
+from core.models import Building, Room, OccupancyLog, WeatherCache, EnergyLog, Recommendation
 from .serializers import (
     RoomSerializer, OccupancyLogSerializer, WeatherCacheSerializer,
     EnergyLogSerializer, RecommendationSerializer,
-    ThermalAnalysisSerializer, EnergySavingsSerializer
+    ThermalAnalysisSerializer, EnergySavingsSerializer, BulkHeatingSerializer,
+    ApplyRecommendationsSerializer
 )
 from core.utils import WeatherService, ThermalCalculator, RecommendationEngine
+from core.services.preheat_scheduler import PreheatScheduler
+from core.services.energy_forecast import EnergyForecaster
+from core.services.heating_control import select_rooms, set_heating
+from core.services.recommendations import ALREADY_APPLIED, NOT_FOUND, apply_recommendations
+from core.services.weather import WeatherSeries
+
+FORECAST_DEFAULT_HOURS = 6
+FORECAST_MAX_HOURS = 48
+
+
+def building_param(request):
+    """?building= - id существующего здания или None; не число - 400, нет такого - 404"""
+    building = request.query_params.get('building') or None
+    if building is None:
+        return None
+    try:
+        building = int(building)
+    except ValueError:
+        raise ValidationError({'building': 'must be an integer id'})
+    if not Building.objects.filter(pk=building).exists():
+        raise NotFound('Building not found')
+    return building
 
 
 class RoomViewSet(viewsets.ModelViewSet):
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
-    permission_classes = [AllowAll]  # Разрешить доступ всем
 
     @action(detail=True, methods=['post'])
     def toggle_heating(self, request, pk=None):
         room = self.get_object()
         room.heating_status = not room.heating_status
-        room.save()
-
-        weather = WeatherService.get_weather_data()
-        EnergyLog.objects.create(
-            room=room,
-            temperature_inside=room.target_temperature if room.heating_status else room.comfort_temperature,
-            temperature_outside=weather.temperature,
-            heating_power=room.area * 0.1 if room.heating_status else 0,
-        )
+        set_heating(Room.objects.filter(pk=room.pk), room.heating_status)
 
         return Response({
             'status': 'success',
@@ -37,6 +53,28 @@ class RoomViewSet(viewsets.ModelViewSet):
             'message': f'Heating in {room.name} {"turned on" if room.heating_status else "turned off"}'
         })
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_heating(self, request):
+        """Включить/выключить отопление сразу во многих комнатах (по id или фильтру)"""
+        params = BulkHeatingSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        rooms = select_rooms(
+            room_ids=data.get('room_ids'), building=data.get('building'),
+            floor=data.get('floor'), unoccupied=data['unoccupied'],
+        )
+        results = set_heating(rooms, data['heating'])
+        changed = sum(result['changed'] for result in results)
+
+        return Response({
+            'status': 'success',
+            'heating_status': data['heating'],
+            'rooms': len(results),
+            'changed': changed,
+            'results': results,
+            'message': f'Heating {"turned on" if data["heating"] else "turned off"} in {changed} rooms'
+        })
+
     @action(detail=True, methods=['get'])
     def thermal_analysis(self, request, pk=None):
         room = self.get_object()
@@ -77,7 +115,6 @@ class RoomViewSet(viewsets.ModelViewSet):
 class OccupancyLogViewSet(viewsets.ModelViewSet):
     queryset = OccupancyLog.objects.all()
     serializer_class = OccupancyLogSerializer
-    permission_classes = [AllowAll]
 
     @action(detail=False, methods=['get'])
     def current(self, request):
@@ -106,7 +143,6 @@ class OccupancyLogViewSet(viewsets.ModelViewSet):
 class WeatherViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = WeatherCache.objects.all()
     serializer_class = WeatherCacheSerializer
-    permission_classes = [AllowAll]
 
     @action(detail=False, methods=['get'])
     def current(self, request):
@@ -117,23 +153,31 @@ class WeatherViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'])
     def forecast(self, request):
-        """Получить прогноз погоды (демо-данные)"""
+        """Прогноз на ближайшие часы из ряда WeatherSample (интерполяция по часам)"""
+        try:
+            hours = int(request.query_params.get('hours', FORECAST_DEFAULT_HOURS))
+        except ValueError:
+            raise ValidationError({'hours': 'must be an integer'})
+        if hours < 1:
+            raise ValidationError({'hours': 'must be positive'})
+        hours = min(hours, FORECAST_MAX_HOURS)  # дальше One Call почасового прогноза не даёт
+
         weather_data = WeatherService.get_weather_data()
-        # Демо-прогноз на ближайшие часы
+        now = timezone.now()
+        series = WeatherSeries.load(now, now + timedelta(hours=hours), fallback=weather_data.temperature)
+        _, temperatures = series.hourly(now, hours)
         forecast = {
             'current': {
                 'temperature': weather_data.temperature,
                 'description': weather_data.description,
                 'humidity': weather_data.humidity,
             },
-            'next_6_hours': [
-                {'hour': 'Now', 'temp': weather_data.temperature},
-                {'hour': '+1h', 'temp': weather_data.temperature - 1},
-                {'hour': '+2h', 'temp': weather_data.temperature - 2},
-                {'hour': '+3h', 'temp': weather_data.temperature - 1},
-                {'hour': '+4h', 'temp': weather_data.temperature},
-                {'hour': '+5h', 'temp': weather_data.temperature - 1},
-            ]
+            'hours': hours,
+            'hourly': [
+                {'hour': 'Now' if hour == 0 else f'+{hour}h', 'temp': round(float(temp), 1)}
+                for hour, temp in enumerate(temperatures)
+            ],
+            'samples': len(series),
         }
         return Response(forecast)
 
@@ -141,7 +185,6 @@ class WeatherViewSet(viewsets.ReadOnlyModelViewSet):
 class RecommendationViewSet(viewsets.ModelViewSet):
     queryset = Recommendation.objects.all()
     serializer_class = RecommendationSerializer
-    permission_classes = [AllowAll]
 
     @action(detail=False, methods=['post'])
     def generate(self, request):
@@ -154,18 +197,38 @@ class RecommendationViewSet(viewsets.ModelViewSet):
     def apply(self, request, pk=None):
         """Применить рекомендацию"""
         recommendation = self.get_object()
-        recommendation.is_applied = True
-        recommendation.applied_at = timezone.now()
-        recommendation.save()
+        result = apply_recommendations([recommendation.pk])['results'][0]
+
+        if result['status'] == ALREADY_APPLIED:
+            return Response({
+                'status': result['status'],
+                'message': 'Recommendation was already applied'
+            }, status=status.HTTP_409_CONFLICT)
+        if result['status'] == NOT_FOUND:
+            return Response({
+                'status': result['status'],
+                'message': 'Recommendation no longer exists'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'status': 'success',
+            'message': 'Recommendation applied and heating turned off'
+        })
 
-        # Turn off heating for the room
-        room = recommendation.room
-        room.heating_status = False
-        room.save()
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def apply_many(self, request):
+        """Применить пакет рекомендаций в одной транзакции"""
+        params = ApplyRecommendationsSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        outcome = apply_recommendations(params.validated_data['ids'], dispatch=params.validated_data['dispatch'])
+        applied = sum(result['status'] == 'applied' for result in outcome['results'])
 
         return Response({
             'status': 'success',
-            'message': 'Recommendation applied and heating turned off'
+            'applied': applied,
+            'rooms_turned_off': len(outcome['rooms']),
+            'results': outcome['results'],
+            'devices': outcome['devices'],
+            'message': f'{applied} recommendations applied, heating turned off in {len(outcome["rooms"])} rooms'
         })
 
     @action(detail=False, methods=['get'])
@@ -184,8 +247,6 @@ class RecommendationViewSet(viewsets.ModelViewSet):
 
 
 class DashboardAPIView(generics.RetrieveAPIView):
-    permission_classes = [AllowAll]
-
     def get(self, request):
         """Получить данные для дашборда"""
         rooms = Room.objects.all()
@@ -200,11 +261,12 @@ class DashboardAPIView(generics.RetrieveAPIView):
             is_active=True
         ).values('room').distinct().count()
 
-        recommendations = Recommendation.objects.filter(
+        # Топ-5 очереди целиком из частичного индекса (priority, created_at, estimated_savings)
+        top_savings = list(Recommendation.objects.filter(
             is_applied=False
-        ).order_by('-priority', '-created_at')[:5]
+        ).order_by('-priority', '-created_at').values_list('estimated_savings', flat=True)[:5])
 
-        total_savings = sum(r.estimated_savings for r in recommendations)
+        total_savings = sum(top_savings)
 
         return Response({
             'total_rooms': total_rooms,
@@ -215,7 +277,7 @@ class DashboardAPIView(generics.RetrieveAPIView):
                 'description': weather.description,
                 'humidity': weather.humidity,
             },
-            'recommendations_count': recommendations.count(),
+            'recommendations_count': len(top_savings),
             'total_savings_kwh': total_savings,
             'total_co2_saved_kg': total_savings * 0.4,
             'total_money_saved_rub': total_savings * 5.0,
@@ -225,13 +287,12 @@ class DashboardAPIView(generics.RetrieveAPIView):
 class EnergyLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = EnergyLog.objects.all()
     serializer_class = EnergyLogSerializer
-    permission_classes = [AllowAll]
 
     @action(detail=False, methods=['get'])
     def today(self, request):
         """Потребление энергии за сегодня"""
-        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_logs = self.get_queryset().filter(created_at__gte=today_start)
+        today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        today_logs = self.get_queryset().filter(timestamp__gte=today_start)
         total_energy = sum(log.heating_power * 0.01 for log in today_logs)  # Пример расчёта
         return Response({
             'total_energy_kwh': total_energy,
@@ -241,8 +302,6 @@ class EnergyLogViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 class StatisticsAPIView(generics.RetrieveAPIView):
-    permission_classes = [AllowAll]
-
     def get(self, request):
         """Получить общую статистику"""
         rooms = Room.objects.all()
@@ -260,4 +319,53 @@ class StatisticsAPIView(generics.RetrieveAPIView):
             'daily_potential_savings_rub': potential_savings,
             'daily_co2_savings_kg': potential_savings * 0.08,
             'efficiency_score': min(100, (heated_area / total_area * 100) if total_area > 0 else 0)
-        })
\ No newline at end of file
+        })
+
+
+class HeatingScheduleAPIView(generics.RetrieveAPIView):
+    def get(self, request):
+        """График предварительного прогрева на ближайшие сутки"""
+        rooms = Room.objects.all()
+        building = building_param(request)
+        if building is not None:
+            rooms = rooms.filter(building_id=building)
+
+        weather = WeatherService.get_weather_data()
+        scheduler = PreheatScheduler()
+        series = WeatherSeries.load(scheduler.now, scheduler.now + scheduler.horizon, fallback=weather.temperature)
+        schedule = scheduler.build(rooms, series)
+
+        return Response({
+            'generated_at': scheduler.now.isoformat(),
+            'horizon_hours': scheduler.horizon.total_seconds() / 3600,
+            'outside_temperature': weather.temperature,
+            'fields': ['room_id', 'start', 'stop'],
+            'schedule': PreheatScheduler.to_payload(schedule),
+        })
+
+
+class EnergyForecastAPIView(generics.RetrieveAPIView):
+    def get(self, request):
+        """Почасовой прогноз потребления по комнатам (24 часа или 7 дней)"""
+        hours = 168 if request.query_params.get('period') == 'week' else 24
+        model = EnergyForecaster.get_model()
+        if model is None:
+            return Response({'detail': 'Forecast model is not fitted yet (manage.py fit_energy_forecast)'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        weather = WeatherService.get_weather_data()
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        series = WeatherSeries.load(start, start + timedelta(hours=hours), fallback=weather.temperature)
+        _, outside = series.hourly(start, hours)
+        hourly = EnergyForecaster.forecast(model, start, hours, outside)
+
+        return Response({
+            'start': start.isoformat(),
+            'hours': hours,
+            'fitted_at': model['fitted_at'].isoformat(),
+            'hourly_outside_temperature': outside.round(1).tolist(),
+            'total_kwh': float(hourly.sum()),
+            'hourly_total_kwh': hourly.sum(axis=0).round(2).tolist(),
+            'room_ids': model['room_ids'].tolist(),
+            'room_total_kwh': hourly.sum(axis=1).round(2).tolist(),
+        })
@@ -0,0 +1,174 @@
+# benchmarks/_common.py
+import os
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'thermasense_project.settings')
+django.setup()
+
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database():
+    """Отдельная тестовая БД, чтобы не трогать рабочие данные"""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def timed(label, results=None, **extra):
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    row = {'name': label, 'seconds': round(elapsed, 4), **extra}
+    if results is not None:
+        results.append(row)
+    details = ' '.join(f"{k}={v}" for k, v in extra.items())
+    print(f"  {label:<45} {elapsed * 1000:10.1f} ms {details}")
+
+
+def seed_campus(buildings=1, rooms_per_building=100):
+    """Синтетический кампус: здания и комнаты через bulk_create"""
+    from core.models import Building, Room
+
+    materials = [choice[0] for choice in Room.WALL_MATERIAL_CHOICES]
+    created = Building.objects.bulk_create(
+        Building(name=f'Building {b}', total_area=rooms_per_building * 60) for b in range(buildings)
+    )
+    created = list(Building.objects.order_by('id')[:buildings]) if created[0].pk is None else created
+    Room.objects.bulk_create(
+        (Room(name=f'{b.name} / Room {i}', building=b, area=15 + (i * 37) % 135,
+              wall_material=materials[i % len(materials)], heating_status=i % 3 != 0,
+              target_temperature=22.0)
+         for b in created for i in range(rooms_per_building)),
+        batch_size=5000,
+    )
+    return list(Room.objects.order_by('id').values_list('id', 'area'))
+
+
+def seed_energy_logs(rooms, rows, days=30, batch_size=50000, seed=0):
+    """
+    rows строк EnergyLog, равномерно по комнатам и последним days дням.
+    Пишем сырым executemany - bulk_create на десятках миллионов строк слишком медленный.
+    """
+    import numpy as np
+    from django.utils import timezone
+    from core.models import EnergyLog
+
+    rng = np.random.default_rng(seed)
+    table = EnergyLog._meta.db_table
+    room_ids = np.array([r[0] for r in rooms])
+    areas = np.array([r[1] for r in rooms], dtype=np.float64)
+    now = timezone.now()
+    now_ts = now.timestamp()
+    sql = (f"INSERT INTO {table} (room_id, timestamp, temperature_inside, temperature_outside, "
+           f"heating_power, co2_saved) VALUES (%s, %s, %s, %s, %s, %s)")
+
+    written = 0
+    with connection.cursor() as cursor:
+        while written < rows:
+            n = min(batch_size, rows - written)
+            pick = rng.integers(0, len(room_ids), n)
+            ts = now_ts - rng.uniform(0, days * 86400, n)
+            heating = rng.random(n) < 0.6
+            power = np.where(heating, areas[pick] * 0.1 * rng.uniform(0.8, 1.2, n), 0.0)
+            outside = rng.normal(-5, 4, n)
+            stamps = [now.fromtimestamp(t, tz=now.tzinfo) for t in ts]
+            cursor.executemany(sql, [
+                (int(room_ids[pick[k]]), stamps[k], 22.0 if heating[k] else 18.0,
+                 float(outside[k]), float(power[k]), 0.0)
+                for k in range(n)
+            ])
+            written += n
+    return written
+
+
+def seed_occupancy(rooms, rows, days=14, seed=0):
+    """rows бронирований по комнатам: от days дней назад до суток вперёд, по 1-3 часа"""
+    import numpy as np
+    from django.utils import timezone
+    from core.models import OccupancyLog
+
+    rng = np.random.default_rng(seed)
+    room_ids = [r[0] for r in rooms]
+    now = timezone.now()
+    starts = rng.uniform(-days * 24, 24, rows)
+    lengths = rng.integers(1, 4, rows)
+    pick = rng.integers(0, len(room_ids), rows)
+    OccupancyLog.objects.bulk_create(
+        (OccupancyLog(room_id=room_ids[pick[k]], start_time=now + timedelta(hours=float(starts[k])),
+                      end_time=now + timedelta(hours=float(starts[k] + lengths[k])))
+         for k in range(rows)),
+        batch_size=5000,
+    )
+    return rows
+
+
+def staff_client(username='bench-staff'):
+    """Client от имени сотрудника: изменяющие запросы API требуют входа"""
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+
+    user, _ = get_user_model().objects.get_or_create(username=username, defaults={'is_staff': True})
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(user)
+    return client
+
+
+@contextmanager
+def stub_server(respond, with_body=False):
+    """
+    Локальный HTTP-сервер для проверки внешних интеграций.
+    respond(path, query) -> (status, dict | bytes); возвращает базовый URL.
+    with_body=True - respond(path, query, body) с телом запроса (JSON, если разбирается).
+    """
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive для пулов соединений
+        disable_nagle_algorithm = True  # иначе заголовки и тело ответа ждут delayed ACK (~40 мс)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            # тело читаем всегда, иначе оно останется в keep-alive соединении
+            raw_request = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if with_body:
+                try:
+                    request_body = json.loads(raw_request) if raw_request else None
+                except ValueError:
+                    request_body = raw_request
+                status, body = respond(url.path, parse_qs(url.query), request_body)
+            else:
+                status, body = respond(url.path, parse_qs(url.query))
+            raw = body if isinstance(body, bytes) else json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        do_POST = do_GET
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
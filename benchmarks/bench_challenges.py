@@ -0,0 +1,111 @@
+# benchmarks/bench_challenges.py
+# Запуск: python -m benchmarks.bench_challenges --rooms 200 --users 5000 --challenges 2000 --logs 200000
+import argparse
+from datetime import timedelta
+
+import numpy as np
+
+from ._common import benchmark_database, seed_campus, seed_energy_logs, timed
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.models import ChallengeProgress, ChallengeWindow, EnergyChallenge, Leaderboard, OccupancyLog, UserAchievement
+from core.services.challenges import ChallengeEvaluator
+from core.services.leaderboard import achievement_energy
+
+
+def seed_bookings(rooms, users, days, rng):
+    """Комнаты заняты часовыми бронированиями случайных пользователей"""
+    now = timezone.now()
+    table = OccupancyLog._meta.db_table
+    start = now - timedelta(days=days)
+    hours = days * 24 + 1
+    rows = []
+    for room_id, _ in rooms:
+        owners = rng.integers(1, users + 1, hours)
+        for h in range(hours):
+            begin = start + timedelta(hours=h)
+            rows.append((room_id, int(owners[h]), begin, begin + timedelta(minutes=59, seconds=59), now))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} (room_id, user_id, start_time, end_time, purpose, is_active, created_at) "
+            f"VALUES (%s, %s, %s, %s, '', 1, %s)", rows,
+        )
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--challenges', type=int, default=2000)
+    parser.add_argument('--logs', type=int, default=200000)
+    parser.add_argument('--new-logs', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    with benchmark_database():
+        print(f"Challenge evaluator, {args.challenges} challenges, {args.users} users, {args.logs} logs:")
+        with timed('seed'):
+            rooms = seed_campus(5, args.rooms // 5)
+            User.objects.bulk_create(User(username=f'user{i}') for i in range(args.users))
+            seed_bookings(rooms, args.users, args.days, rng)
+            now = timezone.now()
+            # ~3.3 kWh экономии на лог; цели - от одной до четырёх ожидаемых сумм за окно
+            per_user_day = args.logs * 3.3 / (args.users * args.days)
+            # Окна: неделя/3 дня/сутки с разными началами - многие челленджи делят окно
+            EnergyChallenge.objects.bulk_create(
+                EnergyChallenge(
+                    name=f'Challenge {i}', description='',
+                    target_savings=float(rng.uniform(1, 4) * per_user_day * length),
+                    duration_days=length, start_date=now - timedelta(days=offset), reward_points=100,
+                    end_date=now - timedelta(days=offset) + timedelta(days=length),
+                )
+                for i in range(args.challenges)
+                for offset, length in [[(7, 7), (3, 3), (1, 1), (5, 7)][i % 4]]
+            )
+            seed_energy_logs(rooms, args.logs, args.days, seed=1)
+
+        evaluator = ChallengeEvaluator()
+        with timed('cold start (history backfill per window)') as _:
+            summary = evaluator.run()
+        print(f"    {summary}")
+
+        with timed('idle run (no new events)'):
+            summary = evaluator.run()
+        print(f"    {summary}")
+
+        seed_energy_logs(rooms, args.new_logs, 0.04, seed=2)  # последний час
+        with timed('incremental run', new_logs=args.new_logs):
+            summary = evaluator.run()
+        print(f"    {summary}")
+
+        # Новый процесс (разовый manage.py evaluate_challenges) продолжает с водяного знака в БД
+        seed_energy_logs(rooms, args.new_logs, 0.04, seed=3)
+        with timed('incremental run, new process', new_logs=args.new_logs):
+            summary = ChallengeEvaluator().run()
+        print(f"    {summary}")
+        assert summary['events'] == args.new_logs, summary
+
+        # Награды несут прирост kWh: сумма по достижениям = зачтённое в окнах, без повторов по челленджам
+        credited = sum(achievement_energy(a) for a in UserAchievement.objects.only('data'))
+        expected = ChallengeProgress.objects.aggregate(total=Sum('credited_kwh'))['total'] or 0.0
+        leaders = Leaderboard.objects.filter(period='all_time').aggregate(total=Sum('energy_saved'))['total'] or 0.0
+        print(f"  credited to awards: {credited:.1f} kWh (windows {expected:.1f}, all-time leaderboard {leaders:.1f})")
+        assert credited > 0 and abs(credited - expected) < 1e-3 * max(expected, 1)
+        assert abs(leaders - credited) < 1e-3 * max(credited, 1)
+
+        awarded = UserAchievement.objects.count()
+        ChallengeWindow.objects.all().delete()  # сброс состояния: полный пересчёт и повторная выдача
+        with timed('replay from scratch (idempotent awards)'):
+            summary = ChallengeEvaluator().run()
+        print(f"    {summary}  achievements total={UserAchievement.objects.count()}")
+        assert UserAchievement.objects.count() == awarded
+
+
+if __name__ == '__main__':
+    main()
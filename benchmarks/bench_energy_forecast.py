@@ -0,0 +1,65 @@
+# benchmarks/bench_energy_forecast.py
+# Запуск: python -m benchmarks.bench_energy_forecast --rooms 5000 --days 730
+import argparse
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+
+from ._common import timed
+
+from django.core.files.storage import FileSystemStorage
+
+from core.services.energy_forecast import EnergyForecaster, ModelStore, fit_profiles, hour_of_week
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    hours = args.days * 24
+    ts = 1_700_000_000 + np.arange(hours) * 3600.0
+    how = hour_of_week(ts)
+    outside = -5 + 10 * np.sin(2 * np.pi * np.arange(hours) / (24 * 365)) + rng.normal(0, 2, hours)
+    office = ((how % 24 >= 8) & (how % 24 < 18) & (how < 120)).astype(np.float64)
+
+    coef = np.zeros((args.rooms, 169))
+    print(f"Energy forecast, {args.rooms} rooms x {hours} hourly rows = {args.rooms * hours:,} rows:")
+    with timed('fit (synthetic arrays, chunked)'):
+        for start in range(0, args.rooms, args.chunk_size):
+            n = min(args.chunk_size, args.rooms - start)
+            room_index = np.repeat(np.arange(n), hours)
+            base = rng.uniform(2, 15, n)
+            energy = (np.repeat(base, hours) * np.tile(office, n)
+                      + 0.3 * np.tile(np.maximum(0, 18 - outside), n) + rng.normal(0, 0.5, n * hours))
+            coef[start:start + n], _, _ = fit_profiles(
+                room_index, np.tile(how, n), np.tile(outside, n), energy, n
+            )
+
+    start = datetime.now(dt_timezone.utc)
+    model = {
+        'room_ids': np.arange(1, args.rooms + 1), 'coef': coef, 'wape': np.zeros(args.rooms),
+        'last_day_ratio': np.ones(args.rooms), 'training_days': args.days, 'utc_offset': 0,
+        'fitted_at': start, 'rows': args.rooms * hours, 'fit_seconds': 0.0,
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        store = ModelStore(storage=FileSystemStorage(location=directory))
+        with timed('store model (.npz)'):
+            store.save(model)
+        with timed('load stored model (first request)'):
+            loaded = store.load()
+        with timed('load stored model (unchanged file)'):
+            store.load()
+        assert np.array_equal(loaded['coef'], coef) and loaded['fitted_at'] == start
+    with timed('forecast next 24h (one matmul)'):
+        EnergyForecaster.forecast(model, start, 24, -5.0)
+    with timed('forecast next 7d (one matmul)'):
+        EnergyForecaster.forecast(model, start, 168, np.full(168, -5.0))
+
+
+if __name__ == '__main__':
+    main()
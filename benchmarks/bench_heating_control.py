@@ -0,0 +1,53 @@
+# benchmarks/bench_heating_control.py
+# Запуск: python -m benchmarks.bench_heating_control --rooms 5000
+import argparse
+
+from ._common import benchmark_database, seed_campus, staff_client, timed
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+
+from core.models import EnergyLog, Room
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=5000)
+    parser.add_argument('--sample', type=int, default=500, help='Rooms toggled one request at a time')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    with benchmark_database():
+        seed_campus(buildings=5, rooms_per_building=args.rooms // 5)
+        Room.objects.update(heating_status=False)
+        client = staff_client()
+        room_ids = list(Room.objects.order_by('id').values_list('id', flat=True))
+
+        sample = room_ids[:args.sample]
+        results = []
+        with CaptureQueriesContext(connection) as queries:
+            with timed(f'toggle_heating x{len(sample)} (one request per room)', results):
+                for room_id in sample:
+                    client.post(f'/api/rooms/{room_id}/toggle_heating/')
+        per_room = results[-1]['seconds'] / len(sample)
+        print(f"    {len(queries) / len(sample):.1f} queries per room, "
+              f"extrapolated to {len(room_ids)} rooms: {per_room * len(room_ids):.1f} s")
+
+        Room.objects.update(heating_status=False)
+        before = EnergyLog.objects.count()
+        with CaptureQueriesContext(connection) as queries:
+            with timed(f'bulk_heating, {len(room_ids)} rooms in one call', results):
+                response = client.post('/api/rooms/bulk_heating/', {'heating': True, 'all': True},
+                                       content_type='application/json')
+        payload = response.json()
+        print(f"    {len(queries)} queries, changed {payload['changed']}, "
+              f"logs written {EnergyLog.objects.count() - before}")
+        print(f"  speedup vs per-room requests: {per_room * len(room_ids) / results[-1]['seconds']:.0f}x")
+
+        with timed('bulk_heating, unoccupied rooms of one building'):
+            client.post('/api/rooms/bulk_heating/', {'heating': False, 'unoccupied': True, 'building': 1},
+                        content_type='application/json')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_http_client.py
+# Запуск: python -m benchmarks.bench_http_client
+# Локальная заглушка: новое соединение на каждый запрос против пула keep-alive,
+# ограничение соединений на хост, размыкатель и метрики интеграции.
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ._common import stub_server, timed
+
+import requests
+
+from core.services.http_client import (
+    CircuitOpenError, OutboundClient, integration_config, metrics_snapshot, get_client, reset_clients,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+
+    state = {'fail': False, 'calls': 0, 'active': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    def respond(path, query):
+        with lock:
+            state['calls'] += 1
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+        try:
+            if path == '/slow':
+                time.sleep(0.02)
+            if state['fail']:
+                return 503, {'message': 'down'}
+            return 200, {'ok': True}
+        finally:
+            with lock:
+                state['active'] -= 1
+
+    with stub_server(respond) as url:
+        with timed(f'bare requests.get x{args.calls} (new connection each)'):
+            for _ in range(args.calls):
+                requests.get(f"{url}/ping", timeout=5).json()
+
+        client = get_client('stub')
+        with timed(f'pooled client x{args.calls} (keep-alive)'):
+            for _ in range(args.calls):
+                client.get(f"{url}/ping").json()
+
+        limited = OutboundClient('stub-limited', {**integration_config('stub'), 'pool_maxsize': 4})
+        state['peak'] = 0
+        with timed(f'{args.threads} threads, pool_maxsize=4, 20 ms upstream'):
+            with ThreadPoolExecutor(args.threads) as pool:
+                list(pool.map(lambda _: limited.get(f"{url}/slow").status_code, range(args.threads * 8)))
+        print(f"  peak concurrent upstream requests: {state['peak']} (limit 4)")
+        assert state['peak'] <= 4
+
+        breaker = OutboundClient('stub-breaker', {**integration_config('stub'), 'failure_threshold': 3,
+                                                  'reset_timeout': 0.2})
+        state.update(fail=True, calls=0)
+        rejected = 0
+        for _ in range(20):
+            try:
+                breaker.get(f"{url}/ping")
+            except CircuitOpenError:
+                rejected += 1
+        print(f"  upstream down: 20 calls -> {state['calls']} reached the server, {rejected} rejected "
+              f"without I/O, circuit={breaker.breaker.state}")
+        assert state['calls'] == 3 and rejected == 17
+
+        state.update(fail=False, calls=0)
+        time.sleep(0.25)
+        status = breaker.get(f"{url}/ping").status_code
+        print(f"  after reset_timeout: probe status={status}, circuit={breaker.breaker.state}")
+        assert breaker.breaker.state == 'closed'
+
+        metrics = metrics_snapshot()['stub']
+        print(f"  metrics 'stub': requests={metrics['requests']} errors={metrics['errors']} "
+              f"p50<={client.metrics.quantile(0.5)}s p99<={client.metrics.quantile(0.99)}s")
+        breaker_metrics = breaker.metrics.snapshot()
+        print(f"  metrics 'stub-breaker': requests={breaker_metrics['requests']} errors={breaker_metrics['errors']}")
+        reset_clients()
+
+
+if __name__ == '__main__':
+    main()
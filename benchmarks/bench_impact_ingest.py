@@ -0,0 +1,69 @@
+# benchmarks/bench_impact_ingest.py
+# Запуск: python -m benchmarks.bench_impact_ingest --rooms 500 --ticks 5
+# Потоковая запись EnergyLog по одному (post_save): счётчики impact на каждый лог
+# против пакета batched() на тик; попадания в кэш страницы impact между тиками.
+import argparse
+import random
+
+from ._common import benchmark_database, seed_campus, timed
+
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+from core.models import EnergyLog
+from core.services.impact import ImpactService, batched, reconcile
+
+
+def tick(room_ids, rng):
+    now = timezone.now()
+    for room_id in room_ids:
+        heating = rng.random() < 0.6
+        EnergyLog.objects.create(room_id=room_id, timestamp=now, temperature_inside=22.0 if heating else 18.0,
+                                 temperature_outside=-5.0, heating_power=5.0 if heating else 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--ticks', type=int, default=5)
+    parser.add_argument('--page-views', type=int, default=20, help='Impact page views between ticks')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    rng = random.Random(1)
+    with benchmark_database():
+        room_ids = [room_id for room_id, _ in seed_campus(buildings=5, rooms_per_building=args.rooms // 5)]
+        for label, batch in (('per log (post_save)', False), ('batched() per tick', True)):
+            executed, computed = [0], [0]
+
+            def count(execute, sql, params, many, context):
+                executed[0] += 1
+                return execute(sql, params, many, context)
+
+            def recomputed(execute, sql, params, many, context):
+                # промах кэша - агрегат по месяцам (GROUP BY)
+                computed[0] += 'GROUP BY' in sql
+                return execute(sql, params, many, context)
+
+            with timed(f'{args.ticks} ticks x {len(room_ids)} logs, {label}'):
+                for _ in range(args.ticks):
+                    with connection.execute_wrapper(count):
+                        if batch:
+                            with transaction.atomic(), batched():
+                                tick(room_ids, rng)
+                        else:
+                            tick(room_ids, rng)
+                    with connection.execute_wrapper(recomputed):
+                        for _ in range(args.page_views):
+                            ImpactService().build()
+            print(f"    {executed[0] / (args.ticks * len(room_ids)):.1f} queries per log, "
+                  f"impact page recomputed {computed[0]} of {args.ticks * args.page_views} views")
+
+        drift = reconcile()
+        print(f"  counters vs raw data: {len(drift)} mismatches")
+        assert not drift, drift[:3]
+
+
+if __name__ == '__main__':
+    main()
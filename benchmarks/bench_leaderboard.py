@@ -0,0 +1,106 @@
+# benchmarks/bench_leaderboard.py
+# Запуск: python -m benchmarks.bench_leaderboard --users 1000000 --updates 10000
+import argparse
+import json
+import random
+
+from ._common import benchmark_database, timed
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import EnergyChallenge, Leaderboard, UserAchievement
+from core.services.leaderboard import ENERGY_KEY, LeaderboardEngine, RankIndex
+
+
+def seed_users(n, batch_size=50000):
+    """Пользователи и по одному достижению на каждого - сырым executemany"""
+    now = timezone.now()
+    user_table = User._meta.db_table
+    achievement_table = UserAchievement._meta.db_table
+    challenge = EnergyChallenge.objects.create(
+        name='Benchmark', description='', target_savings=0, duration_days=1,
+        start_date=now, end_date=now, reward_points=0,
+    )
+    rng = random.Random(1)
+    with connection.cursor() as cursor:
+        for start in range(0, n, batch_size):
+            ids = range(start + 1, min(n, start + batch_size) + 1)
+            cursor.executemany(
+                f"INSERT INTO {user_table} (id, password, is_superuser, username, first_name, last_name, "
+                f"email, is_staff, is_active, date_joined) VALUES (%s, '', 0, %s, '', '', '', 0, 1, %s)",
+                [(i, f'user{i}', now) for i in ids],
+            )
+            cursor.executemany(
+                f"INSERT INTO {achievement_table} (user_id, challenge_id, achievement_type, points_earned, "
+                f"earned_at, data) VALUES (%s, %s, 'energy_saver', %s, %s, %s)",
+                [(i, challenge.id, rng.randint(0, 5000), now, json.dumps({ENERGY_KEY: round(rng.random() * 50, 2)}))
+                 for i in ids],
+            )
+    return challenge
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--updates', type=int, default=10000, help='новых достижений')
+    parser.add_argument('--batch', type=int, default=100, help='достижений за вызов record')
+    args = parser.parse_args()
+
+    with benchmark_database():
+        print(f"Leaderboard, {args.users} users:")
+        with timed('seed users + achievements'):
+            challenge = seed_users(args.users)
+
+        engine = LeaderboardEngine()
+        with timed('rebuild all_time (aggregate + bulk_create)'):
+            engine.rebuild('all_time')
+
+        rng = random.Random(2)
+        achievements = [
+            UserAchievement(user_id=rng.randint(1, args.users), challenge=challenge,
+                            achievement_type='week_hero', points_earned=rng.randint(1, 50),
+                            earned_at=timezone.now(), data={ENERGY_KEY: 1.5})
+            for _ in range(args.updates)
+        ]
+        with transaction.atomic():
+            board = engine.claim('all_time')
+            with timed('incremental apply', updates=args.updates, batch=args.batch):
+                for i in range(0, args.updates, args.batch):
+                    engine._apply(board, achievements[i:i + args.batch])
+            with timed('flush rank shifts'):
+                engine.flush(board)
+
+        single = achievements[:100]
+        with timed('record per achievement x100 (all periods)'):
+            for achievement in single:
+                engine.record([achievement])
+        board = engine.board('all_time')
+
+        # Другой процесс (свой индекс в памяти) пишет в ту же таблицу - первый должен это увидеть
+        other = LeaderboardEngine()
+        other.record(achievements[100:200])
+        with timed('record after another writer (index reload)'):
+            engine.record(achievements[200:300])
+        board = engine.board('all_time')
+
+        lookups = [rng.randint(1, args.users) for _ in range(100000)]
+        with timed('rank lookup x100k (RankIndex, O(log n))'):
+            for user_id in lookups:
+                board.index.rank(user_id)
+        with timed('rank lookup x1k (DB, unique index)'):
+            for user_id in lookups[:1000]:
+                engine.rank('all_time', user_id)
+        with timed('top 5 (DB, period/rank index)'):
+            engine.top('all_time', 5)
+
+        with timed('verify ranks vs full re-sort'):
+            expected = dict(RankIndex(board.index.points).ranks())
+            stored = dict(Leaderboard.objects.filter(period='all_time').values_list('user_id', 'rank'))
+        mismatched = sum(expected[u] != stored.get(u) for u in expected)
+        print(f"  ranks mismatched after incremental updates: {mismatched}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_log_archive.py
+# Запуск: python -m benchmarks.bench_log_archive --rows 20000000 (по умолчанию 1M для локального прогона)
+import argparse
+import os
+import tempfile
+from datetime import timedelta
+
+from ._common import benchmark_database, seed_campus, seed_energy_logs, timed
+
+import numpy as np
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core.models import EnergyLog
+from core.services.log_archive import ColumnarArchive
+from core.services.retention import local_midnight
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=90)
+    args = parser.parse_args()
+
+    with benchmark_database(), tempfile.TemporaryDirectory() as root:
+        rooms = seed_campus(buildings=4, rooms_per_building=args.rooms // 4)
+        with timed('seed EnergyLog', rows=args.rows):
+            seed_energy_logs(rooms, args.rows, days=args.days)
+
+        archive = ColumnarArchive(root)
+        end = local_midnight(timezone.localdate())
+        start = end - timedelta(days=args.days + 1)
+        middle = end - timedelta(days=args.days // 2)
+        with timed('export (2 appended segments)'):
+            archive.append(start, middle)
+            archive.append(middle, end)
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+        print(f"  archive size: {size / 2**20:.1f} MiB ({size / max(args.rows, 1):.1f} bytes/row)")
+        with timed('verify checksums'):
+            assert not archive.verify()
+
+        since, until = end - timedelta(days=30), end - timedelta(days=3)
+        with timed('ORM: per-room heating sums, 27 days'):
+            expected = {
+                row['room_id']: (row['total'], row['n'])
+                for row in EnergyLog.objects.filter(timestamp__gte=since, timestamp__lt=until)
+                .values('room_id').annotate(total=Sum('heating_power'), n=Count('id')).order_by()
+            }
+        with timed('archive: per-room heating sums, 27 days'):
+            sums = ColumnarArchive(root).range_sums(since, until)
+        drift = max(abs(sums[r][0] - expected[r][0]) for r in expected)
+        counts = sum(sums[r][1] != expected[r][1] for r in expected)
+        print(f"  max sum drift (float32 storage): {drift:.4f} kW, count mismatches: {counts}")
+
+        room_subset = [r[0] for r in rooms[:10]]
+        with timed('archive: 10 rooms, 27 days'):
+            ColumnarArchive(root).range_sums(since, until, room_ids=room_subset)
+        with timed('ORM: full scan into numpy'):
+            rows = list(EnergyLog.objects.values_list('room_id', 'heating_power'))
+            np.array(rows)
+        with timed('archive: full scan (memmap)'):
+            total = sum(float(columns['heating_power'].sum(dtype=np.float64))
+                        for _, _, columns in ColumnarArchive(root).scan(start, end, ('heating_power',)))
+        print(f"  scanned heating total: {total:,.0f}")
+
+
+if __name__ == '__main__':
+    main()
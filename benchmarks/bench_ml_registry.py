@@ -0,0 +1,56 @@
+# benchmarks/bench_ml_registry.py
+# Запуск: python -m benchmarks.bench_ml_registry --rooms 10000
+import argparse
+
+from ._common import benchmark_database, timed
+
+from core.models import Building, Room, OccupancyPredictionModel, WeatherCache
+from core.services.advanced_thermal_calculator import AdvancedThermalCalculator
+from core.services.model_registry import ModelRegistry, LinearModel
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=10000)
+    parser.add_argument('--trained', type=float, default=0.5,
+                        help='доля комнат с собственной моделью')
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.core.files.base import ContentFile
+
+        building = Building.objects.create(name='Bench', total_area=args.rooms * 50)
+        Room.objects.bulk_create(
+            Room(name=f'Room {i}', building=building, area=20 + i % 80,
+                 wall_material='brick')
+            for i in range(args.rooms)
+        )
+        rooms = list(Room.objects.all())
+
+        for room in rooms[:int(len(rooms) * args.trained)]:
+            model = LinearModel([0.4, -2.0, 14.0], 25.0 + room.id % 7)
+            record = OccupancyPredictionModel(
+                room=room, model_name=AdvancedThermalCalculator.COOLDOWN_MODEL_NAME
+            )
+            record.model_file.save(f'bench_{room.id}.npz', ContentFile(model.dumps()), save=False)
+            record.save()
+
+        weather = WeatherCache(temperature=-5.0, description='Bench')
+        calculator = AdvancedThermalCalculator(models=ModelRegistry(max_size=args.rooms))
+
+        print(f"ML cooldown predictions, {args.rooms} rooms:")
+        with timed('per-room (cold cache)'):
+            for room in rooms:
+                calculator._predict_with_ml(room, weather)
+        with timed('per-room (warm cache)'):
+            for room in rooms:
+                calculator._predict_with_ml(room, weather)
+        with timed('batched predict_cooldown_many (warm cache)'):
+            calculator.predict_cooldown_many(rooms, weather)
+
+        for record in OccupancyPredictionModel.objects.all():
+            record.model_file.delete(save=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_perf_middleware.py
+# Запуск: python -m benchmarks.bench_perf_middleware
+# Накладные расходы PerformanceMiddleware: одни и те же запросы с ним и без него,
+# по очереди, чтобы прогрев и шум делились поровну. Цель - меньше 2%.
+import argparse
+import logging
+import statistics
+import time
+
+from ._common import benchmark_database, seed_campus, seed_energy_logs
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import setup_test_environment
+
+from core.middleware import PerformanceMiddleware, reset_metrics, views_snapshot
+from core.utils import RecommendationEngine
+
+ENDPOINTS = ['/api/rooms/', '/api/dashboard/', '/api/recommendations/', '/dashboard/', '/api/weather/current/']
+MIDDLEWARE_OFF = [m for m in settings.MIDDLEWARE if m != 'core.middleware.PerformanceMiddleware']
+
+
+def paired_medians(on, off, path, budget):
+    """Запросы с middleware и без чередуются по одному; медиана каждого режима, секунды"""
+    samples = {'on': [], 'off': []}
+    deadline = time.perf_counter() + budget
+    while time.perf_counter() < deadline or len(samples['on']) < 10:
+        for mode, client in (('on', on), ('off', off)) if len(samples['on']) % 2 else (('off', off), ('on', on)):
+            start = time.perf_counter()
+            response = client.get(path)
+            samples[mode].append(time.perf_counter() - start)
+            assert response.status_code == 200, (path, response.status_code)
+    return {mode: statistics.median(values) for mode, values in samples.items()}, len(samples['on'])
+
+
+def fixed_cost(count=20000):
+    """Собственная цена middleware на запрос: тривиальный view с ним и без него, микросекунды"""
+    request = RequestFactory().get('/bench/')
+    view = lambda request: HttpResponse('ok')  # noqa: E731
+    wrapped = PerformanceMiddleware(view)
+    timings = {}
+    for name, handler in (('bare', view), ('middleware', wrapped)) * 2:
+        start = time.perf_counter()
+        for _ in range(count):
+            handler(request)
+        timings[name] = (time.perf_counter() - start) / count * 1e6
+    return timings['middleware'] - timings['bare']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=100)
+    parser.add_argument('--logs', type=int, default=20000)
+    parser.add_argument('--seconds', type=float, default=15, help='Time budget per endpoint')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    settings.DEBUG = False  # как в продакшене: без connection.queries
+    logging.getLogger('thermasense.slow_requests').setLevel(logging.ERROR)
+
+    with benchmark_database():
+        rooms = seed_campus(buildings=2, rooms_per_building=args.rooms // 2)
+        seed_energy_logs(rooms, args.logs, days=7)
+        RecommendationEngine.generate_recommendations()
+
+        with override_settings(MIDDLEWARE=MIDDLEWARE_OFF):
+            off = Client(HTTP_HOST='localhost')
+            off.get('/')  # цепочка middleware собирается при первом запросе
+        on = Client(HTTP_HOST='localhost')
+        on.get('/')
+
+        response = on.get('/dashboard/')
+        print(f"  Server-Timing: {response['Server-Timing']}")
+
+        print(f"  middleware fixed cost: {fixed_cost():.1f} µs per request (+ ~1 µs per SQL query)")
+        totals = {'off': 0.0, 'on': 0.0}
+        print(f"  {'endpoint':<28}{'off, ms':>10}{'on, ms':>10}{'overhead':>10}{'pairs':>8}")
+        for path in ENDPOINTS:
+            medians, pairs = paired_medians(on, off, path, args.seconds)
+            for mode in totals:
+                totals[mode] += medians[mode]
+            overhead = (medians['on'] - medians['off']) / medians['off'] * 100
+            print(f"  {path:<28}{medians['off'] * 1000:10.2f}{medians['on'] * 1000:10.2f}{overhead:9.1f}%{pairs:8}")
+        overall = (totals['on'] - totals['off']) / totals['off'] * 100
+        print(f"  overall overhead: {overall:.2f}% (target < 2%)")
+
+        reset_metrics()
+        for path in ENDPOINTS:
+            on.get(path)
+        for view, metrics in sorted(views_snapshot().items()):
+            print(f"  {view:<40} queries={metrics.db_queries:<5} duplicates={metrics.duplicate_queries:<4} "
+                  f"cache hits/misses={metrics.cache_hits}/{metrics.cache_misses}")
+        text = on.get('/metrics').content.decode()
+        print(f"  /metrics: {len(text.splitlines())} lines, e.g. "
+              f"{next(line for line in text.splitlines() if line.startswith('thermasense_db_queries_total'))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# benchmarks/bench_preheat_scheduler.py
+# Запуск: python -m benchmarks.bench_preheat_scheduler --rooms 10000 --bookings 100
+import argparse
+
+import numpy as np
+
+from ._common import timed
+
+from core.models import Room
+from core.services.preheat_scheduler import PreheatScheduler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=10000)
+    parser.add_argument('--bookings', type=int, default=100, help='занятий на комнату в сутки')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    materials = [choice[0] for choice in Room.WALL_MATERIAL_CHOICES]
+    rooms = [
+        Room(id=i + 1, name=f'Room {i}', area=float(rng.integers(15, 150)),
+             wall_material=materials[i % len(materials)], target_temperature=22.0)
+        for i in range(args.rooms)
+    ]
+
+    scheduler = PreheatScheduler()
+    now = scheduler.now.timestamp()
+    n = args.rooms * args.bookings
+    room = np.repeat(np.arange(1, args.rooms + 1), args.bookings)
+    start = now + rng.uniform(0, 24 * 3600, n)
+    end = start + rng.choice([15, 30, 45, 60, 90], n) * 60
+
+    print(f"Pre-heat schedule, {args.rooms} rooms x {args.bookings} bookings = {n} bookings:")
+    with timed('build'):
+        schedule = scheduler.build(rooms, -5.0, bookings=(room, start, end))
+    with timed('events', intervals=len(schedule)):
+        PreheatScheduler.events(schedule)
+
+
+if __name__ == '__main__':
+    main()
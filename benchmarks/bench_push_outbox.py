@@ -0,0 +1,126 @@
+# benchmarks/bench_push_outbox.py
+# Запуск: python -m benchmarks.bench_push_outbox
+# API кладёт уведомления в outbox, воркер шлёт их multicast-пакетами на локальную
+# заглушку FCM: сравнение с отправкой по одному и скорость доставки (сообщений/с).
+import argparse
+import threading
+import time
+import zlib
+from datetime import timedelta
+
+from ._common import benchmark_database, stub_server, timed
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.models import PushNotification
+from core.services.http_client import reset_clients
+from core.services.push import FCMProvider, PushWorker, enqueue
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tokens', type=int, default=5000, help='Devices per broadcast message')
+    parser.add_argument('--messages', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.005, help='Fake provider latency per call, seconds')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    seen = {}
+    stats = {'calls': 0, 'tokens': 0}
+    lock = threading.Lock()
+
+    def respond(path, query, body):
+        time.sleep(args.latency)
+        results = []
+        with lock:
+            stats['calls'] += 1
+            stats['tokens'] += len(body['registration_ids'])
+            for token in body['registration_ids']:
+                seen[token] = seen.get(token, 0) + 1
+                if token.startswith('bad-'):
+                    results.append({'error': 'NotRegistered'})
+                elif zlib.crc32(token.encode()) % 30 == 0 and seen[token] == 1:
+                    results.append({'error': 'Unavailable'})  # временная ошибка - уйдёт при повторе
+                else:
+                    results.append({'message_id': f"0:{stats['calls']}:{len(results)}"})
+        return 200, {'success': sum('message_id' in r for r in results), 'results': results}
+
+    with benchmark_database(), stub_server(respond, with_body=True) as url:
+        provider = FCMProvider(url=f"{url}/fcm/send", key='stub', rate=0)
+        user = get_user_model().objects.create(username='bench-mobile')
+        client = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+        assert Client(HTTP_HOST='localhost').post('/api/mobile/push/', {'device_token': 'x', 'message': 'x'},
+                                                  content_type='application/json').status_code == 401
+        response = client.post('/api/mobile/push/', {'device_token': 'x', 'message': 'x', 'room_id': 999999},
+                               content_type='application/json')
+        assert response.status_code == 400, response.content
+
+        durations = []
+        for i in range(200):
+            start = time.perf_counter()
+            response = client.post('/api/mobile/push/', {'device_token': f'api-{i}', 'message': 'Room 101 is cold'},
+                                   content_type='application/json')
+            durations.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 202, response.content
+        print(f"  API enqueue, single token: p50={np.percentile(durations, 50):.1f} ms "
+              f"p99={np.percentile(durations, 99):.1f} ms, provider calls during requests: {stats['calls']}")
+        fan_out = {'device_tokens': [f'api-{i}' for i in range(2000)], 'message': 'Heating off tonight'}
+        with timed('API enqueue, fan-out to 2000 tokens'):
+            client.post('/api/mobile/push/', fan_out, content_type='application/json')
+        client.post('/api/mobile/push/', fan_out, content_type='application/json')
+        print(f"  same fan-out posted twice -> outbox rows: {PushNotification.objects.count()} (2200 unique)")
+        assert PushNotification.objects.count() == 2200
+
+        sample = 500
+        with timed(f'synchronous send, one call per message x{sample}'):
+            for i in range(sample):
+                provider.send_multicast([f'sync-{i}'], 'Room 101 is cold')
+        single_rate = sample / (sample * args.latency + 1e-9)
+
+        now = timezone.now()
+        for m in range(args.messages):
+            tokens = [f'dev-{t}' for t in range(args.tokens)] + [f'bad-{t}' for t in range(args.tokens // 100)]
+            enqueue(tokens, f'Broadcast {m}', now=now)
+        total = PushNotification.objects.filter(status=PushNotification.PENDING).count()
+        calls_before = stats['calls']
+        worker = PushWorker(providers={'fcm': provider}, backoff_base=0.01, backoff_max=0.05)
+        start = time.perf_counter()
+        with timed(f'worker: {total:,} queued notifications'):
+            while PushNotification.objects.filter(status=PushNotification.PENDING).exists():
+                worker.run()
+                time.sleep(0.05)  # ждём next_attempt_at повторов
+        elapsed = time.perf_counter() - start
+        counts = dict(PushNotification.objects.order_by().values_list('status').annotate(n=Count('id')))
+        print(f"  {worker.stats}, provider calls: {stats['calls'] - calls_before}")
+        print(f"  delivered {worker.stats['sent'] / elapsed:,.0f} messages/s "
+              f"(one-per-call ceiling at {args.latency * 1000:.0f} ms/call: {single_rate:,.0f} messages/s)")
+        print(f"  final statuses: {counts}")
+        assert counts.get('sending') is None and counts.get('pending') is None
+
+        # Ограничение скорости: 2000 сообщений/с, всплеск 2000
+        enqueue([f'rate-{t}' for t in range(5000)], 'Rate limited')
+        limited = PushWorker(providers={'fcm': FCMProvider(url=f"{url}/fcm/send", key='stub', rate=2000)})
+        start = time.perf_counter()
+        limited.run()
+        elapsed = time.perf_counter() - start
+        print(f"  rate=2000/s: 5000 messages in {elapsed:.2f}s ({limited.stats['sent'] / elapsed:,.0f} messages/s)")
+        assert elapsed >= 1.4
+
+        # Воркер упал посреди пакета: строки sending возвращаются в очередь
+        rows = enqueue([f'crash-{t}' for t in range(100)], 'Crash test')
+        PushNotification.objects.filter(id__in=[r['id'] for r in rows]).update(
+            status=PushNotification.SENDING, claimed_at=timezone.now() - timedelta(minutes=10))
+        recovered = PushWorker(providers={'fcm': provider}).run()
+        print(f"  stale 'sending' rows recovered: {recovered['sent']} sent, {recovered['retried']} to retry")
+        assert recovered['sent'] + recovered['retried'] == 100
+        reset_clients()
+
+
+if __name__ == '__main__':
+    main()
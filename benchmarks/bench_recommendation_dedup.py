@@ -0,0 +1,56 @@
+# benchmarks/bench_recommendation_dedup.py
+# Запуск: python -m benchmarks.bench_recommendation_dedup --rounds 50
+# Время повторной генерации и размер таблицы Recommendation; проверка того,
+# что таблица не растёт, - core.tests.RecommendationDedupTests.
+import argparse
+from datetime import timedelta
+
+from ._common import benchmark_database, seed_campus, timed
+
+from django.utils import timezone
+
+from core.models import OccupancyLog, Recommendation, Room, WeatherCache
+from core.services.recommendations import apply_recommendations
+from core.utils import RecommendationEngine
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        seed_campus(buildings=1, rooms_per_building=args.rooms)
+        Room.objects.update(heating_status=True)
+        WeatherCache.objects.create(temperature=-5.0, humidity=70, wind_speed=3, description='clear')
+        now = timezone.now()
+        OccupancyLog.objects.bulk_create(
+            OccupancyLog(room_id=room_id, start_time=now - timedelta(hours=1),
+                         end_time=now + timedelta(minutes=90 + (room_id * 7) % 180))
+            for room_id in Room.objects.values_list('id', flat=True)
+        )
+
+        sizes = []
+        with timed(f'generate x{args.rounds}'):
+            for _ in range(args.rounds):
+                recommendations = RecommendationEngine.generate_recommendations()
+                sizes.append(Recommendation.objects.count())
+        print(f"  generated per round: {len(recommendations)}, table size after rounds: "
+              f"first {sizes[0]}, max {max(sizes)}, last {sizes[-1]}")
+
+        apply_recommendations([r.id for r in recommendations[:10]])
+        RecommendationEngine.generate_recommendations()
+        pending = Recommendation.objects.filter(is_applied=False).count()
+        print(f"  after applying 10 and regenerating: {pending} pending, "
+              f"{Recommendation.objects.filter(is_applied=True).count()} applied")
+
+        Recommendation.objects.filter(is_applied=False).update(expires_at=now - timedelta(minutes=1))
+        RecommendationEngine.generate_recommendations()
+        print(f"  after expiring all pending and regenerating: {Recommendation.objects.count()} rows")
+
+        active = Recommendation.objects.filter(is_applied=False).order_by('-priority', '-created_at')[:5]
+        print(f"  active top-5 plan: {active.explain()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_recommendation_priority.py
+# Запуск: python -m benchmarks.bench_recommendation_priority --rows 10000000 (по умолчанию 1M для локального прогона)
+import argparse
+
+from ._common import benchmark_database, seed_campus, timed
+
+import numpy as np
+from django.db import connection
+from django.db.models import CharField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from core.models import Recommendation
+
+
+def seed_recommendations(room_ids, rows, batch_size=100000, seed=0):
+    """rows рекомендаций сырым executemany; ~5% неприменённых, приоритеты вперемешку"""
+    rng = np.random.default_rng(seed)
+    table = Recommendation._meta.db_table
+    sql = (f"INSERT INTO {table} (room_id, message, recommended_action, estimated_savings, priority, "
+           f"is_applied, created_at, fingerprint) VALUES (%s, '', 'Turn off heating now', %s, %s, %s, %s, '')")
+    now = timezone.now().timestamp()
+    written = 0
+    with connection.cursor() as cursor:
+        while written < rows:
+            n = min(batch_size, rows - written)
+            created = now - rng.uniform(0, 365 * 86400, n)
+            cursor.executemany(sql, list(zip(
+                rng.choice(room_ids, n).tolist(),
+                rng.uniform(0.5, 15, n).round(2).tolist(),
+                rng.integers(1, 4, n).tolist(),
+                (rng.random(n) > 0.05).tolist(),
+                [timezone.datetime.fromtimestamp(t, timezone.get_current_timezone()) for t in created],
+            )))
+            written += n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        rooms = seed_campus(buildings=4, rooms_per_building=250)
+        with timed('seed Recommendation', rows=args.rows):
+            seed_recommendations([r[0] for r in rooms], args.rows)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE' if connection.vendor != 'postgresql' else 'ANALYZE core_recommendation')
+
+        pending = Recommendation.objects.filter(is_applied=False)
+        top = pending.order_by('-priority', '-created_at').values_list('estimated_savings', flat=True)[:5]
+        # Прежнее поведение: строковый приоритет, сортировка по тексту без индекса
+        as_text = pending.order_by(Cast('priority', CharField()).desc(), '-created_at') \
+            .values_list('estimated_savings', flat=True)[:5]
+
+        print(f"Top-5 pending of {args.rows:,} recommendations:")
+        print(f"  plan (integer priority): {top.explain()}")
+        print(f"  plan (text priority):    {as_text.explain()}")
+        with timed(f'top-5, integer priority, partial index x{args.repeat}'):
+            for _ in range(args.repeat):
+                list(top)
+        with timed('top-5, text sort without index x1'):
+            list(as_text)
+        with timed(f'top-5 rows with room (dashboard list) x{args.repeat}'):
+            for _ in range(args.repeat):
+                list(pending.select_related('room')[:5])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_recommendations.py
+# Запуск: python -m benchmarks.bench_recommendations --recommendations 10000
+import argparse
+
+from ._common import benchmark_database, seed_campus, staff_client, timed
+
+import numpy as np
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+
+from core.models import Recommendation, Room
+from core.services.iot_service import IoTSimulator
+from core.services.recommendations import dispatch_heating_off
+
+
+def seed_recommendations(room_ids, count, seed=0):
+    """count рекомендаций; часть комнат получает несколько - проверка конфликтов"""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(room_ids, count)
+    Recommendation.objects.bulk_create(
+        (Recommendation(room_id=int(room_id), message='Room will be free soon', recommended_action='Turn off heating now',
+                        estimated_savings=float(savings), priority=Recommendation.HIGH)
+         for room_id, savings in zip(picks, rng.uniform(0.5, 15, count).round(2))),
+        batch_size=5000,
+    )
+    return list(Recommendation.objects.order_by('id').values_list('id', flat=True))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=5000)
+    parser.add_argument('--recommendations', type=int, default=10000)
+    parser.add_argument('--sample', type=int, default=300, help='Recommendations applied one request at a time')
+    parser.add_argument('--devices', type=int, default=8, help='Rooms for the device dispatch comparison')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    with benchmark_database():
+        seed_campus(buildings=5, rooms_per_building=args.rooms // 5)
+        Room.objects.update(heating_status=True)
+        room_ids = list(Room.objects.values_list('id', flat=True))
+        ids = seed_recommendations(room_ids, args.recommendations)
+        client = staff_client()
+
+        results = []
+        sample = ids[:args.sample]
+        with CaptureQueriesContext(connection) as queries:
+            with timed(f'apply x{len(sample)} (one request each)', results):
+                for rec_id in sample:
+                    client.post(f'/api/recommendations/{rec_id}/apply/')
+        per_item = results[-1]['seconds'] / len(sample)
+        print(f"    {len(queries) / len(sample):.1f} queries per recommendation, "
+              f"{1 / per_item:.0f} recommendations/s")
+
+        rest = ids[args.sample:]
+        with CaptureQueriesContext(connection) as queries:
+            with timed(f'apply_many, {len(rest)} recommendations in one call', results):
+                response = client.post('/api/recommendations/apply_many/', {'ids': rest},
+                                       content_type='application/json')
+        payload = response.json()
+        statuses = {}
+        for result in payload['results']:
+            statuses[result['status']] = statuses.get(result['status'], 0) + 1
+        print(f"    {len(queries)} queries, {len(rest) / results[-1]['seconds']:.0f} recommendations/s, "
+              f"statuses {statuses}, heated rooms left {Room.objects.filter(heating_status=True).count()}")
+
+        devices = room_ids[:args.devices]
+        with timed(f'device commands x{len(devices)}, sequential'):
+            for room_id in devices:
+                IoTSimulator.send_control_command(room_id, 'turn_off_heating')
+        with timed(f'device commands x{len(devices)}, concurrent'):
+            dispatch_heating_off(devices)
+
+
+if __name__ == '__main__':
+    main()
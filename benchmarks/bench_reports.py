@@ -0,0 +1,41 @@
+# benchmarks/bench_reports.py
+# Запуск: python -m benchmarks.bench_reports --rows 50000000 (по умолчанию 1M для локального прогона)
+import argparse
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ._common import benchmark_database, seed_campus, seed_energy_logs, timed
+
+from core.services.reports import ReportService
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=90)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        rooms = seed_campus(buildings=4, rooms_per_building=args.rooms // 4)
+        with timed('seed EnergyLog', rows=args.rows):
+            seed_energy_logs(rooms, args.rows, days=args.days)
+
+        print(f"Reports over {args.rows:,} EnergyLog rows:")
+        for period, days in (('week', 7), ('month', 30)):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                with timed(f'{period}: cold (aggregates in SQL)'):
+                    ReportService(days=days).build()
+            print(f"    queries: {len(queries)}")
+            with timed(f'{period}: warm (cached until new logs)'):
+                ReportService(days=days).build()
+            cache.clear()
+            with timed(f'{period}: one building, cold'):
+                ReportService(days=days, building=1).build()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_retention.py
+# Запуск: python -m benchmarks.bench_retention --rows 100000000 (по умолчанию 1M для локального прогона)
+import argparse
+from datetime import timedelta
+
+from ._common import benchmark_database, seed_campus, seed_energy_logs, timed
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from core.models import EnergyLog, EnergyLogRollup
+from core.services.impact import actual_counters
+from core.services.reports import ReportService
+from core.services.retention import RetentionManager
+
+
+def measure(label, results):
+    print(f"{label}: {EnergyLog.objects.count():,} hot rows, {EnergyLogRollup.objects.count():,} rollups")
+    for days in (7, 30, 90):
+        cache.clear()
+        with timed(f'report {days}d, cold', results, phase=label):
+            ReportService(days=days).build()
+    with timed('latest reading per room', results, phase=label):
+        list(EnergyLog.objects.values('room_id').annotate(last=Max('timestamp')).order_by())
+    with timed('logs in the last 24h', results, phase=label):
+        EnergyLog.objects.filter(timestamp__gte=timezone.now() - timedelta(days=1)).aggregate(n=Count('id'))
+    with timed('impact counters recompute', results, phase=label):
+        actual_counters()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--keep-days', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    with benchmark_database():
+        rooms = seed_campus(buildings=4, rooms_per_building=args.rooms // 4)
+        with timed('seed EnergyLog', rows=args.rows, days=args.days):
+            seed_energy_logs(rooms, args.rows, days=args.days)
+
+        before, after = [], []
+        measure('before', before)
+        cache.clear()
+        reference = ReportService(days=90).build()
+
+        manager = RetentionManager(keep_days=args.keep_days, archive_days=None, batch_size=args.batch_size)
+        with timed('compact', keep_days=args.keep_days, batch=args.batch_size):
+            summary = manager.run()
+        print(f"  {summary['rows']:,} rows in {summary['batches']} batches, "
+              f"archive months: {len(manager.archive.months())}")
+
+        measure('after', after)
+        cache.clear()
+        compacted = ReportService(days=90).build()
+        drift = max(abs(a - b) for a, b in zip(reference['energy_data'], compacted['energy_data']))
+        print(f"  90d report, max daily drift after compaction: {drift:.3f} kWh")
+        for b, a in zip(before, after):
+            print(f"  {b['name']:<45} {b['seconds'] / max(a['seconds'], 1e-6):6.1f}x before/after")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# benchmarks/bench_thermal_simulation.py
+# Запуск: python -m benchmarks.bench_thermal_simulation --rooms 1000 --days 365
+import argparse
+
+import numpy as np
+
+from ._common import timed
+
+from core.models import Room
+from core.services.thermal_simulation import ThermalSimulation
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--step-minutes', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    materials = [choice[0] for choice in Room.WALL_MATERIAL_CHOICES]
+    rooms = [
+        Room(id=i + 1, name=f'Room {i}', area=float(rng.integers(15, 150)),
+             wall_material=materials[i % len(materials)], target_temperature=22.0)
+        for i in range(args.rooms)
+    ]
+    simulation = ThermalSimulation(rooms, step_minutes=args.step_minutes)
+
+    steps = args.days * 24 * 60 // args.step_minutes
+    hours = np.arange(steps) * args.step_minutes / 60
+    outside = -5 + 10 * np.sin(2 * np.pi * hours / (24 * 365)) + 4 * np.sin(2 * np.pi * (hours % 24 - 9) / 24)
+
+    def office_hours(step, temperature, t_out):
+        hour = (step * args.step_minutes / 60) % 24
+        return np.full(len(rooms), 8 <= hour < 18)
+
+    print(f"Thermal simulation, {args.rooms} rooms x {steps} steps ({args.step_minutes} min):")
+    with timed('office-hours policy'):
+        result = simulation.run(outside, office_hours)
+    print(f"  total energy: {result['energy_kwh'].sum():,.0f} kWh")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_weather_refresher.py
+# Запуск: python -m benchmarks.bench_weather_refresher
+# Погоду обновляет фоновый WeatherRefresher; запросы к API только читают БД.
+# Заглушка One Call отвечает медленно или ошибками - время ответа API от этого не зависит.
+import argparse
+import threading
+import time
+from datetime import timedelta
+
+from ._common import benchmark_database, stub_server, timed
+from .bench_weather_series import one_call_payload
+
+import numpy as np
+from django.db.models import F
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+from core.models import WeatherCache, WeatherSample
+from core.services.weather import ForecastFetcher, WeatherRefresher, refresher_lock
+
+
+def latencies(client, count):
+    values = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = client.get('/api/weather/current/')
+        values.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+    return np.array(values)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--delay', type=float, default=2.0, help='Upstream response delay, seconds')
+    parser.add_argument('--requests', type=int, default=200, help='API requests during a slow refresh')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    state = {'mode': 'ok', 'calls': 0}
+
+    def respond(path, query):
+        state['calls'] += 1
+        if state['mode'] == 'slow':
+            time.sleep(args.delay)
+        elif state['mode'] == 'fail':
+            return 503, {'message': 'upstream unavailable'}
+        elif state['mode'] == 'flaky' and state['calls'] <= 2:
+            return 500, {'message': 'temporary error'}
+        if path.endswith('/weather'):
+            return 200, {'main': {'temp': -3.0, 'humidity': 80}, 'wind': {'speed': 2.0},
+                         'weather': [{'description': 'light snow'}]}
+        return 200, one_call_payload(time.time())
+
+    with benchmark_database(), stub_server(respond) as url:
+        client = Client(HTTP_HOST='localhost')
+        sleeps = []
+
+        def refresher(**kwargs):
+            return WeatherRefresher(
+                fetcher=ForecastFetcher(url=f"{url}/data/3.0/onecall", api_key='stub', timeout=args.delay * 3),
+                current_url=f"{url}/data/2.5/weather", backoff_base=0.05, sleep=sleeps.append, **kwargs,
+            )
+
+        # Пустая база: демо-погода без вставок в WeatherCache
+        latencies(client, 5)
+        print(f"  no data yet: demo weather served, WeatherCache rows: {WeatherCache.objects.count()}")
+
+        with timed('refresh, upstream ok'):
+            summary = refresher().refresh()
+        print(f"  {summary}")
+
+        state.update(mode='slow', calls=0)
+        worker = threading.Thread(target=refresher().refresh)
+        with timed(f'refresh, upstream {args.delay:.1f}s slow (background thread)'):
+            worker.start()
+            during = latencies(client, args.requests)
+            worker.join()
+        print(f"  API during slow refresh: p50={np.percentile(during, 50):.1f} ms "
+              f"p99={np.percentile(during, 99):.1f} ms max={during.max():.1f} ms "
+              f"(upstream delay {args.delay * 1000:.0f} ms)")
+        assert during.max() < args.delay * 1000 / 2, "request path waited for the upstream"
+
+        state.update(mode='flaky', calls=0)
+        sleeps.clear()
+        flaky = refresher()
+        summary = flaky.refresh()
+        print(f"  flaky upstream: {flaky.attempts} requests, backoff sleeps "
+              f"{[round(s, 3) for s in sleeps]}, stored observation={summary['observation']}")
+        assert summary['observation'] and flaky.attempts == 3
+
+        state.update(mode='fail', calls=0)
+        sleeps.clear()
+        stale = WeatherCache.objects.first()
+        failing = refresher(retries=3)
+        summary = failing.refresh()
+        after = latencies(client, 20)
+        print(f"  upstream down: {failing.attempts} requests (forecast + current), error={summary['error']!r}")
+        print(f"  API still serves the last observation ({stale.temperature} °C), p99={np.percentile(after, 99):.1f} ms")
+        assert client.get('/api/weather/current/').json()['temperature'] == stale.temperature
+
+        # Очистка: старые строки WeatherCache и прошедшие прогнозы удаляются
+        now = timezone.now()
+        WeatherCache.objects.bulk_create(WeatherCache(temperature=0, description='old') for _ in range(1000))
+        WeatherCache.objects.filter(description='old').update(cached_at=now - timedelta(days=120))
+        WeatherSample.objects.filter(kind='forecast').update(valid_time=F('valid_time') - timedelta(days=5))
+        with timed('prune old weather rows'):
+            pruned = WeatherRefresher.prune(now)
+        print(f"  pruned {pruned} rows, WeatherCache left: {WeatherCache.objects.count()}, "
+              f"forecast rows left: {WeatherSample.objects.filter(kind='forecast').count()}")
+
+        with refresher_lock() as first, refresher_lock() as second:
+            print(f"  lock file: first holder={first}, second holder={second}")
+        assert first and not second
+
+
+if __name__ == '__main__':
+    main()
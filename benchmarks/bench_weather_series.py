@@ -0,0 +1,83 @@
+# benchmarks/bench_weather_series.py
+# Запуск: python -m benchmarks.bench_weather_series
+# Прогноз забирается с локальной заглушки One Call API, затем - интерполяция ряда.
+import argparse
+import math
+import time
+from datetime import timedelta
+
+from ._common import benchmark_database, seed_campus, stub_server, timed
+
+import numpy as np
+from django.utils import timezone
+
+from core.models import OccupancyLog, Room, WeatherSample
+from core.services.preheat_scheduler import PreheatScheduler
+from core.services.weather import ForecastFetcher, WeatherSeries
+
+
+def one_call_payload(now, hours=48, shift=0.0):
+    """JSON в формате One Call: current + hourly, суточная синусоида"""
+    base = int(now) - int(now) % 3600
+
+    def entry(ts):
+        temp = -5 + 6 * math.sin((ts % 86400) / 86400 * 2 * math.pi) + shift
+        return {'dt': ts, 'temp': round(temp, 2), 'humidity': 70, 'wind_speed': 3.5,
+                'weather': [{'description': 'overcast clouds'}]}
+
+    return {'current': entry(int(now)), 'hourly': [entry(base + h * 3600) for h in range(hours)]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--points', type=int, default=1_000_000, help='Timestamps interpolated at once')
+    parser.add_argument('--rooms', type=int, default=2000)
+    args = parser.parse_args()
+
+    requests_seen = []
+
+    def respond(path, query):
+        requests_seen.append(query)
+        return 200, one_call_payload(time.time(), shift=0.5 * (len(requests_seen) - 1))
+
+    with benchmark_database(), stub_server(respond) as url:
+        fetcher = ForecastFetcher(url=f"{url}/data/3.0/onecall", api_key='stub')
+        with timed('fetch + upsert (1 HTTP request)'):
+            counts = fetcher.fetch()
+        with timed('refetch, upsert over existing rows'):
+            fetcher.fetch()
+        print(f"  stored {counts}, rows after 2 fetches: {WeatherSample.objects.count()}, "
+              f"HTTP requests: {len(requests_seen)}")
+
+        now = timezone.now()
+        with timed('load series (48h)'):
+            series = WeatherSeries.load(now, now + timedelta(hours=48))
+        moments = now.timestamp() + np.random.default_rng(0).uniform(0, 47 * 3600, args.points)
+        with timed(f'interpolate {args.points:,} timestamps (vectorized)'):
+            values = series.at(moments)
+        sample = moments[:1000]
+        with timed('nearest sample per timestamp, DB query x1000'):
+            for ts in sample:
+                moment = timezone.datetime.fromtimestamp(ts, timezone.get_current_timezone())
+                WeatherSample.objects.filter(kind='forecast', valid_time__lte=moment) \
+                    .order_by('-valid_time').values_list('temperature', flat=True).first()
+        print(f"  interpolated range: {values.min():.1f}..{values.max():.1f} °C")
+
+        seed_campus(buildings=2, rooms_per_building=args.rooms // 2)
+        OccupancyLog.objects.bulk_create(
+            OccupancyLog(room_id=room_id, start_time=now + timedelta(hours=1 + i % 20),
+                         end_time=now + timedelta(hours=2 + i % 20))
+            for i, room_id in enumerate(Room.objects.values_list('id', flat=True))
+        )
+        rooms = list(Room.objects.all())
+        scheduler = PreheatScheduler(now=now)
+        with timed('preheat schedule, scalar outside temperature'):
+            flat = scheduler.build(rooms, series.fallback)
+        with timed('preheat schedule, temperature per booking'):
+            varying = scheduler.build(rooms, series)
+        shift = np.abs(varying['start'] - flat['start']).mean() / 60
+        print(f"  mean heat-on shift from using the forecast: {shift:.1f} min")
+
+
+if __name__ == '__main__':
+    main()
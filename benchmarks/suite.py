@@ -0,0 +1,220 @@
+# benchmarks/suite.py
+# Запуск: python -m benchmarks.suite --size small [--baseline benchmarks/baseline_small.json]
+# Набор горячих эндпоинтов и сервисов на синтетическом кампусе (SQLite, без сети):
+# время (медиана, p95) и число SQL на каждый случай, результаты - в JSON,
+# сравнение с базовым прогоном по порогам. Код возврата 1 - есть регрессии.
+# Базовое время зависит от машины: на новой машине сначала --update-baseline.
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from ._common import benchmark_database, seed_campus, seed_energy_logs, seed_occupancy
+
+import django
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from api.views import EnergyLogViewSet, StatisticsAPIView
+from core.models import Room
+from core.utils import RecommendationEngine, ThermalCalculator
+
+SIZES = {
+    #        зданий, комнат в здании, бронирований, EnergyLog
+    'small': (2, 50, 2000, 20000),
+    'medium': (5, 200, 20000, 200000),
+    'large': (10, 500, 100000, 2000000),
+}
+TIME_THRESHOLD = 1.25  # медиана дольше базовой в 1.25 раза - регрессия
+MIN_DELTA_MS = 2.0  # ...если разница больше шума на коротких случаях
+QUERY_THRESHOLD = 0  # лишние SQL сверх базовых
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')  # в .gitignore
+
+
+def thermal_calculator():
+    """ThermalCalculator по всем комнатам: остывание и экономия"""
+    results = []
+    for room in Room.objects.all():
+        minutes = ThermalCalculator.calculate_cooldown_time(room, room.target_temperature, -5.0)
+        results.append(ThermalCalculator.calculate_energy_savings(room, min(minutes, 600) / 60, -5.0))
+    return results
+
+
+def cases():
+    """[(имя, функция без аргументов)] - функция выполняет один запрос / вызов"""
+    client = Client(HTTP_HOST='localhost')
+    factory = APIRequestFactory()
+    statistics_view = StatisticsAPIView.as_view()
+    today_view = EnergyLogViewSet.as_view({'get': 'today'})
+
+    def get(path):
+        def run():
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+        return run
+
+    def view(handler, path):
+        def run():
+            response = handler(factory.get(path))
+            response.render()
+            assert response.status_code == 200, (path, response.status_code)
+        return run
+
+    return [
+        ('api_dashboard', get('/api/dashboard/')),
+        ('api_statistics', view(statistics_view, '/api/statistics/')),
+        ('api_rooms', get('/api/rooms/')),
+        ('api_energy_logs_today', view(today_view, '/api/energy-logs/today/')),
+        ('dashboard_page', get('/dashboard/')),
+        ('generate_recommendations', RecommendationEngine.generate_recommendations),
+        ('thermal_calculator', thermal_calculator),
+    ]
+
+
+def measure(func, repeat, warm=False):
+    """Прогон функции repeat раз (после одного прогревочного): времена в мс и число SQL"""
+    func()
+    timings, queries = [], []
+    for _ in range(repeat):
+        if not warm:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(float(np.percentile(timings, 95)), 3),
+        'min_ms': round(min(timings), 3),
+        'queries': max(queries),
+        'runs': repeat,
+    }
+
+
+def metadata(args, counts):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'size': args.size, **counts, 'repeat': args.repeat, 'warm_cache': args.warm,
+        'python': platform.python_version(), 'django': django.get_version(),
+        'sqlite': connection.Database.sqlite_version if connection.vendor == 'sqlite' else None,
+        'machine': platform.machine(), 'commit': commit, 'created_at': timezone.now().isoformat(),
+    }
+
+
+def compare(results, baseline, time_threshold, min_delta_ms, query_threshold):
+    """Строки сравнения и список регрессий"""
+    lines, regressions = [], []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            lines.append(f"  {name:<28} {current['median_ms']:10.2f} ms {current['queries']:6} q   (new)")
+            continue
+        ratio = current['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+        slower = ratio > time_threshold and current['median_ms'] - base['median_ms'] > min_delta_ms
+        more_queries = current['queries'] - base['queries'] > query_threshold
+        flags = []
+        if slower:
+            flags.append(f"TIME x{ratio:.2f}")
+        if more_queries:
+            flags.append(f"QUERIES +{current['queries'] - base['queries']}")
+        if flags:
+            regressions.append((name, flags))
+        lines.append(
+            f"  {name:<28} {current['median_ms']:10.2f} ms (base {base['median_ms']:.2f}, x{ratio:.2f}) "
+            f"{current['queries']:6} q (base {base['queries']})  {' '.join(flags) or 'ok'}"
+        )
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', choices=SIZES, default='small')
+    parser.add_argument('--buildings', type=int)
+    parser.add_argument('--rooms', type=int, help='Rooms per building')
+    parser.add_argument('--occupancies', type=int)
+    parser.add_argument('--logs', type=int)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--warm', action='store_true', help='Keep the cache between runs')
+    parser.add_argument('--only', nargs='*', help='Run only these cases')
+    parser.add_argument('--output', default=os.path.join(RESULTS_DIR, 'benchmark_results.json'))
+    parser.add_argument('--baseline', help='Compare against this results file')
+    parser.add_argument('--update-baseline', action='store_true', help='Write the results to --baseline')
+    parser.add_argument('--time-threshold', type=float, default=TIME_THRESHOLD)
+    parser.add_argument('--min-delta-ms', type=float, default=MIN_DELTA_MS)
+    parser.add_argument('--query-threshold', type=int, default=QUERY_THRESHOLD)
+    args = parser.parse_args()
+
+    buildings, rooms_per_building, occupancies, logs = SIZES[args.size]
+    counts = {
+        'buildings': args.buildings or buildings,
+        'rooms_per_building': args.rooms or rooms_per_building,
+        'occupancies': args.occupancies if args.occupancies is not None else occupancies,
+        'energy_logs': args.logs if args.logs is not None else logs,
+    }
+
+    setup_test_environment()
+    logging.getLogger('thermasense.slow_requests').setLevel(logging.ERROR)  # медленные здесь все
+    results = {}
+    with benchmark_database():
+        start = time.perf_counter()
+        rooms = seed_campus(counts['buildings'], counts['rooms_per_building'])
+        seed_occupancy(rooms, counts['occupancies'])
+        seed_energy_logs(rooms, counts['energy_logs'], days=30)
+        print(f"seeded {len(rooms)} rooms, {counts['occupancies']} occupancies, {counts['energy_logs']} energy logs "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        for name, func in cases():
+            if args.only and name not in args.only:
+                continue
+            results[name] = measure(func, args.repeat, args.warm)
+            row = results[name]
+            print(f"  {name:<28} median {row['median_ms']:10.2f} ms  p95 {row['p95_ms']:10.2f} ms  "
+                  f"{row['queries']:6} queries")
+        meta = metadata(args, counts)
+
+    report = {'meta': meta, 'results': results}
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as handle:
+        json.dump(report, handle, indent=1)
+    print(f"results written to {args.output}")
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, 'w') as handle:
+            json.dump(report, handle, indent=1)
+        print(f"baseline updated: {args.baseline}")
+        return 0
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        if baseline['meta'].get('size') != args.size:
+            print(f"warning: baseline was recorded for size={baseline['meta'].get('size')}")
+        lines, regressions = compare(results, baseline['results'], args.time_threshold, args.min_delta_ms,
+                                     args.query_threshold)
+        print(f"comparison with {args.baseline} (time x{args.time_threshold}, +{args.min_delta_ms} ms; "
+              f"queries +{args.query_threshold}):")
+        print('\n'.join(lines))
+        if regressions:
+            print(f"{len(regressions)} regression(s): " + ', '.join(f"{name} ({' '.join(flags)})"
+                                                                  for name, flags in regressions))
+            return 1
+        print("no regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
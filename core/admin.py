@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Building, Room, OccupancyLog, WeatherCache, EnergyLog, Recommendation
+from .models import (
+    Building, Room, OccupancyLog, WeatherCache, EnergyLog, Recommendation, ImpactCounter,
+    EnergyLogRollup, WeatherSample, PushNotification,
+)
+from .services.recommendations import apply_recommendations
 
 
 @admin.register(Building)
@@ -41,6 +45,12 @@ class WeatherCacheAdmin(admin.ModelAdmin):
     is_expired.short_description = 'Expired?'
 
 
+@admin.register(WeatherSample)
+class WeatherSampleAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'valid_time', 'temperature', 'humidity', 'wind_speed', 'fetched_at')
+    list_filter = ('kind',)
+
+
 @admin.register(EnergyLog)
 class EnergyLogAdmin(admin.ModelAdmin):
     list_display = ('room', 'timestamp', 'temperature_inside', 'temperature_outside', 'heating_power', 'co2_saved')
@@ -48,6 +58,12 @@ class EnergyLogAdmin(admin.ModelAdmin):
     readonly_fields = ('timestamp',)
 
 
+@admin.register(EnergyLogRollup)
+class EnergyLogRollupAdmin(admin.ModelAdmin):
+    list_display = ('room', 'day', 'samples', 'heating_power_sum', 'saved_kwh')
+    list_filter = ('day',)
+
+
 @admin.register(Recommendation)
 class RecommendationAdmin(admin.ModelAdmin):
     list_display = ('room', 'message', 'priority', 'is_applied', 'created_at')
@@ -56,7 +72,27 @@ class RecommendationAdmin(admin.ModelAdmin):
     actions = ['mark_as_applied']
 
     def mark_as_applied(self, request, queryset):
-        updated = queryset.update(is_applied=True, applied_at=timezone.now())
-        self.message_user(request, f"{updated} recommendations marked as applied.")
-
-    mark_as_applied.short_description = "Mark selected recommendations as applied"
\ No newline at end of file
+        outcome = apply_recommendations(queryset.values_list('id', flat=True))
+        applied = sum(result['status'] == 'applied' for result in outcome['results'])
+        superseded = sum(result['status'] == 'superseded' for result in outcome['results'])
+        message = f"{applied} recommendations marked as applied, heating turned off in {len(outcome['rooms'])} rooms."
+        if superseded:
+            message += f" {superseded} skipped: another selected recommendation targets the same room."
+        self.message_user(request, message)
+
+    mark_as_applied.short_description = "Mark selected recommendations as applied"
+
+
+@admin.register(ImpactCounter)
+class ImpactCounterAdmin(admin.ModelAdmin):
+    list_display = ('building', 'month', 'energy_saved_kwh', 'co2_saved_kg', 'log_count', 'recommendations_applied')
+    list_filter = ('building',)
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(PushNotification)
+class PushNotificationAdmin(admin.ModelAdmin):
+    list_display = ('device_token', 'provider', 'status', 'attempts', 'created_at', 'sent_at', 'last_error')
+    list_filter = ('status', 'provider')
+    search_fields = ('device_token', 'provider_message_id')
+    readonly_fields = ('dedup_key', 'created_at', 'claimed_at', 'sent_at', 'provider_message_id', 'last_error')
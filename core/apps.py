@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        from django.conf import settings
+
+        if getattr(settings, 'WEATHER_BACKGROUND_REFRESH', False):
+            from .services.weather import start_background_refresher
+
+            start_background_refresher(settings.WEATHER_REFRESH_INTERVAL)
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from core.models import EnergyLog
+from core.services.log_archive import ColumnarArchive
+from core.services.retention import local_midnight, next_month
+
+
+class Command(BaseCommand):
+    help = ("Append closed months of EnergyLog to the columnar .npy archive (run before compact_energy_logs, "
+            "which removes raw rows) and verify archive checksums")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help='Archive up to this date, YYYY-MM-DD (default: start of current month)')
+        parser.add_argument('--root', help='Archive directory (default: settings.ENERGY_ARCHIVE_DIR)')
+        parser.add_argument('--verify', action='store_true', help='Only verify checksums of existing segments')
+
+    def handle(self, *args, **options):
+        archive = ColumnarArchive(options['root'])
+        if options['verify']:
+            problems = archive.verify()
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(problem))
+            if problems:
+                raise CommandError(f"{len(problems)} archive files failed verification")
+            self.stdout.write(self.style.SUCCESS(f"{len(archive.segments())} segments verified"))
+            return
+
+        today = timezone.localdate()
+        until = local_midnight(datetime.strptime(options['until'], '%Y-%m-%d').date()) if options['until'] \
+            else local_midnight(today.replace(day=1))
+        if archive.end is not None:
+            start = datetime.fromtimestamp(archive.end, timezone.get_current_timezone())
+        else:
+            oldest = EnergyLog.objects.aggregate(first=Min('timestamp'))['first']
+            if oldest is None:
+                self.stdout.write("No EnergyLog rows to archive")
+                return
+            start = local_midnight(timezone.localtime(oldest).date().replace(day=1))
+
+        segments = 0
+        while start < until:
+            end = min(local_midnight(next_month(timezone.localtime(start).date())), until)
+            meta = archive.append(start, end)
+            segments += 1
+            self.stdout.write(f"{meta['name']}: {meta['rows']} rows, {meta['rooms']} rooms")
+            start = end
+        self.stdout.write(self.style.SUCCESS(f"Appended {segments} segments to {archive.root}"))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from core.services.retention import (
+    DEFAULT_ARCHIVE_DAYS, DEFAULT_BATCH_SIZE, DEFAULT_KEEP_DAYS, RetentionManager,
+)
+
+
+class Command(BaseCommand):
+    help = "Roll EnergyLog rows older than --keep-days into daily rollups, archive them by month and prune the hot table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=DEFAULT_KEEP_DAYS, help='Raw rows kept in EnergyLog')
+        parser.add_argument('--archive-days', type=int, default=DEFAULT_ARCHIVE_DAYS,
+                            help='Archive months older than this are dropped')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per transaction')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Pause between batches, seconds')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches')
+        parser.add_argument('--no-archive', action='store_true', help='Keep only rollups, do not copy raw rows')
+        parser.add_argument('--dry-run', action='store_true', help='Only count rows that would be compacted')
+
+    def handle(self, *args, **options):
+        manager = RetentionManager(
+            keep_days=options['keep_days'], archive_days=options['archive_days'],
+            batch_size=options['batch_size'], archive=not options['no_archive'], pause=options['sleep'],
+            log=lambda message: self.stdout.write(message) if options['verbosity'] > 1 else None,
+        )
+        if options['dry_run']:
+            self.stdout.write(f"{manager.pending().count()} rows older than {manager.cutoff:%Y-%m-%d} to compact")
+            return
+
+        summary = manager.run(max_batches=options['max_batches'])
+        dropped = ', '.join(f"{month:%Y-%m}" for month in summary['dropped_months']) or 'none'
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {summary['rows']} rows older than {summary['cutoff']:%Y-%m-%d} "
+            f"in {summary['batches']} batches; dropped archive months: {dropped}"
+        ))
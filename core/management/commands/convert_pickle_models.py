@@ -0,0 +1,48 @@
+import pickle
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import OccupancyPredictionModel
+from core.services.model_registry import LinearModel, registry
+
+
+class Command(BaseCommand):
+    help = ("One-off migration: rewrite legacy pickled sklearn models of OccupancyPredictionModel as .npz. "
+            "Unpickling executes code from the files, run it only on model files you trust")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trust-pickle', action='store_true',
+                            help='Confirm that the stored pickle files come from a trusted source')
+        parser.add_argument('--dry-run', action='store_true', help='Only list models that need conversion')
+
+    def handle(self, *args, **options):
+        if not options['trust_pickle'] and not options['dry_run']:
+            raise CommandError("pickle.loads runs arbitrary code; pass --trust-pickle to convert")
+
+        converted = skipped = 0
+        for record in OccupancyPredictionModel.objects.exclude(model_file='').exclude(model_file=None).iterator():
+            with record.model_file.open('rb') as fh:
+                raw = fh.read()
+            if raw[:2] == b'PK':  # уже .npz
+                continue
+            if options['dry_run']:
+                self.stdout.write(f"{record.model_file.name} (room {record.room_id})")
+                skipped += 1
+                continue
+
+            try:
+                # sklearn нужен только здесь, для распаковки старых моделей
+                model = LinearModel.from_estimator(pickle.loads(raw))
+            except Exception as e:
+                self.stderr.write(f"{record.model_file.name}: {e}")
+                skipped += 1
+                continue
+            old_name = record.model_file.name
+            record.model_file.save(f'{record.model_name}_{record.room_id}.npz', ContentFile(model.dumps()), save=False)
+            record.save(update_fields=['model_file'])
+            record.model_file.storage.delete(old_name)
+            registry.invalidate(record.model_name, record.room_id)
+            converted += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} pickled models, {skipped} left as is"))
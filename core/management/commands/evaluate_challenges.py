@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.services.challenges import evaluator
+
+
+class Command(BaseCommand):
+    help = "Consume new EnergyLog rows and award EnergyChallenge achievements (incremental, watermark-based)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running')
+        parser.add_argument('--interval', type=float, default=60, help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            summary = evaluator.run()
+            self.stdout.write(
+                f"{summary['events']} events, {summary['challenges']} challenges in "
+                f"{summary['windows']} windows, {summary['awarded']} achievements awarded "
+                f"(watermark {evaluator.watermark})"
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.weather import ForecastFetcher
+
+
+class Command(BaseCommand):
+    help = "Fetch the current observation and hourly forecast in one request and upsert them into WeatherSample"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Forecast endpoint (default: settings.WEATHER_FORECAST_URL)')
+
+    def handle(self, *args, **options):
+        try:
+            counts = ForecastFetcher(url=options['url']).fetch()
+        except Exception as e:
+            raise CommandError(f"Forecast fetch failed: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {counts['observations']} observations and {counts['forecasts']} forecast hours"
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.services.energy_forecast import EnergyForecaster, store
+
+
+class Command(BaseCommand):
+    help = "Fit the hourly energy forecast for all rooms and store it for the API and the predictions page"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=730)
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rooms per query chunk')
+        parser.add_argument('--loop', action='store_true', help='Keep refitting')
+        parser.add_argument('--interval', type=float, default=3600, help='Seconds between fits with --loop')
+
+    def handle(self, *args, **options):
+        forecaster = EnergyForecaster(history_days=options['history_days'], chunk_size=options['chunk_size'])
+        while True:
+            model = forecaster.fit()
+            store.save(model)
+            self.stdout.write(self.style.SUCCESS(
+                f"Fitted {len(model['room_ids'])} rooms from {model['rows']} hourly rows "
+                f"in {model['fit_seconds']:.1f}s -> {store.path}"
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.services.leaderboard import PERIODS, leaderboard
+
+
+class Command(BaseCommand):
+    help = "Recompute leaderboards from UserAchievement (period rollover, consistency check)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', choices=PERIODS, nargs='*', help='Only these periods')
+
+    def handle(self, *args, **options):
+        for period in options['period'] or PERIODS:
+            board = leaderboard.rebuild(period)
+            self.stdout.write(f"{period}: {len(board.index)} users")
+        self.stdout.write(self.style.SUCCESS("Leaderboards rebuilt"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.services.impact import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute impact counters from EnergyLog/Recommendation and report (optionally fix) drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Overwrite drifted counters with recomputed values')
+        parser.add_argument('--tolerance', type=float, default=0.01, help='Allowed absolute difference per field')
+
+    def handle(self, *args, **options):
+        drift = reconcile(fix=options['fix'], tolerance=options['tolerance'])
+        for row in drift:
+            self.stdout.write(
+                f"building {row['building_id']} {row['month']:%Y-%m} {row['field']}: "
+                f"counter {row['counter']:.2f}, actual {row['actual']:.2f}"
+            )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Impact counters are in sync"))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drift)} drifted values"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} drifted values (run with --fix to repair)"))
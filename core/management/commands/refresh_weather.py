@@ -0,0 +1,46 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.weather import ForecastFetcher, WeatherRefresher, refresher_lock
+
+
+class Command(BaseCommand):
+    help = ("Refresh weather from the upstream API (with retries and jittered backoff) and prune old rows; "
+            "request handlers only read the stored data")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep refreshing every --interval seconds')
+        parser.add_argument('--interval', type=int, default=settings.WEATHER_REFRESH_INTERVAL)
+        parser.add_argument('--retries', type=int, default=4, help='Attempts per upstream request')
+        parser.add_argument('--url', help='Forecast endpoint (default: settings.WEATHER_FORECAST_URL)')
+        parser.add_argument('--current-url', help='Current weather endpoint (default: settings.WEATHER_CURRENT_URL)')
+        parser.add_argument('--prune-only', action='store_true', help='Only delete old WeatherCache/WeatherSample rows')
+
+    def handle(self, *args, **options):
+        if options['prune_only']:
+            self.stdout.write(f"Pruned {WeatherRefresher.prune()} rows")
+            return
+
+        refresher = WeatherRefresher(
+            fetcher=ForecastFetcher(url=options['url']), current_url=options['current_url'],
+            retries=options['retries'],
+        )
+        with refresher_lock() as acquired:
+            if not acquired:
+                raise CommandError("Another weather refresher is running (lock held)")
+            if options['loop']:
+                self.stdout.write(f"Refreshing weather every {options['interval']}s")
+                try:
+                    refresher.run_forever(options['interval'], threading.Event(), log=self.stdout.write)
+                except KeyboardInterrupt:
+                    return
+            summary = refresher.refresh()
+            if summary['error'] and not summary['observation']:
+                raise CommandError(f"Weather refresh failed: {summary['error']}")
+            self.stdout.write(self.style.SUCCESS(
+                f"Stored observation={summary['observation']}, {summary['forecasts']} forecast hours, "
+                f"pruned {summary['pruned']} rows after {refresher.attempts} requests"
+                + (f" ({summary['error']})" if summary['error'] else '')
+            ))
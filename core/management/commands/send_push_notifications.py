@@ -0,0 +1,30 @@
+import threading
+
+from django.core.management.base import BaseCommand
+
+from core.services.push import BATCH_SIZE, MAX_ATTEMPTS, PushWorker
+
+
+class Command(BaseCommand):
+    help = "Deliver queued push notifications: multicast batches per provider, rate-limited, with retries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Outbox rows claimed per pass')
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+        parser.add_argument('--max-batches', type=int, help='Stop after this many passes')
+
+    def handle(self, *args, **options):
+        worker = PushWorker(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+        if options['loop']:
+            self.stdout.write(f"Delivering push notifications every {options['interval']}s")
+            try:
+                worker.run_forever(options['interval'], threading.Event(), log=self.stdout.write)
+            except KeyboardInterrupt:
+                return
+        stats = worker.run(options['max_batches'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {stats['sent']}, retrying {stats['retried']}, failed {stats['failed']} "
+            f"in {stats['calls']} provider calls ({stats['batches']} batches)"
+        ))
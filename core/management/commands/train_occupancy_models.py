@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.services.training_pipeline import TrainingPipeline
+
+
+class Command(BaseCommand):
+    help = "Build hourly TrainingData from logs and train per-room occupancy models (incremental)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, nargs='*', help='Only these room ids')
+        parser.add_argument('--workers', type=int, default=None, help='Training processes (default: CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Rooms per query chunk')
+        parser.add_argument('--retrain-all', action='store_true',
+                            help='Retrain every room, not only rooms with new rows')
+
+    def handle(self, *args, **options):
+        pipeline = TrainingPipeline(
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write,
+        )
+        summary = pipeline.run(room_ids=options['rooms'] or None, retrain_all=options['retrain_all'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {summary['rows']} new feature rows, {summary['models']} models trained"
+        ))
@@ -0,0 +1,247 @@
+# core/middleware.py
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from .services.http_client import IntegrationMetrics, metrics_snapshot
+
+logger = logging.getLogger('thermasense.slow_requests')
+
+SLOW_REQUEST_MS = 500
+SLOW_LOG_TOP_SQL = 5
+SERVER_TIMING = 'total;dur=%.1f, db;dur=%.1f;desc="%d queries, %d duplicates", cache;desc="%d hits, %d misses"'
+_missing = object()
+_profile = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Что произошло за запрос: SQL (текст, параметры, длительность) и обращения к кэшу"""
+
+    __slots__ = ('queries', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper: длительность каждого запроса, без разбора SQL на горячем пути
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, None if many else params, time.perf_counter() - start))
+
+    @property
+    def db_time(self):
+        return sum(query[2] for query in self.queries)
+
+    def duplicates(self):
+        """Число повторов одного и того же SQL с теми же параметрами (кандидаты на кэш / N+1)"""
+        if len(self.queries) < 2:
+            return 0
+        counts = Counter((sql, repr(params)) for sql, params, _ in self.queries if params is not None)
+        return sum(count - 1 for count in counts.values() if count > 1)
+
+    def top_sql(self, limit=SLOW_LOG_TOP_SQL):
+        """Самые дорогие шаблоны SQL: [(sql, число выполнений, суммарное время)]"""
+        totals = {}
+        for sql, _, duration in self.queries:
+            count, total = totals.get(sql, (0, 0.0))
+            totals[sql] = (count + 1, total + duration)
+        ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [(sql, count, total) for sql, (count, total) in ranked]
+
+
+class ViewMetrics:
+    """Накопленные метрики одного view: гистограмма задержек, SQL и кэш"""
+
+    def __init__(self):
+        self.latency = IntegrationMetrics()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.duplicate_queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, status, profile, db_time, duplicates):
+        self.latency.observe(seconds, 'http_5xx' if status >= 500 else None)
+        with self._lock:
+            self.db_queries += len(profile.queries)
+            self.db_seconds += db_time
+            self.duplicate_queries += duplicates
+            self.cache_hits += profile.cache_hits
+            self.cache_misses += profile.cache_misses
+
+
+_views = {}
+_views_lock = threading.Lock()
+
+
+def view_metrics(name):
+    metrics = _views.get(name)
+    if metrics is None:
+        with _views_lock:
+            metrics = _views.setdefault(name, ViewMetrics())
+    return metrics
+
+
+def views_snapshot():
+    """{view: ViewMetrics} - для /metrics и бенчмарков"""
+    return dict(_views)
+
+
+def reset_metrics():
+    with _views_lock:
+        _views.clear()
+
+
+def _instrument_cache_class(cls):
+    """Считать попадания get/get_many текущего запроса; класс бэкенда патчится один раз"""
+    if getattr(cls, '_perf_instrumented', False):
+        return
+    original_get, original_get_many = cls.get, cls.get_many
+
+    def get(self, key, default=None, version=None):
+        value = original_get(self, key, _missing, version=version)
+        profile = _profile.get()
+        if profile is not None:
+            if value is _missing:
+                profile.cache_misses += 1
+            else:
+                profile.cache_hits += 1
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = original_get_many(self, keys, version=version)
+        profile = _profile.get()
+        if profile is not None:
+            profile.cache_hits += len(values)
+            profile.cache_misses += len(keys) - len(values)
+        return values
+
+    cls.get, cls.get_many, cls._perf_instrumented = get, get_many, True
+
+
+class PerformanceMiddleware:
+    """
+    Профиль каждого запроса: время ответа, число и время SQL (execute_wrapper
+    на всех подключениях), повторяющиеся запросы, попадания в кэш. Пишет
+    заголовок Server-Timing, копит метрики по view для /metrics и логирует
+    медленные запросы (дольше PERF_SLOW_REQUEST_MS) с самыми дорогими SQL.
+    Метрики - на процесс: каждый воркер gunicorn отдаёт свои.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, 'PERF_SLOW_REQUEST_MS', SLOW_REQUEST_MS) / 1000
+        self.aliases = list(connections)
+        for alias in settings.CACHES:
+            _instrument_cache_class(type(caches[alias]))
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        # То же, что connection.execute_wrapper(), без контекстных менеджеров на каждый запрос
+        wrapped = [connections[alias] for alias in self.aliases]
+        for connection in wrapped:
+            connection.execute_wrappers.append(profile)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            for connection in wrapped:
+                connection.execute_wrappers.remove(profile)
+            _profile.reset(token)
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else 'unresolved'
+        db_time = profile.db_time
+        duplicates = profile.duplicates()
+        view_metrics(view).observe(elapsed, response.status_code, profile, db_time, duplicates)
+
+        response['Server-Timing'] = SERVER_TIMING % (
+            elapsed * 1000, db_time * 1000, len(profile.queries), duplicates,
+            profile.cache_hits, profile.cache_misses,
+        )
+        if elapsed >= self.slow_seconds:
+            self.log_slow(request, view, elapsed, profile, duplicates)
+        return response
+
+    @staticmethod
+    def log_slow(request, view, elapsed, profile, duplicates):
+        lines = [
+            f"Slow request {request.method} {request.path} ({view}): {elapsed * 1000:.0f} ms, "
+            f"{len(profile.queries)} queries in {profile.db_time * 1000:.0f} ms, {duplicates} duplicates"
+        ]
+        for sql, count, total in profile.top_sql():
+            lines.append(f"  {total * 1000:8.1f} ms x{count:<4} {sql[:300]}")
+        logger.warning('\n'.join(lines))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _histogram(lines, name, labels, snapshot):
+    for bound, count in snapshot['latency_buckets'].items():
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {snapshot['latency_sum']}")
+    lines.append(f"{name}_count{_labels(**labels)} {snapshot['requests']}")
+
+
+def render_prometheus():
+    """Метрики процесса в текстовом формате Prometheus: view и исходящие интеграции"""
+    lines = []
+    views = sorted(views_snapshot().items())
+    counters = [
+        ('thermasense_db_queries_total', 'SQL queries executed', 'db_queries'),
+        ('thermasense_db_query_seconds_total', 'Time spent in SQL', 'db_seconds'),
+        ('thermasense_db_duplicate_queries_total', 'Repeated identical SQL within a request', 'duplicate_queries'),
+        ('thermasense_cache_hits_total', 'Cache hits', 'cache_hits'),
+        ('thermasense_cache_misses_total', 'Cache misses', 'cache_misses'),
+    ]
+    lines += ['# HELP thermasense_http_request_duration_seconds Request latency by view',
+              '# TYPE thermasense_http_request_duration_seconds histogram']
+    for view, metrics in views:
+        _histogram(lines, 'thermasense_http_request_duration_seconds', {'view': view}, metrics.latency.snapshot())
+    lines += ['# HELP thermasense_http_server_errors_total Responses with status 5xx',
+              '# TYPE thermasense_http_server_errors_total counter']
+    for view, metrics in views:
+        lines.append(f"thermasense_http_server_errors_total{_labels(view=view)} "
+                     f"{metrics.latency.errors.get('http_5xx', 0)}")
+    for name, help_text, attribute in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for view, metrics in views:
+            value = getattr(metrics, attribute)
+            lines.append(f"{name}{_labels(view=view)} {round(value, 6) if isinstance(value, float) else value}")
+
+    outbound = sorted(metrics_snapshot().items())
+    lines += ['# HELP thermasense_outbound_request_duration_seconds Outbound HTTP latency by integration',
+              '# TYPE thermasense_outbound_request_duration_seconds histogram']
+    for integration, data in outbound:
+        _histogram(lines, 'thermasense_outbound_request_duration_seconds', {'integration': integration}, data)
+    lines += ['# HELP thermasense_outbound_errors_total Outbound HTTP errors by kind',
+              '# TYPE thermasense_outbound_errors_total counter']
+    for integration, data in outbound:
+        for kind, count in sorted(data['errors'].items()):
+            lines.append(f"thermasense_outbound_errors_total{_labels(integration=integration, kind=kind)} {count}")
+    lines += ['# HELP thermasense_outbound_circuit_open 1 if the circuit breaker is not closed',
+              '# TYPE thermasense_outbound_circuit_open gauge']
+    for integration, data in outbound:
+        lines.append(f"thermasense_outbound_circuit_open{_labels(integration=integration)} "
+                     f"{int(data['circuit'] != 'closed')}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-19 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_energychallenge_occupancypredictionmodel_leaderboard_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='energylog',
+            index=models.Index(fields=['room', 'timestamp'], name='core_energy_room_id_7c00cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='energylog',
+            index=models.Index(fields=['timestamp'], name='core_energy_timesta_8a552d_idx'),
+        ),
+    ]
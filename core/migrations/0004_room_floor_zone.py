@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-19 00:52
+
+import re
+
+from django.db import migrations, models
+
+
+def guess_floors(apps, schema_editor):
+    """Номер этажа из названия комнаты: первая цифра трёхзначного номера (101 -> 1)"""
+    Room = apps.get_model('core', 'Room')
+    rooms = []
+    for room in Room.objects.only('id', 'name'):
+        match = re.search(r'\b(\d{1,2})\d{2}\b', room.name)
+        if match:
+            room.floor = int(match.group(1))
+            rooms.append(room)
+    Room.objects.bulk_update(rooms, ['floor'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_energylog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='floor',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='zone',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['building', 'floor'], name='core_room_buildin_21244c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['building', 'zone'], name='core_room_buildin_77e639_idx'),
+        ),
+        migrations.RunPython(guess_floors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-19 00:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_room_floor_zone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImpactCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('energy_saved_kwh', models.FloatField(default=0)),
+                ('energy_consumed_kwh', models.FloatField(default=0)),
+                ('co2_saved_kg', models.FloatField(default=0)),
+                ('log_count', models.IntegerField(default=0)),
+                ('recommendations_applied', models.IntegerField(default=0)),
+                ('recommendation_savings_kwh', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='impact_counters', to='core.building')),
+            ],
+            options={
+                'verbose_name': 'Impact Counter',
+                'verbose_name_plural': 'Impact Counters',
+                'ordering': ['-month'],
+                'unique_together': {('building', 'month')},
+            },
+        ),
+    ]
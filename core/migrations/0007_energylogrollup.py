@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-19 01:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_leaderboard_period_start'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnergyLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('samples', models.IntegerField(default=0)),
+                ('temperature_inside_sum', models.FloatField(default=0)),
+                ('temperature_outside_sum', models.FloatField(default=0)),
+                ('heating_power_sum', models.FloatField(default=0)),
+                ('heating_power_max', models.FloatField(default=0)),
+                ('co2_saved_sum', models.FloatField(default=0)),
+                ('saved_kwh', models.FloatField(default=0)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='energy_rollups', to='core.room')),
+            ],
+            options={
+                'verbose_name': 'Energy Log Rollup',
+                'verbose_name_plural': 'Energy Log Rollups',
+                'indexes': [models.Index(fields=['day'], name='core_energy_day_fce8e3_idx')],
+                'unique_together': {('room', 'day')},
+            },
+        ),
+    ]
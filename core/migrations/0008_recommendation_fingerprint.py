@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-19 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_energylogrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recommendation',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(condition=models.Q(('is_applied', False)), fields=['-priority', '-created_at'], name='recommendation_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(condition=models.Q(('is_applied', True)), fields=['-priority', '-created_at'], name='recommendation_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(condition=models.Q(('is_applied', False)), fields=['expires_at'], name='recommendation_expiry_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recommendation',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_applied', False), models.Q(('fingerprint', ''), _negated=True)), fields=('fingerprint',), name='unique_pending_recommendation'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-19 01:48
+
+from django.db import migrations, models
+
+PRIORITIES = {'low': 1, 'medium': 2, 'high': 3}
+
+
+def names_to_codes(apps, schema_editor):
+    # Значения переводятся в строки '1'..'3' до смены типа колонки, дальше AlterField приводит их к числу
+    Recommendation = apps.get_model('core', 'Recommendation')
+    for name, code in PRIORITIES.items():
+        Recommendation.objects.filter(priority=name).update(priority=str(code))
+    Recommendation.objects.exclude(priority__in=[str(code) for code in PRIORITIES.values()]).update(priority='2')
+
+
+def codes_to_names(apps, schema_editor):
+    Recommendation = apps.get_model('core', 'Recommendation')
+    for name, code in PRIORITIES.items():
+        Recommendation.objects.filter(priority=str(code)).update(priority=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recommendation_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recommendation',
+            name='recommendation_pending_idx',
+        ),
+        migrations.RunPython(names_to_codes, codes_to_names),
+        migrations.AlterField(
+            model_name='recommendation',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], default=2),
+        ),
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(condition=models.Q(('is_applied', False)), fields=['-priority', '-created_at', 'estimated_savings'], name='recommendation_pending_idx'),
+        ),
+    ]
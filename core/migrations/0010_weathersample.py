@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-19 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recommendation_priority_integer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('observation', 'Observation'), ('forecast', 'Forecast')], max_length=20)),
+                ('valid_time', models.DateTimeField()),
+                ('temperature', models.FloatField()),
+                ('humidity', models.FloatField(blank=True, null=True)),
+                ('wind_speed', models.FloatField(blank=True, null=True)),
+                ('description', models.CharField(blank=True, max_length=200)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Weather Sample',
+                'verbose_name_plural': 'Weather Samples',
+                'indexes': [models.Index(fields=['valid_time'], name='core_weathe_valid_t_dfac39_idx')],
+                'unique_together': {('kind', 'valid_time')},
+            },
+        ),
+    ]
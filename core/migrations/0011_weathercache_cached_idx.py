@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-19 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_weathersample'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='weathercache',
+            index=models.Index(fields=['-cached_at'], name='weathercache_cached_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_leaderboard_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challengeprogress',
+            name='credited_kwh',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-19 02:55
+
+from django.db import migrations, models
+from django.db.models import F
+
+ARCHIVE_PREFIX = 'core_energylog_archive'
+
+
+def backfill(apps, schema_editor):
+    # Старые логи считались почасовыми: свёрнутое потребление = сумма мощностей * 1 час
+    EnergyLogRollup = apps.get_model('core', 'EnergyLogRollup')
+    EnergyLogRollup.objects.update(consumed_kwh=F('heating_power_sum'))
+
+    # Архив (ArchiveStore) копирует все колонки EnergyLog - добавляем новую и в уже созданные таблицы
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        tables = [info.name for info in connection.introspection.get_table_list(cursor) if info.type in ('t', 'p')]
+        if connection.vendor == 'postgresql':
+            # Столбец родителя секций наследуют сами секции
+            tables = [name for name in tables if name == ARCHIVE_PREFIX]
+        else:
+            tables = [name for name in tables if name.startswith(f'{ARCHIVE_PREFIX}_')]
+        for table in tables:
+            columns = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+            if 'interval_hours' not in columns:
+                cursor.execute(
+                    f"ALTER TABLE {quote(table)} ADD COLUMN {quote('interval_hours')} double precision "
+                    f"NOT NULL DEFAULT 1.0"
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_challenge_progress_credited'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='energylog',
+            name='interval_hours',
+            field=models.FloatField(db_default=1.0, default=1.0),
+        ),
+        migrations.AddField(
+            model_name='energylogrollup',
+            name='consumed_kwh',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_energy_log_interval'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challengewindow',
+            name='scanned_log_id',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
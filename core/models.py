@@ -36,6 +36,8 @@ class Room(models.Model):
         default=1.0,
         validators=[MinValueValidator(0.1), MaxValueValidator(5.0)]
     )
+    floor = models.IntegerField(default=1)
+    zone = models.CharField(max_length=50, blank=True)
     heating_status = models.BooleanField(default=False)
     target_temperature = models.FloatField(default=22.0)
     comfort_temperature = models.FloatField(default=18.0)
@@ -58,6 +60,10 @@ class Room(models.Model):
     class Meta:
         verbose_name = "Room"
         verbose_name_plural = "Rooms"
+        indexes = [
+            models.Index(fields=['building', 'floor']),
+            models.Index(fields=['building', 'zone']),
+        ]
 
 
 class OccupancyLog(models.Model):
@@ -106,6 +112,35 @@ class WeatherCache(models.Model):
         verbose_name = "Weather Cache"
         verbose_name_plural = "Weather Cache"
         ordering = ['-cached_at']
+        # Запросы читают последнюю строку, очистка удаляет старые - обе по времени
+        indexes = [models.Index(fields=['-cached_at'], name='weathercache_cached_idx')]
+
+
+class WeatherSample(models.Model):
+    """Погодный ряд: наблюдения и почасовой прогноз по времени, на которое они действуют"""
+    KIND_CHOICES = [
+        ('observation', 'Observation'),
+        ('forecast', 'Forecast'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    valid_time = models.DateTimeField()
+    temperature = models.FloatField()
+    humidity = models.FloatField(null=True, blank=True)
+    wind_speed = models.FloatField(null=True, blank=True)
+    description = models.CharField(max_length=200, blank=True)
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.valid_time:%Y-%m-%d %H:%M}: {self.temperature}°C"
+
+    class Meta:
+        verbose_name = "Weather Sample"
+        verbose_name_plural = "Weather Samples"
+        unique_together = ['kind', 'valid_time']
+        indexes = [
+            models.Index(fields=['valid_time']),
+        ]
 
 
 class EnergyLog(models.Model):
@@ -115,36 +150,166 @@ class EnergyLog(models.Model):
     temperature_outside = models.FloatField()
     heating_power = models.FloatField(default=0)
     co2_saved = models.FloatField(default=0)
+    # Сколько часов представляет отсчёт (шаг записи): энергия строки = heating_power * interval_hours
+    interval_hours = models.FloatField(default=1.0, db_default=1.0)
 
     class Meta:
         verbose_name = "Energy Log"
         verbose_name_plural = "Energy Logs"
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['room', 'timestamp']),
+            models.Index(fields=['timestamp']),
+        ]
+
+
+class EnergyLogRollup(models.Model):
+    """Суточные агрегаты EnergyLog по комнате - то, что остаётся после компактации старых логов"""
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='energy_rollups')
+    day = models.DateField()
+    samples = models.IntegerField(default=0)
+    temperature_inside_sum = models.FloatField(default=0)
+    temperature_outside_sum = models.FloatField(default=0)
+    heating_power_sum = models.FloatField(default=0)
+    heating_power_max = models.FloatField(default=0)
+    co2_saved_sum = models.FloatField(default=0)
+    consumed_kwh = models.FloatField(default=0)
+    saved_kwh = models.FloatField(default=0)  # экономия относительно постоянного отопления
+
+    @property
+    def temperature_inside_avg(self):
+        return self.temperature_inside_sum / self.samples if self.samples else None
+
+    @property
+    def temperature_outside_avg(self):
+        return self.temperature_outside_sum / self.samples if self.samples else None
+
+    def __str__(self):
+        return f"{self.room.name} {self.day}"
+
+    class Meta:
+        verbose_name = "Energy Log Rollup"
+        verbose_name_plural = "Energy Log Rollups"
+        unique_together = ['room', 'day']
+        indexes = [
+            models.Index(fields=['day']),
+        ]
 
 
 class Recommendation(models.Model):
+    # Приоритет - число: сортировка -priority идёт от высокого к низкому и ложится на индекс
+    LOW, MEDIUM, HIGH = 1, 2, 3
     PRIORITY_CHOICES = [
-        ('low', 'Low'),
-        ('medium', 'Medium'),
-        ('high', 'High'),
+        (LOW, 'Low'),
+        (MEDIUM, 'Medium'),
+        (HIGH, 'High'),
     ]
+    PRIORITY_NAMES = {LOW: 'low', MEDIUM: 'medium', HIGH: 'high'}
+    PRIORITY_BY_NAME = {name: value for value, name in PRIORITY_NAMES.items()}
 
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='recommendations')
     message = models.TextField()
     recommended_action = models.CharField(max_length=200)
     estimated_savings = models.FloatField()
-    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=MEDIUM)
     is_applied = models.BooleanField(default=False)
     applied_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Отпечаток (комната, действие, окно времени) - повторная генерация обновляет строку, а не плодит новую
+    fingerprint = models.CharField(max_length=40, blank=True, default='', editable=False)
+    expires_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"Recommendation for {self.room.name}"
 
+    @property
+    def priority_name(self):
+        """'low' / 'medium' / 'high' - прежнее строковое значение (API, шаблоны)"""
+        return self.PRIORITY_NAMES.get(self.priority)
+
     class Meta:
         verbose_name = "Recommendation"
         verbose_name_plural = "Recommendations"
         ordering = ['-priority', '-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fingerprint'],
+                condition=models.Q(is_applied=False) & ~models.Q(fingerprint=''),
+                name='unique_pending_recommendation',
+            ),
+        ]
+        # Составной индекс (is_applied, priority, created_at) в виде частичных: условие совпадает
+        # с фильтром is_applied (SQLite не ищет по индексу для NOT is_applied), порядок - с ordering.
+        # estimated_savings в ключе - топ очереди для дашборда читается только из индекса.
+        indexes = [
+            models.Index(fields=['-priority', '-created_at', 'estimated_savings'], condition=models.Q(is_applied=False),
+                         name='recommendation_pending_idx'),
+            models.Index(fields=['-priority', '-created_at'], condition=models.Q(is_applied=True),
+                         name='recommendation_applied_idx'),
+            models.Index(fields=['expires_at'], condition=models.Q(is_applied=False),
+                         name='recommendation_expiry_idx'),
+        ]
+
+
+class PushNotification(models.Model):
+    """Исходящая очередь push-уведомлений (outbox): API только добавляет строки, отправляет воркер"""
+    PENDING, SENDING, SENT, FAILED = 'pending', 'sending', 'sent', 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    provider = models.CharField(max_length=20, default='fcm')
+    device_token = models.CharField(max_length=255)
+    message = models.TextField()
+    room = models.ForeignKey(Room, on_delete=models.SET_NULL, null=True, blank=True, related_name='push_notifications')
+    # Отпечаток (токен, текст, комната, окно времени) - повторная постановка не шлёт дубль
+    dedup_key = models.CharField(max_length=40, unique=True, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    provider_message_id = models.CharField(max_length=200, blank=True)
+    last_error = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.provider} -> {self.device_token[:12]}… ({self.status})"
+
+    class Meta:
+        verbose_name = "Push Notification"
+        verbose_name_plural = "Push Notifications"
+        ordering = ['-created_at']
+        # Воркер выбирает готовые к отправке и зависшие в sending - частичные индексы по своим статусам
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'), name='push_pending_idx'),
+            models.Index(fields=['claimed_at'], condition=models.Q(status='sending'), name='push_sending_idx'),
+        ]
+
+
+class ImpactCounter(models.Model):
+    """Накопительные счётчики эффекта по зданию за месяц (обновляются инкрементально)"""
+    building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name='impact_counters')
+    month = models.DateField()  # первое число месяца
+    energy_saved_kwh = models.FloatField(default=0)
+    energy_consumed_kwh = models.FloatField(default=0)
+    co2_saved_kg = models.FloatField(default=0)
+    log_count = models.IntegerField(default=0)
+    recommendations_applied = models.IntegerField(default=0)
+    recommendation_savings_kwh = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.building.name} {self.month:%Y-%m}"
+
+    class Meta:
+        verbose_name = "Impact Counter"
+        verbose_name_plural = "Impact Counters"
+        unique_together = ['building', 'month']
+        ordering = ['-month']
 
 
 class OccupancyPredictionModel(models.Model):
@@ -208,6 +373,30 @@ class UserAchievement(models.Model):
         unique_together = ['user', 'achievement_type', 'challenge']
 
 
+class ChallengeWindow(models.Model):
+    """Окно дат челленджей и водяной знак его оценки (ChallengeEvaluator)"""
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    last_log_id = models.BigIntegerField(default=0)  # EnergyLog.id, до которого учтены суммы
+    scanned_log_id = models.BigIntegerField(default=0)  # последний прочитанный id; хвост после last_log_id перечитывается
+    challenge_ids = models.JSONField(default=list)  # челленджи окна, уже проверенные на достигнутые цели
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['start', 'end']
+
+
+class ChallengeProgress(models.Model):
+    """Накопленная экономия пользователя в окне челленджей"""
+    window = models.ForeignKey(ChallengeWindow, on_delete=models.CASCADE, related_name='progress')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    saved_kwh = models.FloatField(default=0)
+    credited_kwh = models.FloatField(default=0)  # часть saved_kwh, уже зачтённая наградами
+
+    class Meta:
+        unique_together = ['window', 'user']
+
+
 class Leaderboard(models.Model):
     """Таблица лидеров"""
     period = models.CharField(max_length=50, choices=[
@@ -221,8 +410,19 @@ class Leaderboard(models.Model):
     energy_saved = models.FloatField()  # kWh
     co2_reduced = models.FloatField()  # kg
     rank = models.IntegerField()
+    period_start = models.DateField(null=True, blank=True)  # начало окна периода (None для all_time)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['period', 'user']
+        indexes = [
+            models.Index(fields=['period', 'rank']),
+            models.Index(fields=['period', 'points']),
+        ]
+
+
+class LeaderboardVersion(models.Model):
+    """Версия таблицы лидеров периода: сдвигает каждый писатель, пока держит блокировку строки"""
+    period = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
         
\ No newline at end of file
@@ -1,94 +1,187 @@
 import numpy as np
-from sklearn.linear_model import LinearRegression
 from django.utils import timezone
 from datetime import timedelta
 
+from .model_registry import registry as default_registry, DEFAULT_COOLDOWN_MODEL
+
 
 class AdvancedThermalCalculator:
     """Улучшенный калькулятор с ML предсказаниями"""
 
-    def __init__(self):
-        self.models = {}
+    COOLDOWN_MODEL_NAME = 'cooldown_linear'
+    HISTORY_WINDOW = timedelta(hours=24)
+    CORRECTIONS = ('window_factor', 'door_factor', 'heating_history', 'sunlight_factor', 'ventilation_factor')
+    RESULT_DTYPE = np.dtype(
+        [('room_id', np.int64), ('cooldown_time', np.float64), ('ml_prediction', np.float64)]
+        + [(name, np.float64) for name in CORRECTIONS]
+        + [('confidence', np.float64)]
+    )
+
+    def __init__(self, models=None):
+        self.models = models or default_registry
 
-    def calculate_dynamic_cooldown(self, room, weather_data, historical_data):
+    def calculate_dynamic_cooldown(self, room, weather_data, historical_data=None):
         """
         Динамический расчет с учетом множества факторов
         """
-        # Базовые параметры
-        base_time = self._calculate_base_cooldown(room, weather_data)
+        history = {room.id: historical_data} if historical_data is not None else None
+        row = self.calculate_dynamic_cooldown_many([room], weather_data, history)[0]
 
-        # Коррекции
-        corrections = {
-            'window_factor': self._window_correction(room),
-            'door_factor': self._door_usage_correction(historical_data),
-            'heating_history': self._heating_history_correction(room),
-            'sunlight_factor': self._sunlight_correction(room, weather_data),
-            'ventilation_factor': self._ventilation_correction(historical_data)
+        return {
+            'cooldown_time': float(row['cooldown_time']),
+            'ml_prediction': float(row['ml_prediction']),
+            'corrections': {name: float(row[name]) for name in self.CORRECTIONS},
+            'confidence': float(row['confidence'])
         }
 
-        # Применяем коррекции
-        total_correction = 1.0
-        for factor in corrections.values():
-            total_correction *= factor
+    def calculate_dynamic_cooldown_many(self, rooms, weather_data, history=None):
+        """
+        Пакетный расчет для всех комнат: признаки комнат собираются в массивы,
+        коррекции считаются векторно. history - {room_id: агрегаты}, по умолчанию
+        агрегаты за последние сутки выбираются одним запросом (fetch_history).
+        """
+        rooms = list(rooms)
+        room_ids = [room.id for room in rooms]
+        if history is None:
+            history = self.fetch_history(room_ids)
+
+        # Матрица признаков комнат
+        area = np.array([room.area for room in rooms], dtype=np.float64)
+        heat_loss = np.array([room.get_heat_loss_factor() for room in rooms], dtype=np.float64)
+        target = np.array([room.target_temperature for room in rooms], dtype=np.float64)
+        has_windows = np.array([bool(getattr(room, 'has_windows', False)) for room in rooms])
+
+        # Агрегаты истории
+        empty = {}
+        sessions = np.array([history.get(i, empty).get('sessions', 0) for i in room_ids], dtype=np.float64)
+        occupied = np.array([history.get(i, empty).get('occupied_minutes', 0) for i in room_ids], dtype=np.float64)
+        heated_share = np.array([history.get(i, empty).get('heated_share', 0) for i in room_ids], dtype=np.float64)
 
-        final_time = base_time * total_correction
+        base_time = self._calculate_base_cooldown(area, heat_loss, target, weather_data.temperature)
 
-        # Предсказание с ML
-        ml_prediction = self._predict_with_ml(room, weather_data)
+        corrections = {
+            'window_factor': self._window_correction(has_windows),
+            'door_factor': self._door_usage_correction(sessions),
+            'heating_history': self._heating_history_correction(heated_share),
+            'sunlight_factor': np.broadcast_to(self._sunlight_correction(weather_data), area.shape),
+            'ventilation_factor': self._ventilation_correction(occupied)
+        }
+
+        total_correction = np.ones_like(area)
+        for factor in corrections.values():
+            total_correction = total_correction * factor
+
+        result = np.zeros(len(rooms), dtype=self.RESULT_DTYPE)
+        result['room_id'] = room_ids
+        result['cooldown_time'] = base_time * total_correction
+        result['ml_prediction'] = self.predict_cooldown_many(rooms, weather_data)
+        for name, values in corrections.items():
+            result[name] = values
+        result['confidence'] = self._calculate_confidence(result['cooldown_time'], result['ml_prediction'])
+        return result
+
+    def fetch_history(self, room_ids, now=None):
+        """Агрегаты занятости и отопления за HISTORY_WINDOW одним запросом"""
+        from django.db.models import Count, DurationField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+        from django.db.models.functions import Coalesce
+        from core.models import Room, OccupancyLog, EnergyLog
+
+        now = now or timezone.now()
+        since = now - self.HISTORY_WINDOW
+
+        occupancy = OccupancyLog.objects.filter(
+            room=OuterRef('pk'), is_active=True, start_time__gte=since, start_time__lte=now
+        ).order_by().values('room')
+        energy = EnergyLog.objects.filter(
+            room=OuterRef('pk'), timestamp__gte=since, timestamp__lte=now
+        ).order_by().values('room')
+        duration = ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
+
+        rows = Room.objects.filter(id__in=room_ids).annotate(
+            sessions=Coalesce(Subquery(occupancy.annotate(n=Count('id')).values('n')), 0),
+            occupied=Subquery(occupancy.annotate(total=Sum(duration)).values('total')),
+            logs=Coalesce(Subquery(energy.annotate(n=Count('id')).values('n')), 0),
+            heated_logs=Coalesce(Subquery(
+                energy.filter(heating_power__gt=0).annotate(n=Count('id')).values('n')
+            ), 0),
+        ).values_list('id', 'sessions', 'occupied', 'logs', 'heated_logs')
 
         return {
-            'cooldown_time': final_time,
-            'ml_prediction': ml_prediction,
-            'corrections': corrections,
-            'confidence': self._calculate_confidence(final_time, ml_prediction)
+            room_id: {
+                'sessions': sessions,
+                'occupied_minutes': occupied.total_seconds() / 60 if occupied else 0,
+                'heated_share': heated_logs / logs if logs else 0,
+            }
+            for room_id, sessions, occupied, logs, heated_logs in rows
         }
 
-    def _calculate_base_cooldown(self, room, weather_data):
-        """Базовый расчет по улучшенной формуле"""
+    def _calculate_base_cooldown(self, area, heat_loss, target, outside_temperature):
+        """Базовый расчет по улучшенной формуле (векторно)"""
         # Улучшенная физическая модель
-        C_wall = room.area * 0.1 * 1000  # Теплоемкость стен
-        C_air = room.area * 3.0 * 1.225 * 1005  # Теплоемкость воздуха
+        C_wall = area * 0.1 * 1000  # Теплоемкость стен
+        C_air = area * 3.0 * 1.225 * 1005  # Теплоемкость воздуха
         C_total = C_wall + C_air
 
-        U = room.get_heat_loss_factor()
-        delta_T = room.target_temperature - weather_data.temperature
-        A = room.area
+        delta_T = target - outside_temperature
 
         # Формула с учетом тепловой инерции
-        time_seconds = (C_total * delta_T) / (U * A * max(1, delta_T))
+        time_seconds = (C_total * delta_T) / (heat_loss * area * np.maximum(1, delta_T))
 
         return time_seconds / 60  # В минутах
 
     def _predict_with_ml(self, room, weather_data):
         """ML предсказание времени охлаждения"""
-        # Здесь будет реальная ML модель
-        # Для демо используем линейную регрессию на симулированных данных
-
-        # Симулированные данные для демо
-        X = np.array([[room.area, weather_data.temperature,
-                       room.get_heat_loss_factor()]])
+        return float(self.predict_cooldown_many([room], weather_data)[0])
 
-        # Простая модель (в реальности будет обучена на исторических данных)
-        model = LinearRegression()
-        model.coef_ = np.array([0.5, -2.3, 15.7])
-        model.intercept_ = 30.2
-
-        prediction = model.predict(X)[0]
-        return max(0, prediction)
+    def predict_cooldown_many(self, rooms, weather_data):
+        """
+        ML предсказание для множества комнат одним пакетом.
+        Модели берутся из реестра (по комнате), иначе - демо-коэффициенты.
+        """
+        rooms = list(rooms)
+        X = np.array([
+            [room.area, weather_data.temperature, room.get_heat_loss_factor()]
+            for room in rooms
+        ], dtype=np.float64).reshape(len(rooms), 3)
+
+        predictions = self.models.predict_many(
+            self.COOLDOWN_MODEL_NAME,
+            [room.id for room in rooms],
+            X,
+            default=DEFAULT_COOLDOWN_MODEL,
+        )
+        return np.maximum(0, predictions)
 
     def _calculate_confidence(self, physics_time, ml_time):
         """Расчет уверенности в предсказании"""
-        diff = abs(physics_time - ml_time)
-        if diff < 10:
-            return 0.95
-        elif diff < 30:
-            return 0.85
-        elif diff < 60:
-            return 0.70
-        else:
-            return 0.50
-
-    def _window_correction(self, room):
+        diff = np.abs(np.asarray(physics_time) - np.asarray(ml_time))
+        return np.select([diff < 10, diff < 30, diff < 60], [0.95, 0.85, 0.70], default=0.50)
+
+    def _window_correction(self, has_windows):
         """Коррекция на окна"""
         # В реальности будет учитывать количество и состояние окон
-        return 0.8 if hasattr(room, 'has_windows') and room.has_windows else 1.0
\ No newline at end of file
+        return np.where(has_windows, 0.8, 1.0)
+
+    def _door_usage_correction(self, sessions):
+        """Коррекция на открывание дверей: каждое занятие - потеря тепла"""
+        return 1.0 - np.minimum(0.15, 0.02 * sessions)
+
+    def _heating_history_correction(self, heated_share):
+        """Прогретые за сутки стены отдают тепло дольше"""
+        return 1.0 + 0.2 * np.clip(heated_share, 0, 1)
+
+    def _sunlight_correction(self, weather_data, now=None):
+        """Солнце днём замедляет остывание (одно значение для всего здания)"""
+        hour = timezone.localtime(now or timezone.now()).hour
+        if not 8 <= hour < 18:
+            return 1.0
+        description = (weather_data.description or '').lower()
+        if 'clear' in description or 'sun' in description:
+            return 1.1
+        if 'partly' in description:
+            return 1.05
+        return 1.0
+
+    def _ventilation_correction(self, occupied_minutes):
+        """Проветривание пропорционально времени занятости за сутки"""
+        return 1.0 - 0.1 * np.clip(occupied_minutes / (24 * 60), 0, 1)
@@ -0,0 +1,171 @@
+# core/services/analytics.py
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import (
+    DurationField, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce, ExtractHour, TruncDate
+from django.utils import timezone
+
+from .reports import consumed_kwh_expression
+
+HEATING_POWER_PER_SQM = 0.1  # kW/m² (100 W/m²)
+SCHEDULED_HOURS = 10 * 5  # отопление по расписанию: 10 часов в день, 5 дней
+
+
+def daily_slopes(matrix):
+    """Наклон линейного тренда для каждой строки матрицы [rooms, days] (МНК, векторно)"""
+    days = matrix.shape[1]
+    x = np.arange(days, dtype=np.float64) - (days - 1) / 2
+    denominator = (x * x).sum()
+    if not denominator:
+        return np.zeros(matrix.shape[0])
+    return (matrix - matrix.mean(axis=1, keepdims=True)) @ x / denominator
+
+
+class EnergyAnalytics:
+    """
+    Аналитика энергопотребления по всем комнатам за фиксированное число
+    запросов: комнаты + занятость + логи (1), дневной ряд (1), часы пик (1).
+    """
+
+    def __init__(self, days=7, now=None):
+        self.days = days
+        self.now = now or timezone.now()
+        self.since = self.now - timedelta(days=days)
+
+    def room_rows(self):
+        from core.models import Room, EnergyLog
+
+        duration = ExpressionWrapper(
+            F('occupancy_logs__end_time') - F('occupancy_logs__start_time'),
+            output_field=DurationField(),
+        )
+        consumed = EnergyLog.objects.filter(
+            room=OuterRef('pk'), timestamp__gte=self.since, timestamp__lte=self.now
+        ).order_by().values('room').annotate(total=Sum(consumed_kwh_expression())).values('total')
+
+        return list(
+            Room.objects.annotate(
+                occupied=Sum(duration, filter=Q(
+                    occupancy_logs__is_active=True,
+                    occupancy_logs__end_time__gte=self.since,
+                )),
+                logged_kwh=Coalesce(Subquery(consumed, output_field=FloatField()), Value(0.0)),
+            ).order_by('id').values('id', 'name', 'area', 'occupied', 'logged_kwh')
+        )
+
+    def daily_matrix(self, room_ids):
+        from core.models import EnergyLog
+
+        index = {room_id: i for i, room_id in enumerate(room_ids)}
+        first_day = timezone.localtime(self.since).date()
+        matrix = np.zeros((len(room_ids), self.days + 1))
+        rows = (
+            EnergyLog.objects.filter(timestamp__gte=self.since, timestamp__lte=self.now)
+            .annotate(day=TruncDate('timestamp'))
+            .values('room_id', 'day')
+            .annotate(total=Sum(consumed_kwh_expression()))
+            .order_by()
+        )
+        for row in rows:
+            offset = (row['day'] - first_day).days
+            if row['room_id'] in index and 0 <= offset <= self.days:
+                matrix[index[row['room_id']], offset] = row['total']
+        return matrix
+
+    def peak_hours(self, top=3):
+        from core.models import EnergyLog
+
+        rows = (
+            EnergyLog.objects.filter(timestamp__gte=self.since, timestamp__lte=self.now)
+            .annotate(hour=ExtractHour('timestamp'))
+            .values('hour')
+            .annotate(total=Sum(consumed_kwh_expression()))
+            .order_by('-total')[:top]
+        )
+        return [{'hour': row['hour'], 'kwh': row['total']} for row in rows]
+
+    def build(self):
+        rooms = self.room_rows()
+        room_ids = [room['id'] for room in rooms]
+
+        area = np.array([room['area'] for room in rooms], dtype=np.float64)
+        occupied_hours = np.array([
+            room['occupied'].total_seconds() / 3600 if room['occupied'] else 0.0 for room in rooms
+        ])
+        logged = np.array([room['logged_kwh'] for room in rooms], dtype=np.float64)
+
+        # Потребление при отоплении по занятости и экономия относительно расписания
+        power_kw = area * HEATING_POWER_PER_SQM
+        consumed = power_kw * occupied_hours
+        potential = power_kw * SCHEDULED_HOURS
+        saved = np.maximum(0, potential - consumed)
+        efficiency = np.where(potential > 0, saved / np.maximum(potential, 1e-9) * 100, 0)
+        # Что ещё можно сэкономить: фактически залогированное сверх потребности по занятости
+        savings_potential = np.maximum(0, logged - consumed)
+
+        daily = self.daily_matrix(room_ids)
+        slopes = daily_slopes(daily)
+        total_daily = daily.sum(axis=0)
+        total_slope = float(daily_slopes(total_daily[None, :])[0]) if len(total_daily) else 0.0
+
+        scores = sorted((
+            {
+                'room': room['name'],
+                'score': float(efficiency[i]),
+                'savings_potential': float(savings_potential[i]),
+                'trend': float(slopes[i]),
+            }
+            for i, room in enumerate(rooms)
+        ), key=lambda r: r['score'])
+
+        analytics = {
+            'total_energy_consumed': float(consumed.sum()),
+            'total_energy_saved': float(saved.sum()),
+            'peak_consumption_hours': self.peak_hours(),
+            'room_efficiency_scores': scores,
+            'trends': self.describe_trends(total_daily, total_slope, rooms, slopes),
+            'daily_totals': [round(float(v), 1) for v in total_daily],
+        }
+        analytics['recommendations'] = self.recommendations(analytics)
+        return analytics
+
+    @staticmethod
+    def describe_trends(total_daily, total_slope, rooms, slopes):
+        trends = []
+        mean = total_daily.mean() if len(total_daily) else 0
+        if mean > 0:
+            change = total_slope / mean * 100
+            direction = 'rising' if change > 1 else 'falling' if change < -1 else 'stable'
+            trends.append({
+                'scope': 'building',
+                'direction': direction,
+                'change_percent_per_day': round(float(change), 1),
+            })
+        for i in np.argsort(slopes)[::-1][:3]:
+            if slopes[i] > 0:
+                trends.append({
+                    'scope': rooms[i]['name'],
+                    'direction': 'rising',
+                    'change_kwh_per_day': round(float(slopes[i]), 2),
+                })
+        return trends
+
+    @staticmethod
+    def recommendations(analytics):
+        tips = []
+        for room in analytics['room_efficiency_scores'][:3]:
+            if room['savings_potential'] > 0:
+                tips.append(
+                    f"{room['room']}: heating ran {room['savings_potential']:.1f} kWh beyond occupancy needs - "
+                    f"tie its schedule to bookings."
+                )
+        if analytics['peak_consumption_hours']:
+            hour = analytics['peak_consumption_hours'][0]['hour']
+            tips.append(f"Consumption peaks around {hour:02d}:00 - consider pre-heating earlier at lower power.")
+        rising = [t for t in analytics['trends'] if t['direction'] == 'rising' and t['scope'] != 'building']
+        if rising:
+            tips.append(f"Consumption is rising in {', '.join(t['scope'] for t in rising)}.")
+        return tips
@@ -0,0 +1,347 @@
+# core/services/challenges.py
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .leaderboard import ENERGY_KEY, leaderboard
+from .reports import HEATING_POWER_PER_SQM
+
+ACHIEVEMENT_TYPE = 'energy_saver'
+AWARD_BATCH = 2000
+
+
+def attribute_to_users(room_ids, timestamps, bookings):
+    """
+    Пользователь, занимавший комнату в момент лога (0 - никто).
+    bookings - (room_id, start_ts, end_ts, user_id); ключ room << 32 | ts,
+    последнее бронирование с началом <= ts ищется searchsorted.
+    """
+    attributed = np.zeros(len(room_ids), dtype=np.int64)
+    if not len(bookings) or not len(room_ids):
+        return attributed
+    b_room, b_start, b_end, b_user = (np.asarray(column, dtype=np.int64) for column in zip(*bookings))
+    b_key = (b_room << 32) | b_start
+    order = np.argsort(b_key)
+    b_key, b_room, b_end, b_user = b_key[order], b_room[order], b_end[order], b_user[order]
+
+    room_ids = np.asarray(room_ids, dtype=np.int64)
+    ts = np.asarray(timestamps, dtype=np.int64)
+    found = np.searchsorted(b_key, (room_ids << 32) | ts, side='right') - 1
+    valid = found >= 0
+    found = np.maximum(found, 0)
+    valid &= (b_room[found] == room_ids) & (b_end[found] >= ts)
+    attributed[valid] = b_user[found[valid]]
+    return attributed
+
+
+class Window:
+    """
+    Накопленная экономия пользователей в окне [start, end] и челленджи с этим окном.
+    totals - по строкам до last_log_id (хранятся в ChallengeProgress), pending - по
+    хвосту после него: хвост пересчитывается каждым запуском и в БД не пишется.
+    """
+
+    def __init__(self, start, end, pk=None, last_log_id=0, known=(), scanned_log_id=0):
+        self.start = start
+        self.end = end
+        self.pk = pk
+        self.last_log_id = last_log_id
+        self.scanned_log_id = max(scanned_log_id, last_log_id)
+        self.known = set(known)
+        self.totals = {}
+        self.pending = {}
+        self.credited = {}  # часть суммы, уже зачтённая выданными наградами
+        self.dirty = set()  # пользователи, чьи суммы изменились с загрузки
+        self.challenge_ids = np.empty(0, dtype=np.int64)
+        self.targets = np.empty(0)
+
+    def set_challenges(self, challenges):
+        """challenges - [(id, target)]; держим отсортированными по цели"""
+        challenges = sorted(challenges, key=lambda c: (c[1], c[0]))
+        self.challenge_ids = np.array([c[0] for c in challenges], dtype=np.int64)
+        self.targets = np.array([c[1] for c in challenges], dtype=np.float64)
+
+    def total(self, user_id):
+        return self.totals.get(user_id, 0.0) + self.pending.get(user_id, 0.0)
+
+    def credit(self, user_id):
+        """Незачтённый прирост экономии пользователя (kWh); повторный вызов без новых логов даёт 0"""
+        total = self.total(user_id)
+        increment = max(total - self.credited.get(user_id, 0.0), 0.0)
+        self.credited[user_id] = total
+        self.dirty.add(user_id)
+        return increment
+
+    def add(self, users, saved, pending=False):
+        """Прибавить экономию; вернуть [(user_id, challenge_id, window)] пересечённых целей"""
+        users = users.tolist()
+        previous = np.array([self.total(user_id) for user_id in users])
+        total = previous + saved
+        part = self.pending if pending else self.totals
+        part.update((user_id, part.get(user_id, 0.0) + value) for user_id, value in zip(users, saved.tolist()))
+        if not pending:
+            self.dirty.update(users)
+        # Цели в (previous, total] - пересечены этим пакетом
+        lo = np.searchsorted(self.targets, previous, side='right')
+        hi = np.searchsorted(self.targets, total, side='right')
+        crossed = []
+        for i in np.flatnonzero(hi > lo).tolist():
+            crossed.extend((users[i], c, self) for c in self.challenge_ids[lo[i]:hi[i]].tolist())
+        return crossed
+
+    def reached(self, challenge_ids):
+        """Пользователи, уже достигшие целей новых челленджей окна"""
+        wanted = set(challenge_ids)
+        pairs = []
+        for challenge_id, target in zip(self.challenge_ids.tolist(), self.targets.tolist()):
+            if challenge_id in wanted:
+                pairs.extend((u, challenge_id, self) for u in self.totals.keys() | self.pending.keys()
+                             if self.total(u) >= target)
+        return pairs
+
+
+class ChallengeEvaluator:
+    """
+    Потоковая оценка прогресса по EnergyChallenge. События - новые строки
+    EnergyLog после водяного знака (id): экономия относительно постоянного
+    отопления приписывается пользователю, бронировавшему комнату (OccupancyLog).
+    Суммы хранятся по окнам дат (у многих челленджей окно общее) в
+    ChallengeWindow / ChallengeProgress, поэтому каждый запуск - в том числе
+    разовый manage.py evaluate_challenges - продолжает с водяного знака.
+    Награды выдаются, когда сумма пересекает target, через
+    bulk_create(ignore_conflicts). История сканируется только для нового окна.
+
+    На Postgres id выдаётся при INSERT, а виден после COMMIT: параллельная
+    транзакция может закоммитить строку с id ниже уже прочитанных. Поэтому
+    водяной знак отстаёт на запуск: строки после id, виденного прошлым
+    запуском, лишь предварительные (pending) и перечитываются следующим.
+    Повторно пересечённые цели отсекает проверка выданных наград, а
+    credited_kwh в ChallengeProgress не даёт зачесть одни kWh дважды.
+    """
+
+    def __init__(self, batch_size=20000):
+        self.batch_size = batch_size
+        self.watermark = None
+        self.windows = {}
+
+    # --- состояние ---------------------------------------------------------
+
+    def load(self, keys):
+        """Окна из keys ((start_ts, end_ts)) и их суммы из БД; {(start_ts, end_ts): Window}"""
+        from core.models import ChallengeProgress, ChallengeWindow
+
+        tz = timezone.get_current_timezone()
+        windows = {}
+        by_pk = {}
+        for pk, start, end, last_log_id, scanned_log_id, known in ChallengeWindow.objects.filter(
+                start__in={datetime.fromtimestamp(start, tz) for start, _ in keys},
+                end__in={datetime.fromtimestamp(end, tz) for _, end in keys},
+        ).values_list('id', 'start', 'end', 'last_log_id', 'scanned_log_id', 'challenge_ids'):
+            key = int(start.timestamp()), int(end.timestamp())
+            if key in keys:
+                windows[key] = by_pk[pk] = Window(*key, pk, last_log_id, known, scanned_log_id)
+        for window_id, user_id, saved, credited in ChallengeProgress.objects.filter(
+                window_id__in=list(by_pk)).values_list('window_id', 'user_id', 'saved_kwh', 'credited_kwh'):
+            by_pk[window_id].totals[user_id] = saved
+            by_pk[window_id].credited[user_id] = credited
+        self.windows = windows
+        return windows
+
+    def save(self):
+        """Водяной знак, проверенные челленджи и изменившиеся суммы окон - в БД"""
+        from core.models import ChallengeProgress, ChallengeWindow
+
+        tz = timezone.get_current_timezone()
+        ChallengeWindow.objects.exclude(id__in=[w.pk for w in self.windows.values() if w.pk]).delete()
+        for window in self.windows.values():
+            if window.pk is None:
+                window.pk = ChallengeWindow.objects.create(
+                    start=datetime.fromtimestamp(window.start, tz), end=datetime.fromtimestamp(window.end, tz),
+                ).pk
+        ChallengeWindow.objects.bulk_update(
+            [ChallengeWindow(id=w.pk, last_log_id=w.last_log_id, scanned_log_id=w.scanned_log_id,
+                             challenge_ids=sorted(w.known))
+             for w in self.windows.values()],
+            ['last_log_id', 'scanned_log_id', 'challenge_ids'],
+        )
+        ChallengeProgress.objects.bulk_create(
+            [ChallengeProgress(window_id=w.pk, user_id=user_id, saved_kwh=w.totals.get(user_id, 0.0),
+                               credited_kwh=w.credited.get(user_id, 0.0))
+             for w in self.windows.values() for user_id in w.dirty],
+            batch_size=5000, update_conflicts=True, unique_fields=['window', 'user'],
+            update_fields=['saved_kwh', 'credited_kwh'],
+        )
+        for window in self.windows.values():
+            window.dirty.clear()
+
+    # --- данные ------------------------------------------------------------
+
+    def active_challenges(self, now):
+        from core.models import EnergyChallenge
+
+        return list(
+            EnergyChallenge.objects.filter(is_active=True, start_date__lte=now)
+            .values_list('id', 'start_date', 'end_date', 'target_savings', 'reward_points')
+        )
+
+    def events(self, after_id, upto_id=None, since=None, until=None):
+        """Пакеты (ids, room_ids, ts, saved_kwh) строк EnergyLog после after_id"""
+        from core.models import EnergyLog
+
+        queryset = EnergyLog.objects.filter(id__gt=after_id).order_by('id')
+        if upto_id is not None:
+            queryset = queryset.filter(id__lte=upto_id)
+        if since is not None:
+            queryset = queryset.filter(timestamp__gte=since, timestamp__lte=until)
+        while True:
+            rows = list(queryset.filter(id__gt=after_id).values_list(
+                'id', 'room_id', 'timestamp', 'heating_power', 'room__area', 'interval_hours'
+            )[:self.batch_size])
+            if not rows:
+                return
+            ids, rooms, stamps, power, area, hours = zip(*rows)
+            ts = np.array([stamp.timestamp() for stamp in stamps], dtype=np.int64)
+            saved = np.maximum(np.array(area) * HEATING_POWER_PER_SQM - np.array(power), 0) * np.array(hours)
+            after_id = ids[-1]
+            yield np.array(ids), np.array(rooms, dtype=np.int64), ts, saved
+
+    def bookings(self, room_ids, first_ts, last_ts):
+        from core.models import OccupancyLog
+
+        since = datetime.fromtimestamp(int(first_ts), timezone.get_current_timezone())
+        until = datetime.fromtimestamp(int(last_ts), timezone.get_current_timezone())
+        return [
+            (room_id, int(start.timestamp()), int(end.timestamp()), user_id)
+            for room_id, start, end, user_id in OccupancyLog.objects.filter(
+                room_id__in=np.unique(room_ids).tolist(), is_active=True, user__isnull=False,
+                start_time__lte=until, end_time__gte=since,
+            ).values_list('room_id', 'start_time', 'end_time', 'user_id')
+        ]
+
+    # --- оценка ------------------------------------------------------------
+
+    def _consume(self, batch, windows, settle_to=None):
+        """Строки с id <= settle_to (все, если None) - в суммы окон, остальные - в pending"""
+        ids, rooms, ts, saved = batch
+        users = attribute_to_users(rooms, ts, self.bookings(rooms, ts.min(), ts.max()))
+        attributed = users > 0
+        settled = np.ones(len(ids), dtype=bool) if settle_to is None else ids <= settle_to
+        crossed = []
+        for window in windows:
+            in_window = attributed & (ts >= window.start) & (ts <= window.end)
+            for mask, pending in ((in_window & settled, False), (in_window & ~settled, True)):
+                if not mask.any():
+                    continue
+                unique, inverse = np.unique(users[mask], return_inverse=True)
+                crossed.extend(window.add(unique, np.bincount(inverse, weights=saved[mask]), pending))
+        return crossed
+
+    def sync_windows(self, challenges):
+        """
+        Окна по активным челленджам. Окно, отставшее от общего водяного знака
+        (новое - с нуля), догружается из истории своего диапазона дат.
+        """
+        grouped = self.group(challenges)
+        for key in list(self.windows):
+            if key not in grouped:
+                del self.windows[key]
+        for key, members in grouped.items():
+            window = self.windows.get(key)
+            if window is None:
+                window = self.windows[key] = Window(*key)
+            window.set_challenges(members)
+
+        crossed = []
+        tz = timezone.get_current_timezone()
+        for window in self.windows.values():
+            window.pending.clear()
+            if window.last_log_id < self.watermark:
+                for batch in self.events(window.last_log_id, upto_id=self.watermark,
+                                         since=datetime.fromtimestamp(window.start, tz),
+                                         until=datetime.fromtimestamp(window.end, tz)):
+                    # Новые челленджи окна придут из reached() ниже
+                    crossed.extend(c for c in self._consume(batch, [window]) if c[1] in window.known)
+                window.last_log_id = window.scanned_log_id = self.watermark
+            members = grouped[window.start, window.end]
+            new = [challenge_id for challenge_id, _ in members if challenge_id not in window.known]
+            if new:
+                crossed.extend(window.reached(new))
+            window.known = {challenge_id for challenge_id, _ in members}
+        return crossed
+
+    @staticmethod
+    def group(challenges):
+        """{(start_ts, end_ts): [(challenge_id, target)]}"""
+        grouped = defaultdict(list)
+        for challenge_id, start, end, target, _ in challenges:
+            grouped[int(start.timestamp()), int(end.timestamp())].append((challenge_id, target))
+        return grouped
+
+    def run(self, now=None):
+        """Один проход: события после водяного знака -> суммы -> награды"""
+        from core.models import EnergyLog
+
+        now = now or timezone.now()
+        with transaction.atomic():
+            challenges = self.active_challenges(now)
+            rewards = {challenge[0]: challenge[4] for challenge in challenges}
+            self.load(self.group(challenges).keys())
+            # Общий водяной знак - у окон, уже догнавших поток; если окон нет - новые строки
+            # учтёт догрузка истории, поток начинается с текущего конца таблицы
+            self.watermark = max((w.last_log_id for w in self.windows.values()), default=None)
+            if self.watermark is None:
+                self.watermark = EnergyLog.objects.aggregate(last=Max('id'))['last'] or 0
+            # Строки до id, виденного прошлым запуском, окончательны; дальше - pending
+            settle_to = max((w.scanned_log_id for w in self.windows.values()), default=self.watermark)
+
+            crossed = self.sync_windows(challenges)
+
+            events = 0
+            scanned = self.watermark
+            windows = list(self.windows.values())
+            for batch in self.events(self.watermark):
+                crossed.extend(self._consume(batch, windows, settle_to))
+                scanned = int(batch[0][-1])
+                events += int((batch[0] > settle_to).sum())
+            self.watermark = max(self.watermark, min(settle_to, scanned))
+            for window in windows:
+                window.last_log_id = self.watermark
+                window.scanned_log_id = max(scanned, self.watermark)
+
+            awarded = self.award(crossed, rewards)
+            self.save()
+        return {'events': events, 'windows': len(self.windows), 'challenges': len(challenges), 'awarded': awarded}
+
+    def award(self, crossed, rewards):
+        """Идемпотентная выдача: повтор (после сброса состояния) не создаёт дублей"""
+        from core.models import UserAchievement
+
+        awarded = []
+        for i in range(0, len(crossed), AWARD_BATCH):
+            chunk = crossed[i:i + AWARD_BATCH]
+            existing = set(UserAchievement.objects.filter(
+                achievement_type=ACHIEVEMENT_TYPE,
+                challenge_id__in={c for _, c, _ in chunk},
+                user_id__in={u for u, _, _ in chunk},
+            ).values_list('user_id', 'challenge_id'))
+            # В награду - kWh окна, ещё не зачтённые пользователю: первая награда пакета
+            # получает прирост, следующие - 0, одни и те же kWh не учитываются дважды
+            new = [
+                UserAchievement(user_id=user_id, challenge_id=challenge_id, achievement_type=ACHIEVEMENT_TYPE,
+                                points_earned=rewards[challenge_id],
+                                data={ENERGY_KEY: round(window.credit(user_id), 3)})
+                for user_id, challenge_id, window in chunk if (user_id, challenge_id) not in existing
+            ]
+            UserAchievement.objects.bulk_create(new, ignore_conflicts=True)
+            awarded.extend(new)
+        if awarded:
+            # bulk_create не шлёт post_save - таблицы лидеров обновляем сами, одним пакетом
+            leaderboard.record(awarded)
+        return len(awarded)
+
+
+evaluator = ChallengeEvaluator()
@@ -0,0 +1,374 @@
+# core/services/energy_forecast.py
+import io
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.utils import timezone
+
+HOURS_PER_WEEK = 168
+BALANCE_TEMPERATURE = 18.0  # °C: ниже этой температуры растёт потребность в отоплении
+MODEL_PATH = 'ml_models/energy_forecast.npz'
+MODEL_ARRAYS = ('room_ids', 'coef', 'wape', 'last_day_ratio')
+MODEL_SCALARS = ('training_days', 'utc_offset', 'rows', 'fit_seconds')
+
+
+def hour_of_week(epoch_seconds, utc_offset=0):
+    """Час недели (0 = понедельник 00:00) для массива epoch-секунд"""
+    local = (np.asarray(epoch_seconds, dtype=np.int64) + int(utc_offset)) // 3600
+    # 1970-01-01 - четверг, т.е. день 3 от понедельника
+    return (((local // 24) + 3) % 7) * 24 + local % 24
+
+
+def heating_degrees(outside):
+    return np.maximum(0.0, BALANCE_TEMPERATURE - np.asarray(outside, dtype=np.float64))
+
+
+def fit_profiles(room_index, how, outside, energy, n_rooms):
+    """
+    Для всех комнат сразу: energy = a[room, how] + b[room] * HDD.
+    Одна категориальная переменная + один регрессор решаются в закрытом
+    виде (центрирование внутри групп), всё через bincount.
+    Возвращает (coef [n_rooms, 169], wape [n_rooms], fitted).
+    """
+    hdd = heating_degrees(outside)
+    energy = np.asarray(energy, dtype=np.float64)
+    group = room_index * HOURS_PER_WEEK + how
+    size = n_rooms * HOURS_PER_WEEK
+
+    n = np.bincount(group, minlength=size)
+    safe_n = np.maximum(n, 1)
+    mean_y = np.bincount(group, weights=energy, minlength=size) / safe_n
+    mean_x = np.bincount(group, weights=hdd, minlength=size) / safe_n
+
+    dx = hdd - mean_x[group]
+    dy = energy - mean_y[group]
+    sxy = np.bincount(room_index, weights=dx * dy, minlength=n_rooms)
+    sxx = np.bincount(room_index, weights=dx * dx, minlength=n_rooms)
+    slope = np.where(sxx > 1e-9, sxy / np.maximum(sxx, 1e-9), 0.0)
+    slope = np.maximum(slope, 0.0)  # холоднее снаружи - не меньше потребление
+
+    profile = (mean_y - np.repeat(slope, HOURS_PER_WEEK) * mean_x).reshape(n_rooms, HOURS_PER_WEEK)
+
+    # Пустые часы недели - средний уровень комнаты
+    room_n = np.maximum(np.bincount(room_index, minlength=n_rooms), 1)
+    room_level = (np.bincount(room_index, weights=energy, minlength=n_rooms)
+                  - slope * np.bincount(room_index, weights=hdd, minlength=n_rooms)) / room_n
+    empty = (n == 0).reshape(n_rooms, HOURS_PER_WEEK)
+    profile = np.where(empty, room_level[:, None], profile)
+
+    fitted = profile.ravel()[group] + slope[room_index] * hdd
+    abs_error = np.bincount(room_index, weights=np.abs(fitted - energy), minlength=n_rooms)
+    total = np.bincount(room_index, weights=np.abs(energy), minlength=n_rooms)
+    wape = np.where(total > 0, abs_error / np.maximum(total, 1e-9), 0.0)
+
+    return np.column_stack([profile, slope]), wape, fitted
+
+
+class ModelStore:
+    """
+    Обученная модель прогноза в хранилище (.npz без pickle). Обучает
+    manage.py fit_energy_forecast, запросы только читают: файл перечитывается,
+    когда меняется его время изменения.
+    """
+
+    def __init__(self, path=MODEL_PATH, storage=None):
+        self.path = path
+        self._storage = storage
+        self._version = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def storage(self):
+        from django.core.files.storage import default_storage
+
+        return self._storage or default_storage
+
+    def save(self, model):
+        from django.core.files.base import ContentFile
+
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            **{name: model[name] for name in MODEL_ARRAYS},
+            **{name: np.array([model[name]], dtype=np.float64) for name in MODEL_SCALARS},
+            fitted_at=np.array([model['fitted_at'].timestamp()]),
+        )
+        if self.storage.exists(self.path):
+            self.storage.delete(self.path)
+        self.storage.save(self.path, ContentFile(buffer.getvalue()))
+
+    def load(self):
+        """Последняя сохранённая модель или None, если модель ещё не обучалась"""
+        try:
+            version = self.storage.get_modified_time(self.path)
+        except OSError:
+            # Файла нет (в том числе в момент перезаписи) - остаётся прочитанная ранее
+            return self._model
+        with self._lock:
+            if version != self._version:
+                with self.storage.open(self.path, 'rb') as fh, \
+                        np.load(io.BytesIO(fh.read()), allow_pickle=False) as data:
+                    model = {name: data[name] for name in MODEL_ARRAYS}
+                    model.update({name: float(data[name][0]) for name in MODEL_SCALARS})
+                    model['rows'] = int(model['rows'])
+                    model['fitted_at'] = datetime.fromtimestamp(float(data['fitted_at'][0]), dt_timezone.utc)
+                self._model, self._version = model, version
+            return self._model
+
+
+store = ModelStore()
+
+
+def empty_model():
+    """Модель без комнат - пока fit_energy_forecast ещё не запускался"""
+    return {
+        'room_ids': np.zeros(0, dtype=np.int64),
+        'coef': np.zeros((0, HOURS_PER_WEEK + 1)),
+        'wape': np.zeros(0),
+        'last_day_ratio': np.zeros(0),
+        'training_days': 0.0,
+        'utc_offset': timezone.localtime().utcoffset().total_seconds(),
+        'fitted_at': None,
+        'rows': 0,
+        'fit_seconds': 0.0,
+    }
+
+
+class EnergyForecaster:
+    """
+    Прогноз потребления по комнатам: профиль по часам недели × температура.
+    Коэффициенты всех комнат - одна матрица, прогноз - одно умножение матриц.
+    """
+
+    def __init__(self, history_days=730, chunk_size=500):
+        self.history_days = history_days
+        self.chunk_size = chunk_size
+
+    def load_history(self, room_ids, since):
+        """Почасовые агрегаты EnergyLog (агрегирует БД), чанками по комнатам"""
+        from django.db.models import Avg
+        from django.db.models.functions import TruncHour
+        from core.models import EnergyLog
+
+        for i in range(0, len(room_ids), self.chunk_size):
+            chunk = room_ids[i:i + self.chunk_size]
+            rows = list(
+                EnergyLog.objects.filter(room_id__in=chunk, timestamp__gte=since)
+                .annotate(hour=TruncHour('timestamp'))
+                .values('room_id', 'hour')
+                .annotate(power=Avg('heating_power'), outside=Avg('temperature_outside'))
+                .order_by()
+                .values_list('room_id', 'hour', 'power', 'outside')
+            )
+            count = len(rows)
+            yield (
+                np.fromiter((r[0] for r in rows), dtype=np.int64, count=count),
+                np.fromiter((r[1].timestamp() for r in rows), dtype=np.float64, count=count),
+                np.fromiter((r[2] for r in rows), dtype=np.float64, count=count),  # kW за час = kWh
+                np.fromiter((r[3] for r in rows), dtype=np.float64, count=count),
+            )
+
+    def fit(self, room_ids=None):
+        from core.models import Room
+
+        if room_ids is None:
+            room_ids = list(Room.objects.order_by('id').values_list('id', flat=True))
+        room_ids = np.asarray(room_ids, dtype=np.int64)
+        position = {int(room_id): i for i, room_id in enumerate(room_ids)}
+
+        now = timezone.now()
+        offset = timezone.localtime(now).utcoffset().total_seconds()
+        coef = np.zeros((len(room_ids), HOURS_PER_WEEK + 1))
+        wape = np.ones(len(room_ids))
+        last_day_ratio = np.ones(len(room_ids))
+        first_seen = now.timestamp()
+
+        started = time.perf_counter()
+        rows = 0
+        for room, ts, energy, outside in self.load_history(room_ids.tolist(), now - timedelta(days=self.history_days)):
+            if not len(room):
+                continue
+            rows += len(room)
+            first_seen = min(first_seen, ts.min())
+            chunk_ids, local_index = np.unique(room, return_inverse=True)
+            chunk_coef, chunk_wape, fitted = fit_profiles(
+                local_index, hour_of_week(ts, offset), outside, energy, len(chunk_ids)
+            )
+            rows_at = np.array([position[int(r)] for r in chunk_ids])
+            coef[rows_at] = chunk_coef
+            wape[rows_at] = chunk_wape
+
+            # Отношение факт/модель за последние сутки - для поиска аномалий
+            recent = ts >= now.timestamp() - 86400
+            actual = np.bincount(local_index[recent], weights=energy[recent], minlength=len(chunk_ids))
+            expected = np.bincount(local_index[recent], weights=fitted[recent], minlength=len(chunk_ids))
+            last_day_ratio[rows_at] = np.where(expected > 0, actual / np.maximum(expected, 1e-9), 1.0)
+
+        model = {
+            'room_ids': room_ids,
+            'coef': coef,
+            'wape': wape,
+            'last_day_ratio': last_day_ratio,
+            'training_days': max(0.0, (now.timestamp() - first_seen) / 86400),
+            'utc_offset': offset,
+            'fitted_at': now,
+            'rows': rows,
+            'fit_seconds': time.perf_counter() - started,
+        }
+        return model
+
+    @staticmethod
+    def get_model():
+        """Модель из хранилища (None - ещё не обучена); в запросе не обучаем - это минуты на больших данных"""
+        return store.load()
+
+    @staticmethod
+    def forecast(model, start, hours, outside):
+        """
+        Прогноз [rooms, hours] начиная с start. outside - число или массив
+        температур на каждый час. Одно умножение: coef @ design.
+        """
+        hour_ts = start.timestamp() + np.arange(hours) * 3600
+        design = np.zeros((HOURS_PER_WEEK + 1, hours))
+        design[hour_of_week(hour_ts, model['utc_offset']), np.arange(hours)] = 1.0
+        design[HOURS_PER_WEEK] = heating_degrees(np.broadcast_to(outside, (hours,)))
+        return np.maximum(model['coef'] @ design, 0.0)
+
+    def occupancy_probability(self, room_ids, start, hours, outside):
+        """Вероятность занятости по часам из обученных моделей занятости, иначе - рабочие часы"""
+        from .model_registry import registry
+        from .training_pipeline import OCCUPANCY_MODEL_NAME, feature_matrix
+
+        local = [timezone.localtime(start + timedelta(hours=h)) for h in range(hours)]
+        hour_of_day = np.array([d.hour for d in local])
+        day_of_week = np.array([d.weekday() for d in local])
+        office = ((hour_of_day >= 8) & (hour_of_day < 18) & (day_of_week < 5)).astype(np.float64)
+
+        probability = np.tile(office, (len(room_ids), 1))
+        models = registry.get_models(OCCUPANCY_MODEL_NAME, [int(r) for r in room_ids])
+        trained = [i for i, room_id in enumerate(room_ids) if models.get(int(room_id)) is not None]
+        if trained:
+            X = feature_matrix(hour_of_day, day_of_week, day_of_week >= 5,
+                               np.broadcast_to(outside, (hours,)))
+            W = np.vstack([models[int(room_ids[i])].coef for i in trained])
+            b = np.array([models[int(room_ids[i])].intercept for i in trained])
+            probability[trained] = 1 / (1 + np.exp(-(W @ X.T + b[:, None])))
+        return probability
+
+    def predictions(self, rooms, weather, tomorrow_temperature=None):
+        """
+        Контекст для страницы predictions.html. Температура по часам - из
+        WeatherSeries (прогноз), tomorrow_temperature - подставить постоянную.
+        Комнаты, которых нет в модели (добавлены после обучения), - нулевой прогноз.
+        """
+        from .weather import WeatherSeries
+
+        rooms = list(rooms)
+        model = self.get_model() or empty_model()
+        index = {int(r): i for i, r in enumerate(model['room_ids'])}
+        missing = len(model['room_ids'])  # дополнительная нулевая строка
+        rows = np.array([index.get(room.id, missing) for room in rooms], dtype=np.int64)
+
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        if tomorrow_temperature is None:
+            series = WeatherSeries.load(today, today + timedelta(days=8), fallback=weather.temperature)
+            _, outside = series.hourly(today, 8 * 24)
+        else:
+            outside = np.full(8 * 24, float(tomorrow_temperature))
+        tomorrow_outside = outside[24:48]
+        tomorrow_temperature = float(tomorrow_outside.mean())
+
+        coef = np.vstack([model['coef'], np.zeros((1, HOURS_PER_WEEK + 1))])[rows]
+        wape = np.append(model['wape'], 1.0)[rows]
+        last_day_ratio = np.append(model['last_day_ratio'], 1.0)[rows]
+        scoped = dict(model, coef=coef)
+        hourly = self.forecast(scoped, today, 8 * 24, outside)  # сегодня + 7 дней
+        daily = hourly.reshape(len(rows), 8, 24).sum(axis=2)
+
+        today_total, tomorrow_total = daily[:, 0].sum(), daily[:, 1].sum()
+        week = daily[:, 1:].sum(axis=0)
+        peak = int(np.argmax(week)) + 1 if len(rows) else 1
+
+        tomorrow_hourly = hourly[:, 24:48]
+        occupied = self.occupancy_probability(
+            [room.id for room in rooms], today + timedelta(days=1), 24, tomorrow_outside
+        )
+        optimal_hourly = tomorrow_hourly * occupied
+        room_tomorrow = tomorrow_hourly.sum(axis=1)
+        room_optimal = optimal_hourly.sum(axis=1)
+        potential = float((room_tomorrow - room_optimal).sum())
+
+        hdd_hours = float(heating_degrees(tomorrow_outside).sum())
+        temperature_share = float(coef[:, -1].sum() * hdd_hours / tomorrow_total * 100) if tomorrow_total else 0.0
+        per_degree = float(coef[:, -1].sum() * 24 / tomorrow_total * 100) if tomorrow_total else 0.0
+
+        accuracy = float(np.clip(1 - np.average(wape, weights=np.maximum(room_tomorrow, 1e-9)), 0, 1)) \
+            if len(rows) else 0.0
+        learning = float(min(1.0, model['training_days'] / 28))
+        wasted_by_hour = (tomorrow_hourly - optimal_hourly).sum(axis=0)
+        best_hour = int(np.argmax(wasted_by_hour)) if len(rows) else 0
+        profile_total = coef[:, :HOURS_PER_WEEK].sum(axis=0)
+        peak_how = int(np.argmax(profile_total)) if len(rows) else 0
+
+        anomalies = [room.name for room, ratio in zip(rooms, last_day_ratio) if ratio > 1.5]
+
+        room_predictions = []
+        for i, room in enumerate(rooms):
+            current, optimal = room_tomorrow[i], room_optimal[i]
+            share = (current - optimal) / current * 100 if current > 0 else 0
+            room_predictions.append({
+                'id': room.id,
+                'name': room.name,
+                'area': room.area,
+                'current_consumption': round(float(current), 1),
+                'optimal_consumption': round(float(optimal), 1),
+                'savings_percentage': float(share),
+                'current_status_color': 'danger' if share > 30 else 'warning' if share > 10 else 'success',
+                'recommendation': (
+                    'Heat only during predicted occupancy' if share > 30 else
+                    'Shift pre-heating closer to bookings' if share > 10 else
+                    'Schedule is already efficient'
+                ),
+            })
+        room_predictions.sort(key=lambda r: r['current_consumption'] - r['optimal_consumption'], reverse=True)
+
+        change = (tomorrow_total - today_total) / today_total * 100 if today_total else 0.0
+        return {
+            'predictions': {
+                'tomorrow_consumption': float(tomorrow_total),
+                'trend': 'up' if change > 0 else 'down',
+                'change_percent': abs(float(change)),
+                'potential_savings': potential,
+                'money_savings': potential * 5.0,
+                'confidence': accuracy * learning * 100,
+                'model_accuracy': accuracy * 100,
+                'peak_day': (today + timedelta(days=peak)).strftime('%A'),
+                'optimal_reduction': round(potential / tomorrow_total * 100) if tomorrow_total else 0,
+                'best_saving_time': f"{best_hour:02d}:00-{(best_hour + 1) % 24:02d}:00",
+                'daily_forecast': [round(float(v), 1) for v in week],
+                'daily_labels': [(today + timedelta(days=d)).strftime('%a') for d in range(1, 8)],
+            },
+            'room_predictions': room_predictions,
+            'weather': {
+                'temperature': weather.temperature,
+                'description': weather.description,
+                'tomorrow_temperature': tomorrow_temperature,
+                'heating_impact': min(100.0, temperature_share),
+                'impact_factor': per_degree,
+            },
+            'ai_insights': {
+                'pattern': (
+                    f"Consumption peaks on {['Mondays', 'Tuesdays', 'Wednesdays', 'Thursdays', 'Fridays', 'Saturdays', 'Sundays'][peak_how // 24]} "
+                    f"around {peak_how % 24:02d}:00"
+                ),
+                'anomaly': (
+                    f"Last 24h consumption is 50%+ above forecast in: {', '.join(anomalies[:5])}"
+                    if anomalies else None
+                ),
+                'learning_progress': learning * 100,
+                'training_days': int(model['training_days']),
+            },
+        }
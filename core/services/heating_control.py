@@ -0,0 +1,67 @@
+# core/services/heating_control.py
+from django.db import transaction
+from django.utils import timezone
+
+from .impact import record_energy_logs
+from .reports import HEATING_POWER_PER_SQM
+
+
+def select_rooms(room_ids=None, building=None, floor=None, unoccupied=False, now=None):
+    """Комнаты по списку id и/или фильтру; unoccupied - без активного бронирования сейчас"""
+    from core.models import OccupancyLog, Room
+
+    rooms = Room.objects.all()
+    if room_ids is not None:
+        rooms = rooms.filter(id__in=room_ids)
+    if building is not None:
+        rooms = rooms.filter(building_id=building)
+    if floor is not None:
+        rooms = rooms.filter(floor=floor)
+    if unoccupied:
+        now = now or timezone.now()
+        rooms = rooms.exclude(id__in=OccupancyLog.objects.filter(
+            is_active=True, start_time__lte=now, end_time__gte=now,
+        ).values('room_id'))
+    return rooms
+
+
+def set_heating(rooms, heating, weather=None, now=None):
+    """
+    Перевести отопление комнат в состояние heating: один SELECT, один UPDATE
+    по комнатам, где состояние меняется, и bulk_create их EnergyLog с одной
+    погодой на всех. Возвращает [{room_id, name, heating_status, changed}].
+    """
+    from core.models import EnergyLog
+    from core.utils import WeatherService
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        rows = list(
+            rooms.select_for_update().order_by('id')
+            .values_list('id', 'name', 'building_id', 'area', 'heating_status',
+                         'target_temperature', 'comfort_temperature')
+        )
+        changed = [row for row in rows if row[4] != heating]
+        logs = []
+        if changed:
+            rooms.exclude(heating_status=heating).update(heating_status=heating, updated_at=now)
+            weather = weather or WeatherService.get_weather_data()
+            logs = EnergyLog.objects.bulk_create(
+                EnergyLog(
+                    room_id=room_id,
+                    temperature_inside=target if heating else comfort,
+                    temperature_outside=weather.temperature,
+                    heating_power=area * HEATING_POWER_PER_SQM if heating else 0,
+                )
+                for room_id, _, _, area, _, target, comfort in changed
+            )
+
+    # bulk_create не шлёт сигналы - счётчики обновляем сами; версия тепловой карты - по updated_at
+    if logs:
+        record_energy_logs(logs)
+
+    changed_ids = {row[0] for row in changed}
+    return [
+        {'room_id': room_id, 'name': name, 'heating_status': heating, 'changed': room_id in changed_ids}
+        for room_id, name, *_ in rows
+    ]
@@ -0,0 +1,315 @@
+# core/services/http_client.py
+import bisect
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # нужен только асинхронным интеграциям
+    httpx = None
+
+DEFAULTS = {
+    'timeout': (3.05, 10),  # (connect, read), секунд
+    'pool_maxsize': 10,  # соединений на один хост
+    'pool_hosts': 4,  # хостов, для которых держим пул
+    'failure_threshold': 5,  # подряд неудачных запросов до размыкания
+    'reset_timeout': 30,  # секунд в разомкнутом состоянии до пробного запроса
+}
+# Границы корзин гистограммы задержек, секунд (как у Prometheus)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Интеграция недоступна: запрос отклонён без обращения к сети"""
+
+
+class CircuitBreaker:
+    """
+    Размыкатель: после failure_threshold неудач подряд запросы отклоняются
+    сразу (CircuitOpenError) в течение reset_timeout, затем пропускается
+    один пробный - успех замыкает цепь, неудача снова размыкает.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if self.probing or self.clock() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def before_request(self, name=''):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if not self.probing and self.clock() - self.opened_at >= self.reset_timeout:
+                self.probing = True  # пробный запрос - ровно один
+                return
+            raise CircuitOpenError(f"Circuit for '{name}' is open")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self.probing = False
+
+
+class IntegrationMetrics:
+    """Счётчики интеграции: запросы, ошибки по видам, гистограмма задержек"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя корзина - +Inf
+        self.requests = 0
+        self.latency_sum = 0.0
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=None):
+        with self._lock:
+            self.requests += 1
+            self.latency_sum += seconds
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+    def reject(self):
+        """Запрос отклонён размыкателем - в гистограмму не попадает"""
+        with self._lock:
+            self.errors['circuit_open'] = self.errors.get('circuit_open', 0) + 1
+
+    def quantile(self, q):
+        """Оценка квантиля по корзинам (верхняя граница корзины)"""
+        total = sum(self.counts)
+        if not total:
+            return None
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= q * total:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+                running += count
+                cumulative['+Inf' if bound == float('inf') else bound] = running
+            return {
+                'requests': self.requests,
+                'errors': dict(self.errors),
+                'latency_sum': round(self.latency_sum, 6),
+                'latency_buckets': cumulative,
+            }
+
+
+def backoff_delay(attempt, base=1.0, maximum=60.0, rng=random.random):
+    """Пауза перед повтором attempt (с 0): экспонента с "равным" джиттером - от половины до полной"""
+    delay = min(maximum, base * 2 ** attempt)
+    return delay / 2 + delay / 2 * rng()
+
+
+def classify(error=None, status=None):
+    """Вид ошибки для метрик; None - запрос успешен"""
+    if error is not None:
+        if isinstance(error, (requests.Timeout,) + ((httpx.TimeoutException,) if httpx else ())):
+            return 'timeout'
+        if isinstance(error, (requests.ConnectionError,) + ((httpx.TransportError,) if httpx else ())):
+            return 'connection'
+        return 'other'
+    if status is not None and status >= 500:
+        return 'http_5xx'
+    if status is not None and status >= 400:
+        return 'http_4xx'
+    return None
+
+
+def integration_config(name):
+    """DEFAULTS, переопределённые settings.OUTBOUND_HTTP['default'] и [name]"""
+    overrides = getattr(settings, 'OUTBOUND_HTTP', {})
+    return {**DEFAULTS, **overrides.get('default', {}), **overrides.get(name, {})}
+
+
+class _Instrumented:
+    """Общее для синхронного и асинхронного клиента: размыкатель и метрики"""
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.timeout = config['timeout']
+        self.breaker = CircuitBreaker(config['failure_threshold'], config['reset_timeout'])
+        self.metrics = IntegrationMetrics()
+
+    def _before(self):
+        try:
+            self.breaker.before_request(self.name)
+        except CircuitOpenError:
+            self.metrics.reject()
+            raise
+        return time.perf_counter()
+
+    def _after(self, started, error=None, status=None):
+        kind = classify(error, status)
+        self.metrics.observe(time.perf_counter() - started, kind)
+        # 4xx - ошибка запроса, а не недоступность сервиса: цепь не размыкаем
+        if kind is None or kind == 'http_4xx':
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+
+class OutboundClient(_Instrumented):
+    """
+    Синхронный клиент интеграции: один requests.Session с пулом keep-alive
+    соединений (не больше pool_maxsize на хост, лишние потоки ждут
+    свободного соединения), таймаут по умолчанию, размыкатель и метрики.
+    Интерфейс - как у requests: get/post/request возвращают Response.
+    """
+
+    def __init__(self, name, config=None):
+        super().__init__(name, config or integration_config(name))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.config['pool_hosts'], pool_maxsize=self.config['pool_maxsize'], pool_block=True,
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        started = self._before()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception as e:
+            self._after(started, error=e)
+            raise
+        self._after(started, status=response.status_code)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncOutboundClient(_Instrumented):
+    """То же для async-кода поверх httpx.AsyncClient (пакет httpx - по необходимости)"""
+
+    def __init__(self, name, config=None):
+        if httpx is None:
+            raise ImportError("AsyncOutboundClient requires the 'httpx' package")
+        super().__init__(name, config or integration_config(name))
+        connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=self.config['pool_maxsize'],
+                                max_keepalive_connections=self.config['pool_maxsize']),
+        )
+
+    async def request(self, method, url, **kwargs):
+        started = self._before()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception as e:
+            self._after(started, error=e)
+            raise
+        self._after(started, status=response.status_code)
+        return response
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_clients = {}
+_async_clients = {}
+_registry_lock = threading.Lock()
+
+
+def get_client(name):
+    """Общий на процесс клиент интеграции name ('weather', 'push', ...)"""
+    client = _clients.get(name)
+    if client is None:
+        with _registry_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = OutboundClient(name)
+    return client
+
+
+def get_async_client(name):
+    """
+    Асинхронный клиент интеграции. httpx.AsyncClient привязан к циклу событий,
+    поэтому держим по клиенту на (интеграция, цикл).
+    """
+    import asyncio
+
+    key = (name, id(asyncio.get_running_loop()))
+    client = _async_clients.get(key)
+    if client is None:
+        client = _async_clients.setdefault(key, AsyncOutboundClient(name))
+    return client
+
+
+def metrics_snapshot():
+    """Метрики всех интеграций процесса: {имя: {requests, errors, latency..., circuit}}"""
+    snapshot = {}
+    for client in list(_clients.values()) + list(_async_clients.values()):
+        data = client.metrics.snapshot()
+        data['circuit'] = client.breaker.state
+        current = snapshot.get(client.name)
+        if current is None:
+            snapshot[client.name] = data
+            continue
+        # синхронный и асинхронные клиенты одной интеграции складываем
+        current['requests'] += data['requests']
+        current['latency_sum'] += data['latency_sum']
+        for kind, count in data['errors'].items():
+            current['errors'][kind] = current['errors'].get(kind, 0) + count
+        for bound, count in data['latency_buckets'].items():
+            current['latency_buckets'][bound] += count
+        if data['circuit'] != CLOSED:
+            current['circuit'] = data['circuit']
+    return snapshot
+
+
+def reset_clients():
+    """Закрыть клиенты и забыть метрики (после fork и в проверках)"""
+    with _registry_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _async_clients.clear()
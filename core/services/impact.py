@@ -0,0 +1,286 @@
+# core/services/impact.py
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Max, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .reports import CO2_PER_KWH, HEATING_POWER_PER_SQM, PRICE_PER_KWH, consumed_kwh_expression, saved_kwh_expression
+
+CACHE_SECONDS = 3600
+COUNTER_FIELDS = (
+    'energy_saved_kwh', 'energy_consumed_kwh', 'co2_saved_kg', 'log_count',
+    'recommendations_applied', 'recommendation_savings_kwh',
+)
+
+# Эквиваленты для страницы impact
+CO2_PER_TREE_YEAR = 21.8  # kg
+CO2_PER_CAR_YEAR = 4600.0  # kg
+HOME_HEATING_KWH_YEAR = 10000.0
+BIKE_KM_PER_KG_CO2 = 20.0
+LED_HOURS_PER_KWH = 100.0
+PHONE_CHARGES_PER_KWH = 100.0
+LAPTOP_HOURS_PER_KWH = 20.0
+
+
+def month_start(value):
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def data_version():
+    """Версия счётчиков из самой таблицы: меняется при каждой записи из любого процесса"""
+    from core.models import ImpactCounter
+
+    state = ImpactCounter.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    updated = int(state['updated'].timestamp() * 1e6) if state['updated'] else 0
+    return f"{state['count']}-{updated}"
+
+
+def apply_deltas(deltas):
+    """
+    Прибавить дельты к счётчикам: {(building_id, month): {field: delta}}.
+    UPDATE ... SET f = f + delta, строка создаётся при первом обращении.
+    """
+    from core.models import ImpactCounter
+
+    now = timezone.now()
+    for (building_id, month), values in deltas.items():
+        increments = {field: F(field) + value for field, value in values.items()}
+        increments['updated_at'] = now  # update() не трогает auto_now, а по нему версия кэша
+        counters = ImpactCounter.objects.filter(building_id=building_id, month=month)
+        if counters.update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                ImpactCounter.objects.create(building_id=building_id, month=month, **values)
+        except IntegrityError:
+            counters.update(**increments)  # строку создал параллельный писатель
+
+
+_batch = threading.local()
+
+
+@contextmanager
+def batched():
+    """
+    EnergyLog, сохранённые внутри блока (post_save), учитываются одним пакетом
+    на выходе: один запрос комнат и один UPDATE на (здание, месяц) вместо
+    запросов на каждый лог. Для потоковой записи логов - оборачивать пачку
+    вместе с transaction.atomic().
+    """
+    outer = getattr(_batch, 'logs', None)
+    if outer is not None:  # вложенный блок - копим во внешний
+        yield
+        return
+    _batch.logs = []
+    try:
+        yield
+        logs = _batch.logs
+    finally:
+        _batch.logs = None
+    if logs:
+        record_energy_logs(logs)
+
+
+def energy_log_saved(log):
+    """post_save нового EnergyLog: сразу или в пакет batched()"""
+    logs = getattr(_batch, 'logs', None)
+    if logs is None:
+        record_energy_logs([log])
+    else:
+        logs.append(log)
+
+
+def record_energy_logs(logs):
+    """Учесть новые EnergyLog (пакетом из batched() или вручную после bulk_create)"""
+    from core.models import Room
+
+    rooms = {
+        room_id: (building_id, area)
+        for room_id, building_id, area in Room.objects.filter(
+            id__in={log.room_id for log in logs}
+        ).values_list('id', 'building_id', 'area')
+    }
+    deltas = defaultdict(lambda: dict.fromkeys(('energy_saved_kwh', 'energy_consumed_kwh', 'co2_saved_kg', 'log_count'), 0))
+    for log in logs:
+        if log.room_id not in rooms:
+            continue
+        building_id, area = rooms[log.room_id]
+        saved = max(area * HEATING_POWER_PER_SQM - log.heating_power, 0.0) * log.interval_hours
+        entry = deltas[building_id, month_start(log.timestamp or timezone.now())]
+        entry['energy_saved_kwh'] += saved
+        entry['energy_consumed_kwh'] += log.heating_power * log.interval_hours
+        entry['co2_saved_kg'] += saved * CO2_PER_KWH
+        entry['log_count'] += 1
+    apply_deltas(deltas)
+
+
+def record_applied_recommendations(recommendations):
+    """Учесть рекомендации, только что переведённые в is_applied=True"""
+    from core.models import Room
+
+    buildings = dict(Room.objects.filter(
+        id__in={r.room_id for r in recommendations}
+    ).values_list('id', 'building_id'))
+    deltas = defaultdict(lambda: {'recommendations_applied': 0, 'recommendation_savings_kwh': 0.0})
+    for recommendation in recommendations:
+        if recommendation.room_id not in buildings:
+            continue
+        entry = deltas[buildings[recommendation.room_id], month_start(recommendation.applied_at or timezone.now())]
+        entry['recommendations_applied'] += 1
+        entry['recommendation_savings_kwh'] += recommendation.estimated_savings
+    apply_deltas(deltas)
+
+
+def actual_counters():
+    """
+    Счётчики, пересчитанные из сырых данных: {(building_id, month): {field: value}}.
+    Логи, ушедшие при компактации, учитываются по суточным EnergyLogRollup.
+    """
+    from core.models import EnergyLog, EnergyLogRollup, Recommendation
+
+    actual = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    logs = (
+        EnergyLog.objects.annotate(month=TruncMonth('timestamp', output_field=DateField()))
+        .values('room__building_id', 'month')
+        .annotate(saved=Sum(saved_kwh_expression()), consumed=Sum(consumed_kwh_expression()), n=Count('id'))
+        .order_by()
+    )
+    for row in logs:
+        entry = actual[row['room__building_id'], row['month']]
+        entry['energy_saved_kwh'] = row['saved'] or 0.0
+        entry['energy_consumed_kwh'] = row['consumed'] or 0.0
+        entry['co2_saved_kg'] = entry['energy_saved_kwh'] * CO2_PER_KWH
+        entry['log_count'] = row['n']
+
+    rollups = (
+        EnergyLogRollup.objects.annotate(month=TruncMonth('day'))
+        .values('room__building_id', 'month')
+        .annotate(saved=Sum('saved_kwh'), consumed=Sum('consumed_kwh'), n=Sum('samples'))
+        .order_by()
+    )
+    for row in rollups:
+        entry = actual[row['room__building_id'], row['month']]
+        entry['energy_saved_kwh'] += row['saved'] or 0.0
+        entry['energy_consumed_kwh'] += row['consumed'] or 0.0
+        entry['co2_saved_kg'] = entry['energy_saved_kwh'] * CO2_PER_KWH
+        entry['log_count'] += row['n'] or 0
+
+    applied = (
+        Recommendation.objects.filter(is_applied=True)
+        .annotate(month=TruncMonth(Coalesce('applied_at', 'created_at'), output_field=DateField()))
+        .values('room__building_id', 'month')
+        .annotate(n=Count('id'), savings=Sum('estimated_savings'))
+        .order_by()
+    )
+    for row in applied:
+        entry = actual[row['room__building_id'], row['month']]
+        entry['recommendations_applied'] = row['n']
+        entry['recommendation_savings_kwh'] = row['savings'] or 0.0
+    return actual
+
+
+def reconcile(fix=False, tolerance=0.01):
+    """
+    Сверить счётчики с сырыми данными. Возвращает список расхождений
+    {building_id, month, field, counter, actual}; при fix=True счётчики
+    перезаписываются фактическими значениями.
+    """
+    from core.models import ImpactCounter
+
+    actual = actual_counters()
+    stored = {
+        (counter.building_id, counter.month): counter
+        for counter in ImpactCounter.objects.all()
+    }
+
+    drift = []
+    for key in sorted(set(actual) | set(stored), key=lambda k: (k[0], k[1])):
+        expected = actual.get(key, dict.fromkeys(COUNTER_FIELDS, 0))
+        counter = stored.get(key)
+        for field in COUNTER_FIELDS:
+            value = getattr(counter, field) if counter else 0
+            if abs(value - expected[field]) > tolerance:
+                drift.append({
+                    'building_id': key[0], 'month': key[1], 'field': field,
+                    'counter': value, 'actual': expected[field],
+                })
+
+    if fix and drift:
+        with transaction.atomic():
+            for key in {(d['building_id'], d['month']) for d in drift}:
+                if key in actual:
+                    ImpactCounter.objects.update_or_create(
+                        building_id=key[0], month=key[1], defaults=actual[key]
+                    )
+                else:
+                    stored[key].delete()
+    return drift
+
+
+class ImpactService:
+    """Данные страницы impact - чтение месячных счётчиков (без скана истории)"""
+
+    def __init__(self, building=None, months=12, now=None):
+        self.building = building
+        self.months = months
+        self.now = now or timezone.now()
+
+    def build(self):
+        key = f"impact:{self.building or 'all'}:{month_start(self.now)}:{data_version()}"
+        data = cache.get(key)
+        if data is None:
+            data = self._compute()
+            cache.set(key, data, CACHE_SECONDS)
+        return data
+
+    def _compute(self):
+        from core.models import ImpactCounter, Recommendation, Room
+
+        counters = ImpactCounter.objects.all()
+        rooms = Room.objects.all()
+        if self.building:
+            counters = counters.filter(building_id=self.building)
+            rooms = rooms.filter(building_id=self.building)
+
+        monthly = list(
+            counters.values('month')
+            .annotate(**{field: Sum(field) for field in COUNTER_FIELDS})
+            .order_by('month')
+        )
+        totals = {field: sum(row[field] for row in monthly) for field in COUNTER_FIELDS}
+        current = next((row for row in monthly if row['month'] == month_start(self.now)),
+                       dict.fromkeys(COUNTER_FIELDS, 0))
+        series = monthly[-self.months:]
+
+        energy = totals['energy_saved_kwh'] + totals['recommendation_savings_kwh']
+        co2 = energy * CO2_PER_KWH
+        month_energy = current['energy_saved_kwh'] + current['recommendation_savings_kwh']
+        optimized = (
+            Recommendation.objects.filter(is_applied=True, room__in=rooms)
+            .values('room').distinct().count()
+        )
+        return {
+            'total_energy_saved': round(energy, 1),
+            'total_co2_saved': round(co2, 1),
+            'total_trees': round(co2 / CO2_PER_TREE_YEAR),
+            'cars_off_road': round(co2 / CO2_PER_CAR_YEAR, 1),
+            'homes_heated': round(energy / HOME_HEATING_KWH_YEAR, 1),
+            'monthly_energy': round(month_energy),
+            'monthly_co2': round(month_energy * CO2_PER_KWH),
+            'monthly_savings': round(month_energy * PRICE_PER_KWH),
+            'optimized_rooms': optimized,
+            'total_rooms': rooms.count(),
+            'bike_km': round(co2 * BIKE_KM_PER_KG_CO2),
+            'led_hours': round(energy * LED_HOURS_PER_KWH),
+            'phone_charges': round(energy * PHONE_CHARGES_PER_KWH),
+            'laptop_hours': round(energy * LAPTOP_HOURS_PER_KWH),
+            'chart_labels': [row['month'].strftime('%b %Y') for row in series],
+            'chart_energy': [round(row['energy_saved_kwh'] + row['recommendation_savings_kwh'], 1) for row in series],
+            'chart_co2': [round(row['co2_saved_kg'] + row['recommendation_savings_kwh'] * CO2_PER_KWH, 1)
+                          for row in series],
+        }
@@ -0,0 +1,341 @@
+# core/services/leaderboard.py
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F, FloatField, Sum
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+PERIODS = ('daily', 'weekly', 'monthly', 'all_time')
+CO2_PER_KWH = 0.4
+USER_BITS = 32
+USER_MASK = (1 << USER_BITS) - 1
+BATCH_SIZE = 5000
+UPDATE_BATCH_SIZE = 500  # bulk_update строит CASE WHEN - держим его коротким
+MIN_POINTS = -(1 << 31)
+# Ключ UserAchievement.data: kWh, впервые зачтённые этим достижением (прирост, не накопленная сумма)
+ENERGY_KEY = 'energy_saved'
+
+
+def period_start(period, now=None):
+    """Первый день окна периода (None для all_time)"""
+    today = timezone.localtime(now).date()
+    if period == 'daily':
+        return today
+    if period == 'weekly':
+        return today - timedelta(days=today.weekday())
+    if period == 'monthly':
+        return today.replace(day=1)
+    return None
+
+
+def window_start(start):
+    return None if start is None else timezone.make_aware(datetime.combine(start, time.min))
+
+
+def achievement_energy(achievement):
+    """Энергия, приписанная достижению (kWh) - из data[ENERGY_KEY]"""
+    return float((achievement.data or {}).get(ENERGY_KEY) or 0.0)
+
+
+class RankIndex:
+    """
+    Отсортированный список ключей (-points, user_id), упакованных в один int.
+    Ранг (1 + число пользователей со строго большими очками) - бинарным
+    поиском за O(log n); изменение очков - удаление/вставка без пересортировки.
+    """
+
+    def __init__(self, points=None):
+        self.points = dict(points or {})
+        self.keys = sorted(self._key(p, u) for u, p in self.points.items())
+
+    @staticmethod
+    def _key(points, user_id):
+        return (-points << USER_BITS) | user_id
+
+    def __len__(self):
+        return len(self.keys)
+
+    def position(self, user_id):
+        return bisect_left(self.keys, self._key(self.points[user_id], user_id))
+
+    def rank(self, user_id):
+        points = self.points.get(user_id)
+        if points is None:
+            return None
+        return bisect_left(self.keys, -points << USER_BITS) + 1
+
+    def add(self, user_id, delta):
+        """Прибавить очки; возвращает (старая позиция или None, новая позиция)"""
+        old = self.points.get(user_id)
+        old_position = None
+        if old is not None:
+            old_position = self.position(user_id)
+            del self.keys[old_position]
+        points = self.points[user_id] = (old or 0) + delta
+        key = self._key(points, user_id)
+        position = bisect_left(self.keys, key)
+        self.keys.insert(position, key)
+        return old_position, position
+
+    def ranks(self, lo=0, hi=None):
+        """(user_id, rank) для позиций [lo, hi) - спортивная нумерация 1, 2, 2, 4"""
+        hi = len(self.keys) if hi is None else min(hi, len(self.keys))
+        rank = previous = None
+        for i in range(lo, hi):
+            key = self.keys[i]
+            points = key >> USER_BITS
+            if points != previous:
+                rank = i + 1 if previous is not None else bisect_left(self.keys, points << USER_BITS) + 1
+                previous = points
+            yield key & USER_MASK, rank
+
+    def top(self, n):
+        return list(self.ranks(0, n))
+
+
+class Board:
+    """Таблица одного периода в памяти: индекс рангов, энергия, id строк и отложенные сдвиги"""
+
+    def __init__(self, period, start, version, rows=()):
+        self.period = period
+        self.start = start
+        self.version = version
+        self.row_ids = {}
+        self.energy = {}
+        self.pending = defaultdict(int)  # разностный массив сдвигов рангов по очкам
+        self.dirty = set()  # пользователи, чьи ранги переписываются при flush
+        points = {}
+        for row_id, user_id, row_points, energy in rows:
+            self.row_ids[user_id] = row_id
+            self.energy[user_id] = energy
+            points[user_id] = row_points
+        self.index = RankIndex(points)
+
+
+class LeaderboardEngine:
+    """
+    Материализованные таблицы лидеров по периодам. Очки - сумма
+    UserAchievement.points_earned в окне периода, энергия - data[ENERGY_KEY].
+    Индекс рангов в памяти живёт у пишущего процесса: новые достижения пишут
+    строки самих пользователей bulk_update, а сдвиги рангов остальных
+    применяются одним UPDATE на отрезок очков (индекс period/points).
+    Чтение - из таблицы: ранг по уникальному индексу, топ по (period, rank).
+    Запись начинается со сдвига версии периода в LeaderboardVersion: UPDATE
+    блокирует строку до коммита, так что писатели (веб-воркеры, команды)
+    идут по очереди, и индекс перечитывается, если с нашей последней записи
+    писал кто-то ещё. При смене окна периода - пересчитывается: первой
+    записью или первым чтением rank/top в новом окне.
+    """
+
+    def __init__(self):
+        self._boards = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _version(period):
+        from core.models import LeaderboardVersion
+
+        return LeaderboardVersion.objects.filter(period=period).values_list('version', flat=True).first() or 0
+
+    @staticmethod
+    def _bump(period):
+        """Сдвинуть версию периода в текущей транзакции и вернуть новую; строка заблокирована до коммита"""
+        from core.models import LeaderboardVersion
+
+        if not LeaderboardVersion.objects.filter(period=period).update(version=F('version') + 1):
+            LeaderboardVersion.objects.get_or_create(period=period)
+            LeaderboardVersion.objects.filter(period=period).update(version=F('version') + 1)
+        return LeaderboardVersion.objects.filter(period=period).values_list('version', flat=True).get()
+
+    def board(self, period, now=None, version=None):
+        from core.models import Leaderboard
+
+        start = period_start(period, now)
+        if version is None:
+            version = self._version(period)
+        with self._lock:
+            board = self._boards.get(period)
+            if board is not None and board.start == start and board.version == version:
+                return board
+
+            rows = Leaderboard.objects.filter(period=period)
+            stale = rows.exclude(period_start__isnull=True) if start is None else rows.exclude(period_start=start)
+            if stale.exists():
+                return self.rebuild(period, now)
+            board = Board(period, start, version, rows.values_list('id', 'user_id', 'points', 'energy_saved'))
+            self._boards[period] = board
+            return board
+
+    def claim(self, period, now=None):
+        """
+        Таблица периода для записи - вызывать внутри transaction.atomic():
+        версия сдвигается (блокировка до коммита), индекс перечитывается,
+        если версия ушла дальше нашей последней записи.
+        """
+        version = self._bump(period)
+        board = self.board(period, now, version - 1)
+        if board.version == version - 1:
+            board.version = version
+        return board
+
+    def rebuild(self, period, now=None):
+        """Полный пересчёт периода из UserAchievement (смена окна, сверка)"""
+        from core.models import Leaderboard, UserAchievement
+
+        start = period_start(period, now)
+        achievements = UserAchievement.objects.all()
+        if start is not None:
+            achievements = achievements.filter(earned_at__gte=window_start(start))
+        totals = (
+            achievements.values('user_id')
+            .annotate(points=Sum('points_earned'),
+                      energy=Sum(Cast(KT(f'data__{ENERGY_KEY}'), FloatField())))
+            .order_by()
+            .values_list('user_id', 'points', 'energy')
+        )
+        energy = {}
+        points = {}
+        for user_id, user_points, user_energy in totals:
+            points[user_id] = user_points or 0
+            energy[user_id] = user_energy or 0.0
+
+        index = RankIndex(points)
+        updated_at = timezone.now()
+        with self._lock, transaction.atomic():
+            version = self._bump(period)
+            Leaderboard.objects.filter(period=period).delete()
+            Leaderboard.objects.bulk_create(
+                (Leaderboard(period=period, user_id=user_id, points=points[user_id],
+                             energy_saved=energy[user_id], co2_reduced=energy[user_id] * CO2_PER_KWH,
+                             rank=rank, period_start=start, updated_at=updated_at)
+                 for user_id, rank in index.ranks()),
+                batch_size=BATCH_SIZE,
+            )
+            board = Board(period, start, version, Leaderboard.objects.filter(period=period).values_list(
+                'id', 'user_id', 'points', 'energy_saved'))
+            self._boards[period] = board
+        return board
+
+    def record(self, achievements, now=None):
+        """Учесть новые достижения во всех периодах, чьё окно их включает (период - одна транзакция)"""
+        for period in PERIODS:
+            since = window_start(period_start(period, now))
+            relevant = [a for a in achievements if since is None or (a.earned_at or timezone.now()) >= since]
+            if not relevant:
+                continue
+            with self._lock, transaction.atomic():
+                board = self.claim(period, now)
+                self._apply(board, relevant)
+                self.flush(board)
+
+    def _apply(self, board, achievements):
+        from core.models import Leaderboard
+
+        deltas = defaultdict(lambda: [0, 0.0])
+        for achievement in achievements:
+            delta = deltas[achievement.user_id]
+            delta[0] += achievement.points_earned
+            delta[1] += achievement_energy(achievement)
+
+        with self._lock:
+            # Ранг = 1 + число пользователей со строго большими очками. Рост очков
+            # пользователя с old до new сдвигает на +1 всех с очками в [old, new),
+            # новый пользователь - всех с очками < new. Сдвиги копим по отрезкам очков.
+            for user_id, (points, energy) in deltas.items():
+                old = board.index.points.get(user_id)
+                board.index.add(user_id, points)
+                board.energy[user_id] = board.energy.get(user_id, 0.0) + energy
+                new = board.index.points[user_id]
+                if old is None:
+                    low, high, sign = MIN_POINTS, new, 1
+                else:
+                    low, high, sign = min(old, new), max(old, new), 1 if new > old else -1
+                if low < high:
+                    board.pending[low] += sign
+                    board.pending[high] -= sign
+            board.dirty.update(deltas)
+
+            updated_at = timezone.now()
+            rows = [
+                Leaderboard(
+                    id=board.row_ids.get(user_id), period=board.period, user_id=user_id,
+                    points=board.index.points[user_id], energy_saved=board.energy[user_id],
+                    co2_reduced=board.energy[user_id] * CO2_PER_KWH, rank=board.index.rank(user_id),
+                    period_start=board.start, updated_at=updated_at,
+                )
+                for user_id in deltas
+            ]
+            with transaction.atomic():
+                Leaderboard.objects.bulk_update(
+                    [row for row in rows if row.id],
+                    ['points', 'energy_saved', 'co2_reduced', 'rank', 'updated_at'], batch_size=UPDATE_BATCH_SIZE,
+                )
+                created = Leaderboard.objects.bulk_create([row for row in rows if not row.id], batch_size=BATCH_SIZE)
+            if created:
+                board.row_ids.update(Leaderboard.objects.filter(
+                    period=board.period, user_id__in=[row.user_id for row in created]
+                ).values_list('user_id', 'id'))
+        return len(rows)
+
+    def flush(self, board):
+        """
+        Применить накопленные сдвиги: один UPDATE rank = rank + shift на отрезок
+        очков (каждая строка - не более одного раза), затем точные ранги
+        изменившихся пользователей из индекса. Вызывать в той же транзакции,
+        что claim и _apply: иначе другой писатель увидит сдвиги неприменёнными.
+        """
+        from core.models import Leaderboard
+
+        if not board.dirty:
+            return
+        with self._lock, transaction.atomic():
+            rows = Leaderboard.objects.filter(period=board.period)
+            shift, bounds = 0, sorted(board.pending)
+            for low, high in zip(bounds, bounds[1:]):
+                shift += board.pending[low]
+                if shift:
+                    rows.filter(points__gte=low, points__lt=high).update(rank=F('rank') + shift)
+            Leaderboard.objects.bulk_update(
+                [Leaderboard(id=board.row_ids[user_id], rank=board.index.rank(user_id)) for user_id in board.dirty],
+                ['rank'], batch_size=UPDATE_BATCH_SIZE,
+            )
+            board.pending.clear()
+            board.dirty.clear()
+
+    def rank(self, period, user_id, now=None):
+        """Ранг пользователя: строка по уникальному индексу (period, user) - O(log n)"""
+        from core.models import Leaderboard
+
+        def read():
+            return Leaderboard.objects.filter(period=period, user_id=user_id).values_list(
+                'rank', 'period_start').first()
+
+        row = read()
+        if row is not None and row[1] != period_start(period, now):
+            self.rebuild(period, now)
+            row = read()
+        return row and row[0]
+
+    def top(self, period, n=5, now=None):
+        """Топ-n по индексу (period, rank)"""
+        from core.models import Leaderboard
+
+        def read():
+            return list(
+                Leaderboard.objects.filter(period=period).select_related('user').order_by('rank', 'user_id')[:n]
+            )
+
+        rows = read()
+        # Окно сменилось, а записей ещё не было - строки прошлого окна пересчитываем при первом чтении
+        if rows and rows[0].period_start != period_start(period, now):
+            self.rebuild(period, now)
+            rows = read()
+        return rows
+
+
+leaderboard = LeaderboardEngine()
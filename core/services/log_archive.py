@@ -0,0 +1,252 @@
+# core/services/log_archive.py
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+EXPORT_CHUNK = 100000
+# Колонки сегмента: имя -> dtype. Строки отсортированы по (room, ts).
+COLUMNS = {
+    'id': np.int64,
+    'room': np.uint32,  # индекс в словаре rooms.npy
+    'ts': np.int64,  # epoch, секунды
+    'temperature_inside': np.float32,
+    'temperature_outside': np.float32,
+    'heating_power': np.float32,
+    'co2_saved': np.float32,
+}
+VALUE_COLUMNS = ('temperature_inside', 'temperature_outside', 'heating_power', 'co2_saved')
+
+
+def _epoch(value):
+    return int(value.timestamp())
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Segment:
+    """Один закрытый интервал [start, end): колонки .npy, открытые через memmap"""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.start = meta['start']
+        self.end = meta['end']
+        self.rows = meta['rows']
+        self._columns = {}
+
+    def column(self, name):
+        """Колонка без копирования (np.load с mmap_mode='r')"""
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self._columns[name]
+
+    @property
+    def rooms(self):
+        return self.column('rooms')
+
+    @property
+    def offsets(self):
+        return self.column('offsets')
+
+    def room_slices(self, room_ids=None):
+        """(room_id, lo, hi) - строки комнаты в сегменте, по словарю и смещениям"""
+        rooms, offsets = self.rooms, self.offsets
+        if room_ids is None:
+            codes = np.arange(len(rooms))
+        else:
+            wanted = np.asarray(room_ids, dtype=rooms.dtype)
+            codes = np.searchsorted(rooms, wanted)
+            codes = codes[(codes < len(rooms)) & (rooms[np.minimum(codes, len(rooms) - 1)] == wanted)]
+        return zip(rooms[codes].tolist(), offsets[codes].tolist(), offsets[codes + 1].tolist())
+
+
+class ColumnarArchive:
+    """
+    Колоночный архив EnergyLog на диске. Каждый экспорт - сегмент за закрытый
+    интервал времени: колонки .npy (epoch-секунды, индекс комнаты в словаре
+    rooms.npy, значения float32), строки отсортированы по (комната, время),
+    offsets.npy - начало строк каждой комнаты. Сегменты только добавляются
+    в конец; manifest.json хранит интервалы и sha256 каждого файла.
+    """
+
+    def __init__(self, root=None):
+        self.root = str(root or getattr(settings, 'ENERGY_ARCHIVE_DIR', settings.BASE_DIR / 'archive' / 'energy_logs'))
+        self._segments = None
+
+    # --- манифест ----------------------------------------------------------
+
+    def manifest(self):
+        path = os.path.join(self.root, MANIFEST)
+        if not os.path.exists(path):
+            return {'version': FORMAT_VERSION, 'segments': []}
+        with open(path) as handle:
+            return json.load(handle)
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST)
+        with open(path + '.tmp', 'w') as handle:
+            json.dump(manifest, handle, indent=1)
+        os.replace(path + '.tmp', path)  # атомарно: читатели видят старый или новый манифест
+        self._segments = None
+
+    def segments(self, start=None, end=None):
+        """Сегменты, пересекающие [start, end) (epoch или datetime)"""
+        if self._segments is None:
+            self._segments = [
+                Segment(os.path.join(self.root, meta['name']), meta) for meta in self.manifest()['segments']
+            ]
+        start = _epoch(start) if isinstance(start, datetime) else start
+        end = _epoch(end) if isinstance(end, datetime) else end
+        return [
+            segment for segment in self._segments
+            if (start is None or segment.end > start) and (end is None or segment.start < end)
+        ]
+
+    @property
+    def end(self):
+        """Конец последнего сегмента (epoch) - дальше можно только дописывать"""
+        segments = self.manifest()['segments']
+        return segments[-1]['end'] if segments else None
+
+    # --- запись ------------------------------------------------------------
+
+    def read_logs(self, start, end):
+        """Строки EnergyLog интервала [start, end) как массивы колонок, чанками по id"""
+        from core.models import EnergyLog
+
+        queryset = EnergyLog.objects.filter(timestamp__gte=start, timestamp__lt=end).order_by('id')
+        names = ('id', 'room_id', 'timestamp', *VALUE_COLUMNS)
+        chunks = {name: [] for name in COLUMNS}
+        last_id = 0
+        while True:
+            rows = list(queryset.filter(id__gt=last_id).values_list(*names)[:EXPORT_CHUNK])
+            if not rows:
+                break
+            count = len(rows)
+            chunks['id'].append(np.fromiter((r[0] for r in rows), dtype=np.int64, count=count))
+            chunks['room'].append(np.fromiter((r[1] for r in rows), dtype=np.int64, count=count))
+            chunks['ts'].append(np.fromiter((_epoch(r[2]) for r in rows), dtype=np.int64, count=count))
+            for i, name in enumerate(VALUE_COLUMNS, start=3):
+                chunks[name].append(np.fromiter((r[i] for r in rows), dtype=COLUMNS[name], count=count))
+            last_id = rows[-1][0]
+        return {name: np.concatenate(parts) if parts else np.empty(0, dtype=COLUMNS[name])
+                for name, parts in chunks.items()}
+
+    def append(self, start, end, columns=None):
+        """
+        Записать сегмент [start, end). Интервал должен быть закрыт (end <= now)
+        и начинаться не раньше конца архива. columns - готовые массивы
+        (id, room=room_id, ts, значения); по умолчанию читаются из EnergyLog.
+        """
+        start_epoch, end_epoch = _epoch(start), _epoch(end)
+        if end > timezone.now():
+            raise ValueError("Archive segments must cover closed time ranges (end <= now)")
+        if start_epoch >= end_epoch:
+            raise ValueError("Empty archive range")
+        if self.end is not None and start_epoch < self.end:
+            raise ValueError(f"Archive is append-only: range starts before its end ({self.end})")
+
+        data = columns if columns is not None else self.read_logs(start, end)
+        room_ids, codes = np.unique(data['room'], return_inverse=True)
+        order = np.lexsort((data['ts'], codes))
+        offsets = np.searchsorted(codes[order], np.arange(len(room_ids) + 1))
+
+        name = f"seg_{start_epoch}_{end_epoch}"
+        path = os.path.join(self.root, name)
+        tmp = path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        files = {
+            'rooms': room_ids.astype(np.int64),
+            'offsets': offsets.astype(np.int64),
+            'room': codes[order].astype(COLUMNS['room']),
+            **{column: np.asarray(data[column])[order].astype(COLUMNS[column])
+               for column in COLUMNS if column != 'room'},
+        }
+        checksums = {}
+        for column, array in files.items():
+            file_path = os.path.join(tmp, f'{column}.npy')
+            np.save(file_path, np.ascontiguousarray(array), allow_pickle=False)
+            checksums[column] = _sha256(file_path)
+        shutil.rmtree(path, ignore_errors=True)  # остаток прерванной записи, в манифест не попал
+        os.replace(tmp, path)
+
+        meta = {
+            'name': name, 'start': start_epoch, 'end': end_epoch, 'rows': int(len(order)),
+            'rooms': int(len(room_ids)), 'sha256': checksums,
+        }
+        manifest = self.manifest()
+        manifest['segments'].append(meta)
+        self._write_manifest(manifest)
+        return meta
+
+    def verify(self):
+        """Проверить файлы сегментов по sha256 из манифеста; список ошибок"""
+        problems = []
+        for meta in self.manifest()['segments']:
+            for column, expected in meta['sha256'].items():
+                file_path = os.path.join(self.root, meta['name'], f'{column}.npy')
+                if not os.path.exists(file_path):
+                    problems.append(f"{meta['name']}/{column}.npy: missing")
+                elif _sha256(file_path) != expected:
+                    problems.append(f"{meta['name']}/{column}.npy: checksum mismatch")
+        return problems
+
+    # --- чтение ------------------------------------------------------------
+
+    def range_sums(self, start, end, column='heating_power', room_ids=None):
+        """
+        Сумма и число строк по комнатам за [start, end): {room_id: (sum, count)}.
+        Время внутри комнаты отсортировано - границы ищутся бинарным поиском,
+        с диска читаются только нужные страницы колонок.
+        """
+        start_epoch, end_epoch = _epoch(start), _epoch(end)
+        totals = {}
+        for segment in self.segments(start_epoch, end_epoch):
+            ts, values = segment.column('ts'), segment.column(column)
+            whole = start_epoch <= segment.start and segment.end <= end_epoch
+            for room_id, lo, hi in segment.room_slices(room_ids):
+                if not whole:
+                    room_ts = ts[lo:hi]
+                    lo, hi = lo + np.searchsorted(room_ts, start_epoch), lo + np.searchsorted(room_ts, end_epoch)
+                if hi <= lo:
+                    continue
+                value, count = totals.get(room_id, (0.0, 0))
+                totals[room_id] = (value + float(values[lo:hi].sum(dtype=np.float64)), count + hi - lo)
+        return totals
+
+    def scan(self, start, end, columns=VALUE_COLUMNS, room_ids=None):
+        """
+        Строки интервала для аналитики и обучения: по сегментам
+        (room_ids, ts, {колонка: массив}); срезы memmap без копирования,
+        если сегмент целиком внутри интервала и фильтра по комнатам нет.
+        """
+        start_epoch, end_epoch = _epoch(start), _epoch(end)
+        for segment in self.segments(start_epoch, end_epoch):
+            rooms = segment.rooms[segment.column('room')]
+            ts = segment.column('ts')
+            mask = None
+            if not (start_epoch <= segment.start and segment.end <= end_epoch):
+                mask = (ts >= start_epoch) & (ts < end_epoch)
+            if room_ids is not None:
+                in_rooms = np.isin(rooms, room_ids)
+                mask = in_rooms if mask is None else mask & in_rooms
+            if mask is None:
+                yield rooms, ts, {name: segment.column(name) for name in columns}
+            else:
+                yield rooms[mask], ts[mask], {name: segment.column(name)[mask] for name in columns}
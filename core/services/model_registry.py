@@ -0,0 +1,171 @@
+# core/services/model_registry.py
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LinearModel:
+    """Линейная модель: коэффициенты + свободный член"""
+
+    __slots__ = ('coef', 'intercept', 'features')
+
+    def __init__(self, coef, intercept=0.0, features=None):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.features = list(features or [])
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return X @ self.coef + self.intercept
+
+    def dumps(self):
+        """Компактная сериализация в .npz"""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            coef=self.coef,
+            intercept=np.array([self.intercept]),
+            features=np.array(self.features, dtype=str),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def loads(cls, raw):
+        if raw[:2] != b'PK':  # .npz - это zip-архив
+            raise ValueError("not an .npz model (legacy pickle? run convert_pickle_models)")
+        with np.load(io.BytesIO(raw), allow_pickle=False) as data:
+            return cls(data['coef'], data['intercept'][0], data['features'].tolist())
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        """Извлекаем коэффициенты из обученной sklearn-модели"""
+        coef = np.ravel(estimator.coef_)
+        intercept = np.ravel(estimator.intercept_)
+        return cls(coef, intercept[0] if intercept.size else 0.0,
+                   getattr(estimator, 'feature_names_in_', None))
+
+
+# Комнат в одном запросе версий (room_id IN (...))
+VERSION_CHUNK_SIZE = 500
+
+
+# Демо-коэффициенты, которыми раньше пользовался AdvancedThermalCalculator
+DEFAULT_COOLDOWN_MODEL = LinearModel(
+    coef=[0.5, -2.3, 15.7],
+    intercept=30.2,
+    features=['area', 'outside_temperature', 'heat_loss_factor'],
+)
+
+
+class ModelRegistry:
+    """
+    Кэш обученных моделей по комнатам (LRU) с проверкой версий.
+    Версия модели - (id, trained_at) записи OccupancyPredictionModel.
+    """
+
+    def __init__(self, max_size=2048):
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_models(self, model_name, room_ids):
+        """Модели для набора комнат: {room_id: LinearModel | None}"""
+        versions = self._latest_versions(model_name, room_ids)
+        models = {}
+        for room_id in room_ids:
+            version = versions.get(room_id)
+            models[room_id] = self._get_cached(model_name, room_id, version) if version else None
+        return models
+
+    def predict_many(self, model_name, room_ids, X, default=None):
+        """
+        Пакетное предсказание: строка X[i] относится к комнате room_ids[i].
+        Коэффициенты собираются в матрицу, предсказание - одна операция.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if not len(room_ids):
+            return np.zeros(0)
+
+        models = self.get_models(model_name, list(dict.fromkeys(room_ids)))
+        n_features = X.shape[1]
+
+        # Уникальные модели -> индекс строки в матрице коэффициентов
+        unique, slots = [], {}
+        row_model = np.empty(len(room_ids), dtype=np.int64)
+        for i, room_id in enumerate(room_ids):
+            model = models.get(room_id) or default
+            if model is None or model.coef.shape[0] != n_features:
+                model = default
+            if model is None:
+                raise LookupError(f"No '{model_name}' model for room {room_id}")
+            key = id(model)
+            if key not in slots:
+                slots[key] = len(unique)
+                unique.append(model)
+            row_model[i] = slots[key]
+
+        coef = np.vstack([m.coef for m in unique])
+        intercept = np.array([m.intercept for m in unique])
+        return np.einsum('ij,ij->i', X, coef[row_model]) + intercept[row_model]
+
+    def invalidate(self, model_name=None, room_id=None):
+        with self._lock:
+            if model_name is None:
+                self._cache.clear()
+                return
+            self._cache.pop((model_name, room_id), None)
+
+    def _latest_versions(self, model_name, room_ids):
+        from core.models import OccupancyPredictionModel
+
+        versions = {}
+        room_ids = list(room_ids)
+        # IN (...) по частям: лимит параметров SQLite и без выборки чужих комнат
+        for start in range(0, len(room_ids), VERSION_CHUNK_SIZE):
+            rows = OccupancyPredictionModel.objects.filter(
+                model_name=model_name, room_id__in=room_ids[start:start + VERSION_CHUNK_SIZE],
+            ).order_by('room_id', 'trained_at').values_list('room_id', 'id', 'trained_at', 'model_file')
+            for room_id, pk, trained_at, model_file in rows:
+                if model_file:
+                    versions[room_id] = (pk, trained_at, model_file)
+        return versions
+
+    def _get_cached(self, model_name, room_id, version):
+        pk, trained_at, model_file = version
+        key = (model_name, room_id)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] == (pk, trained_at):
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        self.misses += 1
+        model = self._load(model_file)
+        with self._lock:
+            self._cache[key] = ((pk, trained_at), model)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return model
+
+    @staticmethod
+    def _load(model_file):
+        from django.core.files.storage import default_storage
+
+        try:
+            with default_storage.open(model_file, 'rb') as fh:
+                return LinearModel.loads(fh.read())
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            logger.warning("Model load error (%s): %s", model_file, e)
+            return None
+
+
+registry = ModelRegistry()
@@ -0,0 +1,163 @@
+# core/services/preheat_scheduler.py
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+HEATING_POWER_PER_SQM = 100  # W/m², как в ThermalCalculator
+CEILING_HEIGHT = 3.0  # m
+MAX_PREHEAT_MINUTES = 180  # если до цели не догреть - начинаем не раньше, чем за 3 часа
+MIN_HEATING_MINUTES = 15
+
+SCHEDULE_DTYPE = np.dtype([
+    ('room_id', np.int64),
+    ('start', np.float64),  # epoch seconds
+    ('stop', np.float64),
+])
+
+
+def room_parameters(rooms):
+    """Тепловые параметры комнат в виде массивов"""
+    rooms = list(rooms)
+    area = np.array([r.area for r in rooms], dtype=np.float64)
+    return {
+        'room_id': np.array([r.id for r in rooms], dtype=np.int64),
+        'area': area,
+        'ua': area * np.array([r.get_heat_loss_factor() for r in rooms], dtype=np.float64),  # W/K
+        'capacity': area * 0.1 * 1000 + area * CEILING_HEIGHT * 1.225 * 1005,  # J/K: стены + воздух
+        'power': area * HEATING_POWER_PER_SQM,  # W
+        'target': np.array([r.target_temperature for r in rooms], dtype=np.float64),
+        'comfort': np.array([r.comfort_temperature for r in rooms], dtype=np.float64),
+    }
+
+
+def warmup_minutes(params, outside, start_temperature=None):
+    """
+    RC-модель: C dT/dt = P - UA (T - T_out).
+    Время нагрева от start_temperature (по умолчанию comfort) до target.
+    """
+    t0 = params['comfort'] if start_temperature is None else start_temperature
+    tau = params['capacity'] / params['ua']
+    t_eq = outside + params['power'] / params['ua']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = (params['target'] - t_eq) / (t0 - t_eq)
+        minutes = -tau * np.log(ratio) / 60
+    minutes = np.where((t_eq > params['target']) & (ratio > 0), minutes, MAX_PREHEAT_MINUTES)
+    return np.clip(np.nan_to_num(minutes, nan=0.0), 0, MAX_PREHEAT_MINUTES)
+
+
+def cooldown_minutes(params, outside):
+    """Сколько минут комната держит комфортную температуру после отключения"""
+    tau = params['capacity'] / params['ua']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = (params['comfort'] - outside) / (params['target'] - outside)
+        minutes = -tau * np.log(ratio) / 60
+    valid = (params['target'] > params['comfort']) & (params['comfort'] > outside)
+    return np.where(valid, np.nan_to_num(minutes, nan=0.0), 0.0)
+
+
+class PreheatScheduler:
+    """
+    Предиктивный график отопления: для каждого занятия - самое позднее
+    включение (с учетом времени прогрева) и самое раннее выключение
+    (с учетом остывания). Пересекающиеся интервалы одной комнаты сливаются.
+    """
+
+    def __init__(self, horizon=timedelta(hours=24), now=None):
+        self.horizon = horizon
+        self.now = now or timezone.now()
+
+    def fetch_bookings(self, room_ids=None):
+        from core.models import OccupancyLog
+
+        queryset = OccupancyLog.objects.filter(
+            is_active=True,
+            end_time__gt=self.now,
+            start_time__lt=self.now + self.horizon,
+        )
+        if room_ids is not None:
+            queryset = queryset.filter(room_id__in=room_ids)
+
+        rows = list(queryset.order_by().values_list('room_id', 'start_time', 'end_time'))
+        room = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        start = np.fromiter((r[1].timestamp() for r in rows), dtype=np.float64, count=len(rows))
+        end = np.fromiter((r[2].timestamp() for r in rows), dtype=np.float64, count=len(rows))
+        return room, start, end
+
+    def build(self, rooms, outside_temperature, bookings=None):
+        """
+        Возвращает структурированный массив SCHEDULE_DTYPE, отсортированный по (room_id, start).
+        outside_temperature - число или WeatherSeries: тогда прогрев считается по
+        температуре на начало занятия, остывание - на его конец.
+        """
+        params = room_parameters(rooms)
+        if bookings is None:
+            bookings = self.fetch_bookings(params['room_id'].tolist())
+        room, start, end = bookings
+
+        # Индекс комнаты для каждого занятия
+        order = np.argsort(params['room_id'])
+        sorted_ids = params['room_id'][order]
+        pos = np.searchsorted(sorted_ids, room)
+        known = (pos < len(sorted_ids)) & (sorted_ids[np.minimum(pos, len(sorted_ids) - 1)] == room)
+        idx = order[pos[known]]
+        start, end = start[known], end[known]
+
+        if hasattr(outside_temperature, 'at'):
+            booking_params = {key: value[idx] for key, value in params.items()}
+            warmup = warmup_minutes(booking_params, outside_temperature.at(start)) * 60
+            cooldown = cooldown_minutes(booking_params, outside_temperature.at(end)) * 60
+        else:
+            warmup = warmup_minutes(params, outside_temperature)[idx] * 60
+            cooldown = cooldown_minutes(params, outside_temperature)[idx] * 60
+
+        now_ts = self.now.timestamp()
+        heat_on = np.maximum(start - warmup, now_ts)
+        # Выключаем заранее, но держим отопление хотя бы MIN_HEATING_MINUTES
+        heat_off = np.maximum(end - cooldown, np.maximum(start, heat_on) + MIN_HEATING_MINUTES * 60)
+        heat_off = np.minimum(heat_off, end)
+
+        return self._merge(idx, heat_on, heat_off, params['room_id'])
+
+    @staticmethod
+    def _merge(idx, heat_on, heat_off, room_ids):
+        """Слияние пересекающихся интервалов в пределах комнаты (векторно)"""
+        if not len(idx):
+            return np.zeros(0, dtype=SCHEDULE_DTYPE)
+
+        order = np.lexsort((heat_on, idx))
+        idx, heat_on, heat_off = idx[order], heat_on[order], heat_off[order]
+
+        # Сдвиг по комнате делает накопленный максимум независимым между комнатами
+        offset = idx * (heat_off.max() - heat_on.min() + 1.0)
+        running_off = np.maximum.accumulate(heat_off - heat_on.min() + offset)
+        new_group = np.ones(len(idx), dtype=bool)
+        new_group[1:] = (idx[1:] != idx[:-1]) | (heat_on[1:] - heat_on.min() + offset[1:] > running_off[:-1])
+
+        first = np.flatnonzero(new_group)
+        schedule = np.zeros(len(first), dtype=SCHEDULE_DTYPE)
+        schedule['room_id'] = room_ids[idx[first]]
+        schedule['start'] = heat_on[first]
+        schedule['stop'] = np.maximum.reduceat(heat_off, first)
+        return schedule
+
+    @staticmethod
+    def events(schedule):
+        """
+        Поток событий (time, room_id, heating_on) в порядке времени - то, что
+        выдавала бы очередь с приоритетом; здесь это одна устойчивая сортировка.
+        """
+        times = np.concatenate([schedule['start'], schedule['stop']])
+        rooms = np.concatenate([schedule['room_id'], schedule['room_id']])
+        is_on = np.concatenate([np.ones(len(schedule), bool), np.zeros(len(schedule), bool)])
+        order = np.lexsort((is_on, times))  # при равном времени сначала выключение
+        return times[order], rooms[order], is_on[order]
+
+    @staticmethod
+    def to_payload(schedule):
+        """Компактное представление для API: [[room_id, start, stop], ...] в epoch-секундах"""
+        return [
+            [int(room_id), int(start), int(stop)]
+            for room_id, start, stop in schedule.tolist()
+        ]
@@ -0,0 +1,252 @@
+# core/services/push.py
+import hashlib
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .http_client import backoff_delay, get_client
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000  # строк outbox за один проход воркера
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30.0  # секунд перед первым повтором
+BACKOFF_MAX = 3600.0
+DEDUP_WINDOW_MINUTES = 10  # одинаковое уведомление на тот же токен внутри окна - одно
+CLAIM_TIMEOUT = timedelta(minutes=5)  # строки sending дольше - воркер упал, возвращаем в очередь
+
+# Результат по токену от провайдера
+DELIVERED, RETRY, REJECTED = 'delivered', 'retry', 'rejected'
+# Ошибки FCM, после которых есть смысл повторить; остальные (NotRegistered, InvalidRegistration...) - окончательные
+RETRYABLE_ERRORS = {'Unavailable', 'InternalServerError', 'DeviceMessageRateExceeded'}
+
+
+def dedup_key(provider, device_token, message, room_id, moment):
+    window = int(moment.timestamp()) // (DEDUP_WINDOW_MINUTES * 60)
+    return hashlib.sha1(f"{provider}|{device_token}|{room_id}|{window}|{message}".encode()).hexdigest()
+
+
+def enqueue(device_tokens, message, room_id=None, provider='fcm', now=None):
+    """
+    Поставить уведомление на токены в outbox: один INSERT ... ON CONFLICT DO
+    NOTHING по dedup_key, повтор в том же окне не создаёт новую строку.
+    Возвращает строки очереди [{id, device_token, status}] в порядке токенов.
+    """
+    from core.models import PushNotification
+
+    now = now or timezone.now()
+    keys = {token: dedup_key(provider, token, message, room_id, now) for token in dict.fromkeys(device_tokens)}
+    PushNotification.objects.bulk_create(
+        [PushNotification(provider=provider, device_token=token, message=message, room_id=room_id,
+                          dedup_key=key, next_attempt_at=now)
+         for token, key in keys.items()],
+        batch_size=1000, ignore_conflicts=True,
+    )
+    rows = {
+        key: (pk, status) for pk, key, status in PushNotification.objects.filter(dedup_key__in=list(keys.values()))
+        .order_by().values_list('id', 'dedup_key', 'status')
+    }
+    return [{'id': rows[key][0], 'device_token': token, 'status': rows[key][1]} for token, key in keys.items()]
+
+
+class RateLimiter:
+    """Токен-бакет: не больше rate сообщений в секунду в среднем, всплеск до burst"""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or rate
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.burst
+        self.updated = clock()
+
+    def acquire(self, count=1):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Пакет больше бакета уводит его в минус - ждём, пока долг не погасится
+        self.tokens -= count
+        if self.tokens < 0:
+            self.sleep(-self.tokens / self.rate)
+
+
+class FCMProvider:
+    """
+    Multicast в формате FCM: до max_batch токенов на один HTTP-запрос
+    ({"registration_ids": [...], "notification": {...}} -> results по токенам).
+    URL и ключ - из settings.PUSH_PROVIDERS, для проверки хватает локальной заглушки.
+    """
+
+    name = 'fcm'
+
+    def __init__(self, url=None, key=None, max_batch=None, rate=None, client=None):
+        config = settings.PUSH_PROVIDERS.get(self.name, {})
+        self.url = url or config.get('url')
+        self.key = key if key is not None else config.get('key', '')
+        self.max_batch = max_batch or config.get('max_batch', 500)
+        self.rate = rate if rate is not None else config.get('rate')
+        self.client = client or get_client('push')
+
+    def send_multicast(self, tokens, message):
+        """[(результат, id сообщения или ошибка)] по токенам, в их порядке"""
+        response = self.client.post(self.url, headers={'Authorization': f'key={self.key}'}, json={
+            'registration_ids': tokens,
+            'notification': {'title': 'ThermaSense', 'body': message},
+        })
+        if response.status_code == 429 or response.status_code >= 500:
+            return [(RETRY, f'HTTP {response.status_code}')] * len(tokens)
+        if response.status_code >= 400:
+            return [(REJECTED, f'HTTP {response.status_code}')] * len(tokens)
+        outcomes = []
+        for result in response.json().get('results', []):
+            if 'message_id' in result:
+                outcomes.append((DELIVERED, result['message_id']))
+            else:
+                error = result.get('error', 'Unknown')
+                outcomes.append((RETRY if error in RETRYABLE_ERRORS else REJECTED, error))
+        # Ответ короче запроса - недостающие токены повторим
+        outcomes += [(RETRY, 'MissingResult')] * (len(tokens) - len(outcomes))
+        return outcomes
+
+
+PROVIDERS = {'fcm': FCMProvider}
+
+
+class PushWorker:
+    """
+    Отправка outbox: забирает готовые строки (pending, next_attempt_at <= now),
+    группирует по (провайдер, текст) и шлёт multicast-пакетами с
+    ограничением скорости на провайдера. Одинаковые токены внутри пакета
+    уходят один раз. Временные ошибки - повтор с экспоненциальной паузой и
+    джиттером до max_attempts, затем failed; статус и ответ провайдера
+    записываются в строку.
+    """
+
+    def __init__(self, providers=None, batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, now=timezone.now):
+        self.providers = providers or {name: cls() for name, cls in PROVIDERS.items()}
+        self.limiters = {
+            name: RateLimiter(provider.rate) for name, provider in self.providers.items() if provider.rate
+        }
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.now = now
+        self.stats = {'sent': 0, 'retried': 0, 'failed': 0, 'calls': 0, 'batches': 0}
+
+    def release_stale(self):
+        """Вернуть в очередь строки, зависшие в sending (воркер упал посреди отправки)"""
+        from core.models import PushNotification
+
+        return PushNotification.objects.filter(
+            status=PushNotification.SENDING, claimed_at__lt=self.now() - CLAIM_TIMEOUT,
+        ).update(status=PushNotification.PENDING)
+
+    def claim(self):
+        """Забрать до batch_size готовых строк: SELECT ... FOR UPDATE SKIP LOCKED, затем status=sending"""
+        from core.models import PushNotification
+
+        now = self.now()
+        with transaction.atomic():
+            rows = list(
+                PushNotification.objects.select_for_update(skip_locked=True)
+                .filter(status=PushNotification.PENDING, next_attempt_at__lte=now)
+                .order_by('next_attempt_at')
+                .values_list('id', 'provider', 'device_token', 'message', 'attempts')[:self.batch_size]
+            )
+            PushNotification.objects.filter(id__in=[row[0] for row in rows]).update(
+                status=PushNotification.SENDING, claimed_at=now,
+            )
+        return rows
+
+    def deliver(self, rows):
+        """Отправить забранные строки; {id: (результат, id сообщения или ошибка)}"""
+        groups = {}
+        for pk, provider, token, message, _ in rows:
+            groups.setdefault((provider, message), {}).setdefault(token, []).append(pk)
+
+        outcomes = {}
+        for (provider_name, message), tokens in groups.items():
+            provider = self.providers.get(provider_name)
+            if provider is None:
+                outcomes.update({pk: (REJECTED, f'Unknown provider {provider_name}')
+                                 for pks in tokens.values() for pk in pks})
+                continue
+            token_list = list(tokens)
+            for start in range(0, len(token_list), provider.max_batch):
+                chunk = token_list[start:start + provider.max_batch]
+                if provider_name in self.limiters:
+                    self.limiters[provider_name].acquire(len(chunk))
+                self.stats['calls'] += 1
+                try:
+                    results = provider.send_multicast(chunk, message)
+                except Exception as e:  # сеть, таймаут, разомкнутая цепь - весь пакет повторим
+                    results = [(RETRY, type(e).__name__)] * len(chunk)
+                for token, result in zip(chunk, results):
+                    for pk in tokens[token]:
+                        outcomes[pk] = result
+        return outcomes
+
+    def record(self, rows, outcomes):
+        """
+        Записать статусы одним executemany UPDATE по id: у каждой строки свой
+        id сообщения / ошибка, а bulk_update строит CASE на весь пакет и на
+        тысячах строк заметно медленнее.
+        """
+        from core.models import PushNotification
+
+        now = self.now()
+        adapt = connection.ops.adapt_datetimefield_value
+        params = []
+        for pk, _, _, _, attempts in rows:
+            result, detail = outcomes[pk]
+            detail = str(detail)[:200]
+            if result == DELIVERED:
+                params.append((PushNotification.SENT, adapt(now), adapt(now), detail, '', pk))
+                self.stats['sent'] += 1
+            elif result == RETRY and attempts + 1 < self.max_attempts:
+                retry_at = now + timedelta(seconds=backoff_delay(attempts, self.backoff_base, self.backoff_max))
+                params.append((PushNotification.PENDING, None, adapt(retry_at), '', detail, pk))
+                self.stats['retried'] += 1
+            else:
+                params.append((PushNotification.FAILED, None, adapt(now), '', detail, pk))
+                self.stats['failed'] += 1
+
+        quote = connection.ops.quote_name
+        columns = ('status', 'sent_at', 'next_attempt_at', 'provider_message_id', 'last_error')
+        sql = (
+            f"UPDATE {quote(PushNotification._meta.db_table)} SET "
+            + ', '.join(f"{quote(column)} = %s" for column in columns)
+            + f", {quote('attempts')} = {quote('attempts')} + 1 WHERE {quote('id')} = %s"
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    def run(self, max_batches=None):
+        """Отправлять, пока есть готовые строки (или max_batches проходов); статистика"""
+        self.release_stale()
+        while max_batches is None or self.stats['batches'] < max_batches:
+            rows = self.claim()
+            if not rows:
+                break
+            self.record(rows, self.deliver(rows))
+            self.stats['batches'] += 1
+        return self.stats
+
+    def run_forever(self, interval=5, stop=None, log=logger.info):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                before = dict(self.stats)
+                self.run()
+                if self.stats != before:
+                    log(f"Push worker: {self.stats}")
+            except Exception:
+                logger.exception("Push worker pass failed")
+            stop.wait(interval)
@@ -0,0 +1,156 @@
+# core/services/recommendations.py
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .heating_control import set_heating
+from .impact import record_applied_recommendations
+
+DISPATCH_WORKERS = 32
+WINDOW_MINUTES = 30  # рекомендации с окнами внутри одного интервала считаются одинаковыми
+STALE_AFTER = timedelta(days=1)  # для строк без expires_at (созданных до отпечатков)
+UPSERT_FIELDS = ['message', 'estimated_savings', 'priority', 'expires_at']
+
+# Статусы результата по рекомендации
+APPLIED = 'applied'
+ALREADY_APPLIED = 'already_applied'
+SUPERSEDED = 'superseded'  # на ту же комнату в пакете есть рекомендация с большей экономией
+NOT_FOUND = 'not_found'
+
+
+def time_window(moment):
+    """Начало WINDOW_MINUTES-интервала, в который попадает moment"""
+    step = WINDOW_MINUTES * 60
+    epoch = int(moment.timestamp())
+    return epoch - epoch % step
+
+
+def fingerprint(room_id, action, moment):
+    """Отпечаток содержания рекомендации: (комната, действие, окно времени)"""
+    return hashlib.sha1(f"{room_id}|{action}|{time_window(moment)}".encode()).hexdigest()
+
+
+def expire_recommendations(now=None):
+    """Удалить неприменённые рекомендации, чьё окно прошло; число удалённых"""
+    from core.models import Recommendation
+
+    now = now or timezone.now()
+    deleted, _ = Recommendation.objects.filter(is_applied=False).filter(
+        Q(expires_at__lt=now) | Q(expires_at__isnull=True, created_at__lt=now - STALE_AFTER)
+    ).delete()
+    return deleted
+
+
+def upsert_recommendations(candidates):
+    """
+    Сохранить рекомендации по отпечатку: совпадающая неприменённая строка
+    обновляется (bulk_update), новые вставляются bulk_create(ignore_conflicts) -
+    параллельная генерация упрётся в уникальный частичный индекс, а не создаст
+    дубль. ON CONFLICT ... DO UPDATE не подходит: цель конфликта - частичный
+    индекс, а Django не умеет передать его условие. Возвращает актуальные строки.
+    """
+    from core.models import Recommendation
+
+    candidates = {c.fingerprint: c for c in candidates}
+    # Уже применённую в этом окне рекомендацию заново не предлагаем
+    for applied in Recommendation.objects.filter(is_applied=True, fingerprint__in=list(candidates)).values_list(
+            'fingerprint', flat=True):
+        candidates.pop(applied, None)
+    candidates = list(candidates.values())
+    if not candidates:
+        return []
+    fingerprints = [c.fingerprint for c in candidates]
+    with transaction.atomic():
+        existing = {
+            r.fingerprint: r for r in Recommendation.objects.select_for_update()
+            .filter(is_applied=False, fingerprint__in=fingerprints)
+        }
+        updated = []
+        for candidate in candidates:
+            current = existing.get(candidate.fingerprint)
+            if current is not None:
+                for field in UPSERT_FIELDS:
+                    setattr(current, field, getattr(candidate, field))
+                updated.append(current)
+        Recommendation.objects.bulk_update(updated, UPSERT_FIELDS, batch_size=500)
+        Recommendation.objects.bulk_create(
+            [c for c in candidates if c.fingerprint not in existing], ignore_conflicts=True
+        )
+    return list(
+        Recommendation.objects.filter(is_applied=False, fingerprint__in=fingerprints).select_related('room')
+    )
+
+
+def dispatch_heating_off(room_ids, workers=DISPATCH_WORKERS):
+    """Команды выключения на термостаты параллельно: {room_id: ответ устройства}"""
+    from .iot_service import IoTSimulator
+
+    if not room_ids:
+        return {}
+
+    def send(room_id):
+        try:
+            return IoTSimulator.send_control_command(room_id, 'turn_off_heating')
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(room_ids))) as pool:
+        return dict(zip(room_ids, pool.map(send, room_ids)))
+
+
+def apply_recommendations(ids, dispatch=False, now=None):
+    """
+    Применить рекомендации пакетом в одной транзакции: один UPDATE
+    рекомендаций, одно выключение отопления в затронутых комнатах (set_heating).
+    Из нескольких рекомендаций на одну комнату применяется одна - с наибольшей
+    экономией (затем самая новая), остальные остаются в очереди как superseded,
+    чтобы экономия комнаты не учитывалась дважды. Уже применённые (например,
+    параллельным запросом) не трогаются. Команды устройствам (dispatch=True)
+    уходят после коммита, параллельно.
+    Возвращает {'results': [{id, room_id, status}], 'rooms': [...], 'devices': {...}}.
+    """
+    from core.models import Recommendation, Room
+
+    ids = list(dict.fromkeys(ids))
+    now = now or timezone.now()
+    with transaction.atomic():
+        rows = {
+            row[0]: row for row in Recommendation.objects.select_for_update().filter(id__in=ids)
+            .order_by().values_list('id', 'room_id', 'is_applied', 'estimated_savings', 'created_at')
+        }
+        winners = {}
+        for rec_id, room_id, is_applied, savings, created_at in sorted(
+                (row for row in rows.values() if not row[2]), key=lambda r: (r[3], r[4], r[0]), reverse=True):
+            winners.setdefault(room_id, rec_id)
+        applied = set(winners.values())
+
+        Recommendation.objects.filter(id__in=applied).update(is_applied=True, applied_at=now)
+        set_heating(Room.objects.filter(id__in=list(winners)), False, now=now)
+        # update() не шлёт post_save - счётчики impact обновляем сами
+        record_applied_recommendations([
+            Recommendation(id=rows[rec_id][0], room_id=rows[rec_id][1], estimated_savings=rows[rec_id][3],
+                           is_applied=True, applied_at=now)
+            for rec_id in applied
+        ])
+
+    results = []
+    for rec_id in ids:
+        row = rows.get(rec_id)
+        if row is None:
+            status = NOT_FOUND
+        elif row[2]:
+            status = ALREADY_APPLIED
+        else:
+            status = APPLIED if rec_id in applied else SUPERSEDED
+        results.append({'id': rec_id, 'room_id': row[1] if row else None, 'status': status})
+
+    rooms = sorted(winners)
+    return {
+        'results': results,
+        'rooms': rooms,
+        'devices': dispatch_heating_off(rooms) if dispatch else {},
+    }
@@ -0,0 +1,162 @@
+# core/services/reports.py
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+HEATING_POWER_PER_SQM = 0.1  # kW/m², как в остальном проекте
+CO2_PER_KWH = 0.4
+PRICE_PER_KWH = 5.0
+CACHE_SECONDS = 24 * 3600
+
+PERIODS = {'today': 1, 'week': 7, 'month': 30, 'quarter': 90, 'year': 365}
+
+
+def saved_kwh_expression():
+    """Экономия по строке лога относительно постоянного отопления, kWh за её интервал"""
+    return Greatest(
+        F('room__area') * HEATING_POWER_PER_SQM - F('heating_power'),
+        Value(0.0),
+        output_field=FloatField(),
+    ) * F('interval_hours')
+
+
+def consumed_kwh_expression():
+    """Потребление по строке лога, kWh: мощность на интервал отсчёта (логи пишутся не только раз в час)"""
+    return ExpressionWrapper(F('heating_power') * F('interval_hours'), output_field=FloatField())
+
+
+class ReportService:
+    """
+    Агрегаты для страницы отчётов. Все вычисления - в БД по диапазону
+    (room, timestamp); результат кэшируется до появления новых логов.
+    Дни, чьи логи уже свёрнуты компактацией, берутся из EnergyLogRollup.
+    """
+
+    def __init__(self, days=7, building=None, top_n=4):
+        self.days = days
+        self.building = building
+        self.top_n = top_n
+        self.end = timezone.localtime()
+        self.start = (self.end - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def logs(self):
+        from core.models import EnergyLog
+
+        queryset = EnergyLog.objects.filter(timestamp__gte=self.start, timestamp__lte=self.end)
+        if self.building:
+            queryset = queryset.filter(room__building_id=self.building)
+        return queryset.order_by()
+
+    def rollups(self):
+        from core.models import EnergyLogRollup
+
+        queryset = EnergyLogRollup.objects.filter(day__gte=self.start.date(), day__lte=self.end.date())
+        if self.building:
+            queryset = queryset.filter(room__building_id=self.building)
+        return queryset.order_by()
+
+    def data_version(self):
+        """Версия данных: последний id EnergyLog (поиск по первичному ключу)"""
+        from core.models import EnergyLog
+
+        return EnergyLog.objects.aggregate(last=Max('id'))['last'] or 0
+
+    def build(self):
+        key = f"reports:{self.days}:{self.building or 'all'}:{self.start.date()}:{self.data_version()}"
+        report = cache.get(key)
+        if report is None:
+            report = self._compute()
+            cache.set(key, report, CACHE_SECONDS)
+        return report
+
+    def daily_series(self):
+        rows = dict(
+            (row['day'], row)
+            for row in self.logs()
+            .annotate(day=TruncDate('timestamp'))
+            .values('day')
+            .annotate(saved=Sum(saved_kwh_expression()), consumed=Sum(consumed_kwh_expression()))
+        )
+        for row in self.rollups().values('day').annotate(saved=Sum('saved_kwh'), consumed=Sum('consumed_kwh')):
+            merged = rows.setdefault(row['day'], {'saved': 0, 'consumed': 0})
+            merged['saved'] = (merged['saved'] or 0) + (row['saved'] or 0)
+            merged['consumed'] = (merged['consumed'] or 0) + (row['consumed'] or 0)
+
+        days = [self.start.date() + timedelta(days=i) for i in range(self.days)]
+        label_format = '%a' if self.days <= 7 else '%m-%d'
+        energy = [round(rows[d]['saved'] or 0, 1) if d in rows else 0 for d in days]
+        consumed = [round(rows[d]['consumed'] or 0, 1) if d in rows else 0 for d in days]
+        return {
+            'labels': [d.strftime(label_format) for d in days],
+            'energy_data': energy,
+            'co2_data': [round(v * CO2_PER_KWH, 1) for v in energy],
+            'consumed_data': consumed,
+        }
+
+    def top_rooms(self):
+        rows = (
+            self.logs()
+            .values('room_id', 'room__name', 'room__area')
+            .annotate(saved=Sum(saved_kwh_expression()), consumed=Sum(consumed_kwh_expression()))
+            .order_by('-saved')
+        )
+        rollups = self.rollups()
+        if rollups.exists():
+            # Период заходит в свёрнутые дни - складываем по комнатам и сортируем здесь
+            merged = {row['room_id']: row for row in rows}
+            for row in rollups.values('room_id', 'room__name', 'room__area').annotate(
+                    saved=Sum('saved_kwh'), consumed=Sum('consumed_kwh')):
+                entry = merged.setdefault(row['room_id'], {**row, 'saved': 0, 'consumed': 0})
+                entry['saved'] = (entry['saved'] or 0) + (row['saved'] or 0)
+                entry['consumed'] = (entry['consumed'] or 0) + (row['consumed'] or 0)
+            rows = sorted(merged.values(), key=lambda r: r['saved'] or 0, reverse=True)
+        top = []
+        for row in rows[:self.top_n]:
+            consumed = row['consumed'] or 0
+            saved = row['saved'] or 0
+            top.append({
+                'name': row['room__name'],
+                'area': row['room__area'],
+                'savings': round(saved, 1),
+                'percent_saved': round(saved / (saved + consumed) * 100) if saved + consumed else 0,
+            })
+        return top
+
+    def optimized_rooms(self):
+        """Комнаты, в которых за период была хоть какая-то экономия"""
+        logs = self.logs().filter(heating_power__lt=F('room__area') * HEATING_POWER_PER_SQM)
+        rollups = self.rollups().filter(saved_kwh__gt=0)
+        if not rollups.exists():
+            return logs.aggregate(n=Count('room', distinct=True))['n']
+        return len(set(logs.values_list('room_id', flat=True).distinct())
+                   | set(rollups.values_list('room_id', flat=True).distinct()))
+
+    def _compute(self):
+        from core.models import Room
+
+        series = self.daily_series()
+        total_energy = sum(series['energy_data'])
+        total_co2 = sum(series['co2_data'])
+
+        rooms = Room.objects.all()
+        if self.building:
+            rooms = rooms.filter(building_id=self.building)
+        total_rooms = rooms.count()
+        optimized = self.optimized_rooms()
+
+        return {
+            **series,
+            'total_energy': total_energy,
+            'total_co2': total_co2,
+            'total_cost_savings': total_energy * PRICE_PER_KWH,
+            'period_start': self.start.date(),
+            'period_end': self.end.date(),
+            'rooms_optimized': optimized,
+            'optimization_rate': optimized / total_rooms * 100 if total_rooms else 0,
+            'top_rooms': self.top_rooms(),
+            'car_equivalent': total_co2 / 8.9,  # kg CO2 per liter of gasoline
+            'tree_equivalent': total_co2 / 21.8,  # kg CO2 absorbed per tree per year
+        }
@@ -0,0 +1,246 @@
+# core/services/retention.py
+import time as time_module
+from datetime import date, datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .reports import consumed_kwh_expression, saved_kwh_expression
+
+DEFAULT_KEEP_DAYS = 90
+DEFAULT_ARCHIVE_DAYS = 365
+DEFAULT_BATCH_SIZE = 20000
+ROLLUP_SUMS = {
+    'temperature_inside_sum': 'temperature_inside',
+    'temperature_outside_sum': 'temperature_outside',
+    'heating_power_sum': 'heating_power',
+    'co2_saved_sum': 'co2_saved',
+}
+
+
+def month_floor(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class ArchiveStore:
+    """
+    Архив сырых EnergyLog по месяцам. На PostgreSQL - секции одной таблицы
+    PARTITION BY RANGE (timestamp): вставка маршрутизируется СУБД, удаление
+    месяца - DROP секции без блокировки остальных. На остальных СУБД (SQLite) -
+    отдельная таблица на месяц с тем же набором колонок.
+    """
+
+    def __init__(self, using=None):
+        from core.models import EnergyLog
+
+        self.connection = using or connection
+        self.source = EnergyLog._meta.db_table
+        self.base = f"{self.source}_archive"
+        self.columns = ', '.join(
+            self.connection.ops.quote_name(field.column) for field in EnergyLog._meta.concrete_fields
+        )
+
+    @property
+    def partitioned(self):
+        return self.connection.vendor == 'postgresql'
+
+    def table(self, month):
+        return f"{self.base}_{month:%Y%m}"
+
+    def ensure(self, month):
+        quote = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            if self.partitioned:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(self.base)} (LIKE {quote(self.source)}) "
+                    f"PARTITION BY RANGE ({quote('timestamp')})"
+                )
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {quote(self.base + '_room_ts')} "
+                    f"ON {quote(self.base)} ({quote('room_id')}, {quote('timestamp')})"
+                )
+                # Границы - даты из date, не пользовательский ввод
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(self.table(month))} PARTITION OF {quote(self.base)} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+                )
+            else:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(self.table(month))} AS "
+                    f"SELECT {self.columns} FROM {quote(self.source)} WHERE 1 = 0"
+                )
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {quote(self.table(month) + '_room_ts')} "
+                    f"ON {quote(self.table(month))} ({quote('room_id')}, {quote('timestamp')})"
+                )
+
+    def copy(self, cursor, lo, hi, months):
+        """Скопировать строки с timestamp в [lo, hi) в архив"""
+        quote = self.connection.ops.quote_name
+        source = quote(self.source)
+        where = f"{quote('timestamp')} >= %s AND {quote('timestamp')} < %s"
+        if self.partitioned:
+            cursor.execute(
+                f"INSERT INTO {quote(self.base)} ({self.columns}) SELECT {self.columns} FROM {source} WHERE {where}",
+                [lo, hi],
+            )
+            return
+        for month in months:
+            start, end = (local_midnight(d) for d in (month, next_month(month)))
+            cursor.execute(
+                f"INSERT INTO {quote(self.table(month))} ({self.columns}) SELECT {self.columns} FROM {source} "
+                f"WHERE {where}",
+                [max(lo, start), min(hi, end)],
+            )
+
+    def months(self):
+        prefix = f"{self.base}_"
+        # table_names() отбрасывает секции PostgreSQL (тип 'p'), а месяцы архива - именно они
+        with self.connection.cursor() as cursor:
+            tables = [
+                info.name for info in self.connection.introspection.get_table_list(cursor)
+                if info.type in ('t', 'p')
+            ]
+        months = []
+        for name in tables:
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+                months.append(date(int(suffix[:4]), int(suffix[4:]), 1))
+        return sorted(months)
+
+    def drop_before(self, month):
+        """Удалить архивные месяцы целиком раньше month"""
+        quote = self.connection.ops.quote_name
+        dropped = [m for m in self.months() if m < month]
+        with self.connection.cursor() as cursor:
+            for old in dropped:
+                cursor.execute(f"DROP TABLE IF EXISTS {quote(self.table(old))}")
+        return dropped
+
+
+class RetentionManager:
+    """
+    Компактация EnergyLog: строки старше keep_days сворачиваются в суточные
+    EnergyLogRollup, копируются в помесячный архив и удаляются из горячей
+    таблицы. Работает пакетами по диапазону timestamp (индекс), от старых к
+    новым: пакет покрывает целые сутки, и сливать с уже записанными rollup
+    приходится только сутки на границе пакета. Каждый пакет - своя короткая
+    транзакция (агрегаты прибавляются к rollup в той же транзакции, где строки
+    удаляются, поэтому прерванный прогон можно просто повторить).
+    """
+
+    def __init__(self, keep_days=DEFAULT_KEEP_DAYS, archive_days=DEFAULT_ARCHIVE_DAYS,
+                 batch_size=DEFAULT_BATCH_SIZE, archive=True, pause=0.0, now=None, log=None):
+        self.keep_days = keep_days
+        self.archive_days = archive_days
+        self.batch_size = batch_size
+        self.archive = ArchiveStore() if archive else None
+        self.pause = pause
+        self.now = now or timezone.now()
+        # Граница по началу суток, чтобы сутки не делились между rollup и горячей таблицей
+        self.cutoff = local_midnight(timezone.localtime(self.now - timedelta(days=keep_days)).date())
+        self.log = log or (lambda message: None)
+
+    def pending(self):
+        from core.models import EnergyLog
+
+        return EnergyLog.objects.filter(timestamp__lt=self.cutoff).order_by()
+
+    def next_batch(self):
+        """Диапазон [lo, hi) примерно из batch_size самых старых строк, hi - не дальше cutoff"""
+        pending = self.pending().order_by('timestamp').values_list('timestamp', flat=True)
+        lo = pending.first()
+        if lo is None:
+            return None
+        last = pending[self.batch_size - 1:self.batch_size].first()
+        hi = self.cutoff if last is None else min(last + timedelta(microseconds=1), self.cutoff)
+        return lo, hi
+
+    def compact_batch(self, lo, hi):
+        from core.models import EnergyLogRollup
+
+        rows = self.pending().filter(timestamp__gte=lo, timestamp__lt=hi)
+        with transaction.atomic():
+            aggregates = list(
+                rows.annotate(day=TruncDate('timestamp'))
+                .values('room_id', 'day')
+                .annotate(
+                    samples=Count('id'),
+                    heating_power_max=Max('heating_power'),
+                    saved_kwh=Sum(saved_kwh_expression()),
+                    consumed_kwh=Sum(consumed_kwh_expression()),
+                    **{name: Sum(column) for name, column in ROLLUP_SUMS.items()},
+                )
+                .order_by()
+            )
+            if not aggregates:
+                return 0
+            existing = {
+                (rollup.room_id, rollup.day): rollup
+                for rollup in EnergyLogRollup.objects.select_for_update().filter(
+                    day__in={row['day'] for row in aggregates},
+                    room_id__in={row['room_id'] for row in aggregates},
+                )
+            }
+            created, updated = [], []
+            for row in aggregates:
+                rollup = existing.get((row['room_id'], row['day']))
+                if rollup is None:
+                    created.append(EnergyLogRollup(
+                        room_id=row['room_id'], day=row['day'], samples=row['samples'],
+                        heating_power_max=row['heating_power_max'] or 0.0, saved_kwh=row['saved_kwh'] or 0.0,
+                        consumed_kwh=row['consumed_kwh'] or 0.0,
+                        **{name: row[name] or 0.0 for name in ROLLUP_SUMS},
+                    ))
+                    continue
+                rollup.samples += row['samples']
+                rollup.heating_power_max = max(rollup.heating_power_max, row['heating_power_max'] or 0.0)
+                rollup.saved_kwh += row['saved_kwh'] or 0.0
+                rollup.consumed_kwh += row['consumed_kwh'] or 0.0
+                for name in ROLLUP_SUMS:
+                    setattr(rollup, name, getattr(rollup, name) + (row[name] or 0.0))
+                updated.append(rollup)
+
+            EnergyLogRollup.objects.bulk_create(created)
+            EnergyLogRollup.objects.bulk_update(
+                updated, ['samples', 'heating_power_max', 'saved_kwh', 'consumed_kwh', *ROLLUP_SUMS], batch_size=500
+            )
+            if self.archive is not None:
+                months = sorted({month_floor(row['day']) for row in aggregates})
+                for month in months:
+                    self.archive.ensure(month)
+                with connection.cursor() as cursor:
+                    self.archive.copy(cursor, lo, hi, months)
+            deleted, _ = rows.delete()
+        return deleted
+
+    def run(self, max_batches=None):
+        """Компактация пакетами; затем удаление архивных месяцев старше archive_days"""
+        total = batches = 0
+        while max_batches is None or batches < max_batches:
+            batch = self.next_batch()
+            if batch is None:
+                break
+            lo, hi = batch
+            deleted = self.compact_batch(lo, hi)
+            total += deleted
+            batches += 1
+            self.log(f"batch {batches}: {lo:%Y-%m-%d %H:%M} - {hi:%Y-%m-%d %H:%M}, {deleted} rows compacted")
+            if self.pause:
+                time_module.sleep(self.pause)  # даём пройти записям генератора логов
+
+        dropped = []
+        if self.archive is not None and self.archive_days is not None:
+            horizon = month_floor(timezone.localtime(self.now - timedelta(days=self.archive_days)).date())
+            dropped = self.archive.drop_before(horizon)
+        return {'rows': total, 'batches': batches, 'dropped_months': dropped, 'cutoff': self.cutoff}
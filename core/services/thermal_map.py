@@ -0,0 +1,203 @@
+# core/services/thermal_map.py
+import json
+import math
+import struct
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max, OuterRef, Subquery
+
+STATUSES = ('cold', 'optimal', 'hot')
+CACHE_SECONDS = 24 * 3600
+
+
+def room_status(heating_status, target_temperature):
+    if heating_status and target_temperature > 21:
+        return 'hot'
+    elif not heating_status and target_temperature <= 18:
+        return 'cold'
+    return 'optimal'
+
+
+def map_version(building_id=None):
+    """
+    Версия карты из самих комнат: их число и последний updated_at. Меняется
+    при любом сохранении комнаты в любом процессе (веб-воркеры,
+    generate_live_data.py) - общий кэш для сброса не нужен.
+    """
+    from core.models import Room
+
+    rooms = Room.objects.all()
+    if building_id:
+        rooms = rooms.filter(building_id=building_id)
+    state = rooms.aggregate(count=Count('id'), updated=Max('updated_at'))
+    updated = int(state['updated'].timestamp() * 1e6) if state['updated'] else 0
+    return f"{state['count']}-{updated}"
+
+
+class ThermalMapService:
+    """
+    Тепловая карта по этажам: один запрос по комнатам, группировка за один
+    проход, результат кэшируется по версии комнат здания (map_version).
+    """
+
+    def __init__(self, building=None):
+        self.building = building
+
+    def version(self):
+        return map_version(self.building)
+
+    def build(self):
+        from core.models import Room
+
+        rooms = Room.objects.all()
+        if self.building:
+            rooms = rooms.filter(building_id=self.building)
+        rows = rooms.order_by('floor', 'name').values_list(
+            'floor', 'id', 'name', 'zone', 'heating_status', 'target_temperature', 'comfort_temperature'
+        )
+
+        floors = {}
+        totals = dict.fromkeys(STATUSES, 0)
+        for floor, room_id, name, zone, heating, target, comfort in rows:
+            entry = floors.get(floor)
+            if entry is None:
+                entry = floors[floor] = {
+                    'floor': floor, 'total': 0, 'heated': 0, 'temperature_sum': 0.0,
+                    **dict.fromkeys(STATUSES, 0), 'rooms': [],
+                }
+            status = room_status(heating, target)
+            temperature = target if heating else comfort
+            entry['total'] += 1
+            entry['heated'] += heating
+            entry[status] += 1
+            entry['temperature_sum'] += temperature
+            totals[status] += 1
+            # Компактно: [id, name, zone, temperature, status]
+            entry['rooms'].append([room_id, name, zone, temperature, STATUSES.index(status)])
+
+        for entry in floors.values():
+            entry['avg_temperature'] = round(entry.pop('temperature_sum') / entry['total'], 1)
+
+        return {
+            'version': self.version(),
+            'statuses': STATUSES,
+            'total_rooms': sum(totals.values()),
+            'totals': totals,
+            'floors': [floors[f] for f in sorted(floors)],
+        }
+
+    def payload(self):
+        key = f"thermal_map:{self.building or 'all'}:{self.version()}"
+        data = cache.get(key)
+        if data is None:
+            data = self.build()
+            cache.set(key, data, CACHE_SECONDS)
+        return data
+
+    def summary(self):
+        """Карта без списков комнат - для рендеринга страницы"""
+        data = self.payload()
+        return dict(data, floors=[
+            {k: v for k, v in floor.items() if k != 'rooms'} for floor in data['floors']
+        ])
+
+    def floor(self, number):
+        data = self.payload()
+        for floor in data['floors']:
+            if floor['floor'] == number:
+                return dict(floor, version=data['version'], statuses=STATUSES)
+        return None
+
+
+EMPTY_CELL = 255
+TILE_ALIGNMENT = 4
+
+
+class HeatmapTile:
+    """
+    Компактная сетка этажа для тепловой карты: [uint32 длина заголовка][JSON-заголовок]
+    [паддинг до 4 байт][room_id uint32][temperature float16][status uint8].
+    Комнаты раскладываются по сетке ~квадратной формы, сгруппированные по зоне;
+    температура - последнее показание EnergyLog (иначе target/comfort).
+    Пустые ячейки: room_id 0, temperature NaN, status 255.
+    """
+
+    def __init__(self, building=None, floor=1):
+        self.building = building
+        self.floor = floor
+
+    def readings_version(self):
+        from core.models import EnergyLog
+
+        return EnergyLog.objects.aggregate(last=Max('id'))['last'] or 0
+
+    def version(self):
+        return f"{map_version(self.building)}.{self.readings_version()}"
+
+    def rows(self):
+        from core.models import EnergyLog, Room
+
+        latest = EnergyLog.objects.filter(room=OuterRef('pk')).order_by('-timestamp').values('temperature_inside')[:1]
+        rooms = Room.objects.filter(floor=self.floor)
+        if self.building:
+            rooms = rooms.filter(building_id=self.building)
+        return list(
+            rooms.annotate(reading=Subquery(latest))
+            .order_by('zone', 'name', 'id')
+            .values_list('id', 'zone', 'heating_status', 'target_temperature', 'comfort_temperature', 'reading')
+        )
+
+    def build(self, version=None):
+        rows = self.rows()
+        n = len(rows)
+        width = max(1, math.ceil(math.sqrt(n)))
+        height = max(1, math.ceil(n / width))
+        cells = width * height
+
+        room_ids = np.zeros(cells, dtype='<u4')
+        temperature = np.full(cells, np.nan, dtype='<f2')
+        status = np.full(cells, EMPTY_CELL, dtype=np.uint8)
+        zones = {}
+        for i, (room_id, zone, heating, target, comfort, reading) in enumerate(rows):
+            room_ids[i] = room_id
+            temperature[i] = reading if reading is not None else (target if heating else comfort)
+            status[i] = STATUSES.index(room_status(heating, target))
+            zones.setdefault(zone, [i, i])[1] = i
+
+        filled = temperature[:n].astype(np.float32)
+        header = {
+            'version': version or self.version(),
+            'floor': self.floor,
+            'width': width,
+            'height': height,
+            'rooms': n,
+            'statuses': STATUSES,
+            'empty_status': EMPTY_CELL,
+            'min_temperature': float(filled.min()) if n else None,
+            'max_temperature': float(filled.max()) if n else None,
+            'zones': [{'zone': zone, 'first': first, 'last': last} for zone, (first, last) in zones.items()],
+            'arrays': [],
+        }
+        offset = 0
+        for name, array in (('room_id', room_ids), ('temperature', temperature), ('status', status)):
+            header['arrays'].append({'name': name, 'dtype': array.dtype.str, 'offset': offset, 'length': cells})
+            offset += array.nbytes
+
+        encoded = json.dumps(header, separators=(',', ':')).encode()
+        padding = -(4 + len(encoded)) % TILE_ALIGNMENT
+        return b''.join((
+            struct.pack('<I', len(encoded) + padding),
+            encoded + b' ' * padding,
+            room_ids.tobytes(), temperature.tobytes(), status.tobytes(),
+        ))
+
+    def payload(self):
+        """(version, bytes) с кэшированием по этажу и версии"""
+        version = self.version()
+        key = f"thermal_tile:{self.building or 'all'}:{self.floor}:{version}"
+        data = cache.get(key)
+        if data is None:
+            data = self.build(version)
+            cache.set(key, data, CACHE_SECONDS)
+        return version, data
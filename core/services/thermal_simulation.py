@@ -0,0 +1,108 @@
+# core/services/thermal_simulation.py
+import numpy as np
+
+from .preheat_scheduler import room_parameters
+
+
+class ThermalSimulation:
+    """
+    Дискретная симуляция всех комнат здания (RC-модель на комнату).
+    Шаг точный для постоянных входов: T' = T_eq + (T - T_eq) * exp(-dt / tau),
+    T_eq = T_out + P * on / UA. Термостат не даёт подняться выше target.
+    """
+
+    def __init__(self, rooms, step_minutes=5):
+        self.params = room_parameters(rooms)
+        self.step_minutes = step_minutes
+        dt = step_minutes * 60
+        tau = self.params['capacity'] / self.params['ua']
+        self.decay = np.exp(-dt / tau)
+        self.dt_hours = step_minutes / 60
+
+    @property
+    def room_ids(self):
+        return self.params['room_id']
+
+    def run(self, outside, heating, occupancy=None, initial=None, record_every=12):
+        """
+        outside   - температура снаружи на каждый шаг, shape (steps,)
+        heating   - bool-матрица (steps, rooms) или policy(step, temperature, outside_t) -> bool[rooms]
+        occupancy - bool-матрица (steps, rooms) или функция step -> bool[rooms] (для оценки комфорта)
+        record_every - сохранять траекторию каждые N шагов (12 = раз в час при шаге 5 мин)
+
+        Возвращает словарь с траекториями и суммами по комнатам.
+        """
+        outside = np.asarray(outside, dtype=np.float64)
+        steps = len(outside)
+        p = self.params
+        n_rooms = len(p['room_id'])
+
+        temperature = (np.array(initial, dtype=np.float64) if initial is not None
+                       else p['comfort'].copy())
+        energy_kwh = np.zeros(n_rooms)
+        heated_steps = np.zeros(n_rooms, dtype=np.int64)
+        discomfort_steps = np.zeros(n_rooms, dtype=np.int64)
+
+        n_records = (steps + record_every - 1) // record_every
+        trajectory = np.empty((n_records, n_rooms), dtype=np.float32)
+        power_trajectory = np.empty((n_records, n_rooms), dtype=np.float32)
+
+        heat_equilibrium = p['power'] / p['ua']
+        keep = self.decay
+        power_kw = p['power'] / 1000
+
+        for step in range(steps):
+            t_out = outside[step]
+            on = heating(step, temperature, t_out) if callable(heating) else heating[step]
+
+            t_eq = t_out + heat_equilibrium * on
+            next_temperature = t_eq + (temperature - t_eq) * keep
+
+            # Термостат: при достижении target отопление работает на удержание
+            free = t_out + (temperature - t_out) * keep
+            saturated = on & (next_temperature > p['target'])
+            hold_kw = np.where(free >= p['target'], 0.0,
+                               np.clip(p['ua'] * (p['target'] - t_out) / 1000, 0, power_kw))
+            step_power = np.where(saturated, hold_kw, power_kw * on)
+            temperature = np.where(saturated, np.maximum(p['target'], free), next_temperature)
+            energy_kwh += step_power * self.dt_hours
+            heated_steps += on
+
+            if occupancy is not None:
+                occupied = occupancy(step) if callable(occupancy) else occupancy[step]
+                discomfort_steps += occupied & (temperature < p['comfort'])
+
+            if step % record_every == 0:
+                trajectory[step // record_every] = temperature
+                power_trajectory[step // record_every] = step_power
+
+        return {
+            'room_id': p['room_id'],
+            'temperature': trajectory,
+            'power_kw': power_trajectory,
+            'record_minutes': record_every * self.step_minutes,
+            'energy_kwh': energy_kwh,
+            'co2_kg': energy_kwh * 0.4,
+            'heated_hours': heated_steps * self.dt_hours,
+            'discomfort_hours': discomfort_steps * self.dt_hours,
+            'final_temperature': temperature,
+        }
+
+    def schedule_matrix(self, schedule, start_ts, steps):
+        """
+        Bool-матрица (steps, rooms) из графика PreheatScheduler
+        (структурированный массив room_id/start/stop, epoch-секунды).
+        """
+        matrix = np.zeros((steps, len(self.room_ids)), dtype=bool)
+        order = np.argsort(self.room_ids)
+        column = order[np.searchsorted(self.room_ids[order], schedule['room_id'])]
+        step_seconds = self.step_minutes * 60
+        first = np.clip(np.floor((schedule['start'] - start_ts) / step_seconds), 0, steps).astype(int)
+        last = np.clip(np.ceil((schedule['stop'] - start_ts) / step_seconds), 0, steps).astype(int)
+
+        # Разностный массив: +1 на начале интервала, -1 на конце
+        delta = np.zeros((steps + 1, len(self.room_ids)), dtype=np.int32)
+        np.add.at(delta, (first, column), 1)
+        np.add.at(delta, (last, column), -1)
+        matrix[:] = np.cumsum(delta[:-1], axis=0) > 0
+        return matrix
@@ -0,0 +1,313 @@
+# core/services/training_pipeline.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .model_registry import LinearModel, registry
+
+HOUR = 3600
+OCCUPANCY_MODEL_NAME = 'occupancy_logreg'
+OCCUPANCY_FEATURES = ['hour_sin', 'hour_cos', 'dow_sin', 'dow_cos', 'is_holiday', 'temperature']
+
+
+def _epoch(values):
+    return np.fromiter((v.timestamp() for v in values), dtype=np.float64, count=len(values))
+
+
+def occupied_seconds(starts, ends, boundaries):
+    """
+    Занятые секунды в каждом интервале [boundaries[k], boundaries[k+1]).
+    overlap(-inf, b) = sum(max(0, b - s)) - sum(max(0, b - e)),
+    обе суммы считаются через searchsorted + префиксные суммы.
+    """
+    def ramp(points):
+        points = np.sort(points)
+        prefix = np.concatenate([[0.0], np.cumsum(points)])
+        idx = np.searchsorted(points, boundaries, side='left')
+        return idx * boundaries - prefix[idx]
+
+    if len(starts) == 0:
+        return np.zeros(len(boundaries) - 1)
+    cumulative = ramp(starts) - ramp(ends)
+    return np.diff(cumulative)
+
+
+class FeatureBuilder:
+    """Почасовые признаки по комнатам из OccupancyLog / EnergyLog / WeatherCache"""
+
+    def __init__(self, until=None, chunk_size=200):
+        now = until or timezone.now()
+        self.until = now.replace(minute=0, second=0, microsecond=0)  # только закрытые часы
+        self.chunk_size = chunk_size
+        self._weather = None
+
+    def weather_series(self):
+        from core.models import WeatherCache
+
+        if self._weather is None:
+            rows = list(WeatherCache.objects.order_by('cached_at').values_list('cached_at', 'temperature'))
+            self._weather = (
+                _epoch([r[0] for r in rows]),
+                np.array([r[1] for r in rows], dtype=np.float64),
+            )
+        return self._weather
+
+    def pending_ranges(self, room_ids):
+        """Для каждой комнаты - начало ещё не обработанного диапазона"""
+        from core.models import TrainingData, OccupancyLog, EnergyLog
+
+        done = dict(
+            TrainingData.objects.filter(room_id__in=room_ids)
+            .values('room_id').annotate(last=Max('timestamp')).values_list('room_id', 'last')
+        )
+        first_occupancy = dict(
+            OccupancyLog.objects.filter(room_id__in=room_ids)
+            .values('room_id').annotate(first=Min('start_time')).values_list('room_id', 'first')
+        )
+        first_energy = dict(
+            EnergyLog.objects.filter(room_id__in=room_ids)
+            .values('room_id').annotate(first=Min('timestamp')).values_list('room_id', 'first')
+        )
+
+        ranges = {}
+        for room_id in room_ids:
+            if room_id in done:
+                start = done[room_id] + timedelta(hours=1)
+            else:
+                candidates = [d for d in (first_occupancy.get(room_id), first_energy.get(room_id)) if d]
+                if not candidates:
+                    continue
+                start = min(candidates).replace(minute=0, second=0, microsecond=0)
+            if start < self.until:
+                ranges[room_id] = start
+        return ranges
+
+    def build_chunk(self, ranges):
+        """Возвращает список TrainingData для набора комнат"""
+        from core.models import TrainingData, OccupancyLog, EnergyLog
+
+        if not ranges:
+            return []
+        room_ids = list(ranges)
+        since = min(ranges.values())
+        until_ts = self.until.timestamp()
+
+        occupancy = {}
+        for room_id, start, end in OccupancyLog.objects.filter(
+                room_id__in=room_ids, is_active=True, end_time__gt=since, start_time__lt=self.until
+        ).values_list('room_id', 'start_time', 'end_time').order_by():
+            occupancy.setdefault(room_id, ([], []))
+            occupancy[room_id][0].append(start.timestamp())
+            occupancy[room_id][1].append(end.timestamp())
+
+        outside = {}
+        for room_id, ts, temp in EnergyLog.objects.filter(
+                room_id__in=room_ids, timestamp__gte=since, timestamp__lt=self.until
+        ).values_list('room_id', 'timestamp', 'temperature_outside').order_by():
+            outside.setdefault(room_id, ([], []))
+            outside[room_id][0].append(ts.timestamp())
+            outside[room_id][1].append(temp)
+
+        weather_ts, weather_temp = self.weather_series()
+
+        rows = []
+        for room_id, start in ranges.items():
+            hours = np.arange(start.timestamp(), until_ts, HOUR)
+            if not len(hours):
+                continue
+            boundaries = np.append(hours, hours[-1] + HOUR)
+
+            starts, ends = occupancy.get(room_id, ([], []))
+            minutes = np.minimum(
+                occupied_seconds(np.array(starts), np.array(ends), boundaries) / 60, 60
+            )
+
+            temperature = self._hourly_temperature(
+                hours, outside.get(room_id), weather_ts, weather_temp
+            )
+
+            hour_of_day = ((hours // HOUR) % 24).astype(int)
+            # 1970-01-01 - четверг (weekday 3)
+            day_of_week = ((hours // (24 * HOUR) + 3) % 7).astype(int)
+            is_holiday = day_of_week >= 5  # календаря праздников пока нет - только выходные
+
+            for k in range(len(hours)):
+                rows.append(TrainingData(
+                    room_id=room_id,
+                    timestamp=start + timedelta(hours=k),
+                    day_of_week=int(day_of_week[k]),
+                    hour_of_day=int(hour_of_day[k]),
+                    temperature=float(temperature[k]),
+                    is_holiday=bool(is_holiday[k]),
+                    is_occupied=bool(minutes[k] > 0),
+                    occupancy_duration=int(round(minutes[k])),
+                ))
+        return rows
+
+    @staticmethod
+    def _hourly_temperature(hours, logs, weather_ts, weather_temp):
+        """Среднее за час по EnergyLog, иначе - последнее наблюдение WeatherCache"""
+        if len(weather_ts):
+            idx = np.clip(np.searchsorted(weather_ts, hours, side='right') - 1, 0, None)
+            temperature = weather_temp[idx]
+        else:
+            temperature = np.zeros(len(hours))
+
+        if logs:
+            ts, temps = np.array(logs[0]), np.array(logs[1])
+            bucket = ((ts - hours[0]) // HOUR).astype(int)
+            inside = (bucket >= 0) & (bucket < len(hours))
+            counts = np.bincount(bucket[inside], minlength=len(hours))
+            sums = np.bincount(bucket[inside], weights=temps[inside], minlength=len(hours))
+            has_logs = counts > 0
+            temperature = np.where(has_logs, sums / np.maximum(counts, 1), temperature)
+        return temperature
+
+
+def feature_matrix(hour_of_day, day_of_week, is_holiday, temperature):
+    hour_angle = 2 * np.pi * np.asarray(hour_of_day) / 24
+    dow_angle = 2 * np.pi * np.asarray(day_of_week) / 7
+    return np.column_stack([
+        np.sin(hour_angle), np.cos(hour_angle),
+        np.sin(dow_angle), np.cos(dow_angle),
+        np.asarray(is_holiday, dtype=np.float64),
+        np.asarray(temperature, dtype=np.float64) / 10.0,
+    ])
+
+
+def fit_logistic(X, y, l2=1e-2, iterations=25):
+    """Логистическая регрессия методом Ньютона (IRLS), только NumPy"""
+    Xb = np.column_stack([X, np.ones(len(X))])
+    w = np.zeros(Xb.shape[1])
+    penalty = l2 * np.eye(Xb.shape[1])
+    penalty[-1, -1] = 0  # свободный член не регуляризуем
+    for _ in range(iterations):
+        p = 1 / (1 + np.exp(-np.clip(Xb @ w, -30, 30)))
+        gradient = Xb.T @ (p - y) + penalty @ w
+        hessian = (Xb * (p * (1 - p))[:, None]).T @ Xb + penalty
+        step = np.linalg.solve(hessian + 1e-9 * np.eye(len(w)), gradient)
+        w -= step
+        if np.abs(step).max() < 1e-6:
+            break
+    return w[:-1], w[-1]
+
+
+def train_room(payload):
+    """Обучение модели одной комнаты (выполняется в процессе пула)"""
+    room_id, X, y = payload
+    started = time.perf_counter()
+
+    split = int(len(y) * 0.8) if len(y) >= 50 else len(y)
+    coef, intercept = fit_logistic(X[:split], y[:split])
+
+    test_X, test_y = (X[split:], y[split:]) if split < len(y) else (X, y)
+    predicted = (test_X @ coef + intercept) > 0
+    accuracy = float((predicted == test_y.astype(bool)).mean()) if len(test_y) else 0.0
+
+    return room_id, coef, intercept, accuracy, len(y), time.perf_counter() - started
+
+
+class TrainingPipeline:
+    """Инкрементальная подготовка TrainingData и обучение моделей занятости"""
+
+    def __init__(self, workers=None, chunk_size=200, until=None, log=print):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.features = FeatureBuilder(until=until, chunk_size=chunk_size)
+        self.log = log
+
+    def build_training_data(self, room_ids):
+        """Шаг 1: новые почасовые строки; возвращает {room_id: кол-во строк}"""
+        from core.models import TrainingData
+
+        created = {}
+        for i in range(0, len(room_ids), self.chunk_size):
+            chunk = room_ids[i:i + self.chunk_size]
+            rows = self.features.build_chunk(self.features.pending_ranges(chunk))
+            TrainingData.objects.bulk_create(rows, batch_size=2000)
+            for row in rows:
+                created[row.room_id] = created.get(row.room_id, 0) + 1
+        return created
+
+    def train(self, room_ids):
+        """Шаг 2: обучение моделей для комнат с новыми данными"""
+        from core.models import TrainingData
+
+        results = []
+        for i in range(0, len(room_ids), self.chunk_size):
+            chunk = room_ids[i:i + self.chunk_size]
+            data = list(
+                TrainingData.objects.filter(room_id__in=chunk)
+                .order_by('room_id', 'timestamp')
+                .values_list('room_id', 'hour_of_day', 'day_of_week', 'is_holiday',
+                             'temperature', 'is_occupied')
+            )
+            if not data:
+                continue
+            columns = np.array(data, dtype=np.float64)
+            X = feature_matrix(columns[:, 1], columns[:, 2], columns[:, 3], columns[:, 4])
+            y = columns[:, 5]
+
+            room_column = columns[:, 0].astype(np.int64)
+            bounds = np.flatnonzero(np.diff(room_column)) + 1
+            payloads = [
+                (int(room_column[s]), X[s:e], y[s:e])
+                for s, e in zip(np.r_[0, bounds], np.r_[bounds, len(y)])
+                if y[s:e].min() != y[s:e].max()  # нужна хотя бы одна смена состояния
+            ]
+
+            if self.workers > 1 and len(payloads) > 1:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    chunk_results = list(pool.map(train_room, payloads, chunksize=8))
+            else:
+                chunk_results = [train_room(payload) for payload in payloads]
+
+            for result in chunk_results:
+                self._save_model(*result[:4])
+            results.extend(chunk_results)
+        return results
+
+    def run(self, room_ids=None, retrain_all=False):
+        from core.models import Room
+
+        if room_ids is None:
+            room_ids = list(Room.objects.order_by('id').values_list('id', flat=True))
+
+        started = time.perf_counter()
+        created = self.build_training_data(room_ids)
+        elapsed = time.perf_counter() - started
+        total_rows = sum(created.values())
+        self.log(f"Feature rows: {total_rows} in {elapsed:.2f}s "
+                 f"({total_rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+        to_train = room_ids if retrain_all else sorted(created)
+        started = time.perf_counter()
+        results = self.train(to_train)
+        elapsed = time.perf_counter() - started
+        for room_id, _, _, accuracy, n_rows, seconds in results:
+            self.log(f"  room {room_id}: {n_rows} rows, accuracy {accuracy:.2%}, {seconds * 1000:.1f} ms")
+        self.log(f"Trained {len(results)} models in {elapsed:.2f}s")
+        return {'rows': total_rows, 'models': len(results)}
+
+    @staticmethod
+    def _save_model(room_id, coef, intercept, accuracy):
+        from core.models import OccupancyPredictionModel
+
+        record, _ = OccupancyPredictionModel.objects.get_or_create(
+            room_id=room_id, model_name=OCCUPANCY_MODEL_NAME
+        )
+        if record.model_file:
+            record.model_file.delete(save=False)
+
+        model = LinearModel(coef, intercept, OCCUPANCY_FEATURES)
+        record.accuracy = accuracy
+        record.features_used = OCCUPANCY_FEATURES
+        record.model_file.save(f'{OCCUPANCY_MODEL_NAME}_{room_id}.npz', ContentFile(model.dumps()), save=False)
+        record.save()
+        registry.invalidate(OCCUPANCY_MODEL_NAME, room_id)
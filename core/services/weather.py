@@ -0,0 +1,300 @@
+# core/services/weather.py
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import numpy as np
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from .http_client import backoff_delay, get_client
+
+try:
+    import fcntl
+except ImportError:  # Windows - блокировка между процессами недоступна
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FETCH_TIMEOUT = 10
+DEFAULT_TEMPERATURE = 0.0
+SAMPLE_FIELDS = ['temperature', 'humidity', 'wind_speed', 'description']
+
+REFRESH_INTERVAL = 600  # секунд между обновлениями
+RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+WEATHER_CACHE_KEEP_DAYS = 90
+OBSERVATION_KEEP_DAYS = 365
+FORECAST_KEEP_HOURS = 24  # прошедшие прогнозы держим сутки - для сравнения с наблюдениями
+
+
+def _epoch(values):
+    """datetime / последовательность datetime / epoch -> float64 epoch-секунды"""
+    if isinstance(values, datetime):
+        return np.array([values.timestamp()])
+    values = np.asarray(values)
+    if values.dtype == object:
+        return np.fromiter((v.timestamp() for v in values.ravel()), dtype=np.float64, count=values.size) \
+            .reshape(values.shape)
+    return values.astype(np.float64)
+
+
+class WeatherSeries:
+    """
+    Температура снаружи как функция времени: точки ряда (epoch, °C),
+    линейная интерполяция для любого числа моментов одним np.interp.
+    За краями ряда - ближайшее значение.
+    """
+
+    def __init__(self, times, temperatures, fallback=DEFAULT_TEMPERATURE):
+        order = np.argsort(times)
+        self.times = np.asarray(times, dtype=np.float64)[order]
+        self.temperatures = np.asarray(temperatures, dtype=np.float64)[order]
+        self.fallback = fallback
+
+    def __len__(self):
+        return len(self.times)
+
+    def at(self, moments):
+        """Температура в моменты moments (datetime, массив datetime или epoch-секунд)"""
+        points = _epoch(moments)
+        if not len(self.times):
+            return np.full(points.shape, float(self.fallback))
+        return np.interp(points, self.times, self.temperatures)
+
+    def hourly(self, start, hours):
+        """(моменты, температуры) на каждый час от start"""
+        moments = start.timestamp() + np.arange(hours) * 3600.0
+        return moments, self.at(moments)
+
+    @classmethod
+    def load(cls, start, end, fallback=None, margin=timedelta(hours=3)):
+        """
+        Ряд на [start, end] из WeatherSample: наблюдения, а там, где их нет, -
+        прогноз (наблюдение на то же время вытесняет прогноз). margin - запас
+        по краям, чтобы интерполяция на границах опиралась на соседние точки.
+        """
+        from core.models import WeatherSample
+
+        rows = WeatherSample.objects.filter(
+            valid_time__gte=start - margin, valid_time__lte=end + margin,
+        ).order_by().values_list('valid_time', 'kind', 'temperature')
+        points = {}
+        for valid_time, kind, temperature in rows:
+            if kind == 'observation' or valid_time not in points:
+                points[valid_time] = temperature
+        if fallback is None:
+            latest = WeatherSample.objects.filter(kind='observation').order_by('-valid_time').first()
+            fallback = latest.temperature if latest else DEFAULT_TEMPERATURE
+        return cls(_epoch(list(points)) if points else [], list(points.values()), fallback)
+
+
+def upsert_samples(kind, samples):
+    """Записать точки ряда одним INSERT ... ON CONFLICT (kind, valid_time) DO UPDATE"""
+    from core.models import WeatherSample
+
+    now = timezone.now()
+    objects = [WeatherSample(kind=kind, fetched_at=now, **sample) for sample in samples]
+    WeatherSample.objects.bulk_create(
+        objects, batch_size=500, update_conflicts=True,
+        unique_fields=['kind', 'valid_time'], update_fields=SAMPLE_FIELDS + ['fetched_at'],
+    )
+    return len(objects)
+
+
+class ForecastFetcher:
+    """
+    Почасовой прогноз и текущее наблюдение одним запросом (OpenWeather One Call:
+    current + hourly на 48 часов). URL настраивается (WEATHER_FORECAST_URL),
+    поэтому для проверки достаточно локального HTTP-заглушки с тем же JSON.
+    """
+
+    def __init__(self, url=None, api_key=None, latitude=None, longitude=None, timeout=FETCH_TIMEOUT, session=None):
+        self.url = url or settings.WEATHER_FORECAST_URL
+        self.api_key = api_key if api_key is not None else getattr(settings, 'OPENWEATHER_API_KEY', '')
+        self.latitude = latitude if latitude is not None else settings.WEATHER_LATITUDE
+        self.longitude = longitude if longitude is not None else settings.WEATHER_LONGITUDE
+        self.timeout = timeout
+        self.session = session or get_client('weather')
+
+    def request(self):
+        response = self.session.get(self.url, timeout=self.timeout, params={
+            'lat': self.latitude, 'lon': self.longitude, 'appid': self.api_key,
+            'units': 'metric', 'exclude': 'minutely,daily,alerts',
+        })
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def parse(payload):
+        """JSON One Call -> (наблюдение или None, [почасовой прогноз])"""
+        def sample(entry):
+            weather = entry.get('weather') or [{}]
+            return {
+                'valid_time': datetime.fromtimestamp(entry['dt'], dt_timezone.utc),
+                'temperature': float(entry['temp']),
+                'humidity': entry.get('humidity'),
+                'wind_speed': entry.get('wind_speed'),
+                'description': weather[0].get('description', ''),
+            }
+
+        current = payload.get('current')
+        return (sample(current) if current else None), [sample(entry) for entry in payload.get('hourly', [])]
+
+    def fetch(self):
+        """Забрать прогноз и сохранить; {'observation': dict | None, 'observations': n, 'forecasts': n}"""
+        observation, forecasts = self.parse(self.request())
+        return {
+            'observation': observation,
+            'observations': upsert_samples('observation', [observation] if observation else []),
+            'forecasts': upsert_samples('forecast', forecasts),
+        }
+
+
+def demo_weather():
+    """Погода по умолчанию, пока данных нет: объект не сохраняется, таблица не растёт"""
+    from core.models import WeatherCache
+
+    return WeatherCache(temperature=-5.0, humidity=75, wind_speed=3.0, description="Cloudy", cached_at=timezone.now())
+
+
+def backoff_delays(retries=RETRIES, base=BACKOFF_BASE, maximum=BACKOFF_MAX, rng=random.random):
+    """Паузы между попытками (retries - 1 штука)"""
+    for attempt in range(retries - 1):
+        yield backoff_delay(attempt, base, maximum, rng)
+
+
+class WeatherRefresher:
+    """
+    Единственный владелец запросов к погодному API: запросы пользователей
+    только читают WeatherCache / WeatherSample. Прогноз One Call даёт и
+    текущее наблюдение; если он недоступен - запрос текущей погоды по городу.
+    Каждый запрос - с повторами и экспоненциальной паузой с джиттером.
+    """
+
+    def __init__(self, fetcher=None, current_url=None, retries=RETRIES, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX, timeout=FETCH_TIMEOUT, sleep=time.sleep, session=None):
+        self.session = session or get_client('weather')
+        self.fetcher = fetcher or ForecastFetcher(timeout=timeout, session=self.session)
+        self.current_url = current_url or settings.WEATHER_CURRENT_URL
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.sleep = sleep
+        self.attempts = 0
+
+    def with_retries(self, func):
+        delays = backoff_delays(self.retries, self.backoff_base, self.backoff_max)
+        while True:
+            self.attempts += 1
+            try:
+                return func()
+            except (requests.RequestException, ValueError, KeyError) as e:
+                delay = next(delays, None)
+                if delay is None:
+                    raise
+                logger.warning("Weather fetch failed (%s), retrying in %.1fs", e, delay)
+                self.sleep(delay)
+
+    def fetch_current(self):
+        response = self.session.get(self.current_url, timeout=self.timeout, params={
+            'q': getattr(settings, 'WEATHER_CITY', 'Moscow'), 'appid': self.fetcher.api_key, 'units': 'metric',
+        })
+        response.raise_for_status()
+        data = response.json()
+        return {
+            'temperature': data['main']['temp'],
+            'humidity': data['main'].get('humidity'),
+            'wind_speed': data.get('wind', {}).get('speed'),
+            'description': data['weather'][0]['description'],
+        }
+
+    def refresh(self, now=None):
+        """Одно обновление: прогноз (+наблюдение) -> WeatherCache, затем очистка старых строк"""
+        from core.models import WeatherCache
+
+        summary = {'forecasts': 0, 'observation': False, 'error': None, 'pruned': 0}
+        if not self.fetcher.api_key:
+            summary['error'] = 'OPENWEATHER_API_KEY is not set'
+            return summary
+
+        observation = None
+        try:
+            result = self.with_retries(self.fetcher.fetch)
+            summary['forecasts'] = result['forecasts']
+            observation = result['observation']
+        except Exception as e:
+            summary['error'] = f"forecast: {e}"
+        if observation is None:
+            try:
+                observation = self.with_retries(self.fetch_current)
+            except Exception as e:
+                summary['error'] = f"{summary['error'] or ''} current: {e}".strip()
+        if observation is not None:
+            WeatherCache.objects.create(**{field: observation[field] for field in SAMPLE_FIELDS})
+            summary['observation'] = True
+        summary['pruned'] = self.prune(now)
+        return summary
+
+    @staticmethod
+    def prune(now=None):
+        """Удалить старые строки WeatherCache и WeatherSample; число удалённых"""
+        from core.models import WeatherCache, WeatherSample
+
+        now = now or timezone.now()
+        deleted = WeatherCache.objects.filter(cached_at__lt=now - timedelta(days=WEATHER_CACHE_KEEP_DAYS)).delete()[0]
+        deleted += WeatherSample.objects.filter(
+            kind='forecast', valid_time__lt=now - timedelta(hours=FORECAST_KEEP_HOURS)).delete()[0]
+        deleted += WeatherSample.objects.filter(
+            kind='observation', valid_time__lt=now - timedelta(days=OBSERVATION_KEEP_DAYS)).delete()[0]
+        return deleted
+
+    def run_forever(self, interval=REFRESH_INTERVAL, stop=None, log=logger.info):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                log(f"Weather refresh: {self.refresh()}")
+            except Exception:
+                logger.exception("Weather refresh failed")
+            stop.wait(interval)
+
+
+@contextmanager
+def refresher_lock(path=None):
+    """Файловая блокировка: обновляет погоду только один процесс из всех воркеров"""
+    path = str(path or settings.WEATHER_REFRESH_LOCK)
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def start_background_refresher(interval=REFRESH_INTERVAL):
+    """Фоновый поток обновления погоды; процесс без блокировки ничего не делает"""
+
+    def run():
+        with refresher_lock() as acquired:
+            if acquired:
+                WeatherRefresher().run_forever(interval)
+
+    thread = threading.Thread(target=run, name='weather-refresher', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from .models import EnergyLog, Recommendation, UserAchievement
+from .services.impact import energy_log_saved, record_applied_recommendations
+from .services.leaderboard import leaderboard
+
+
+@receiver(post_save, sender=EnergyLog)
+def energy_log_created(sender, instance, created, **kwargs):
+    if created:
+        energy_log_saved(instance)
+
+
+@receiver(pre_save, sender=Recommendation)
+def recommendation_applying(sender, instance, **kwargs):
+    instance._newly_applied = instance.is_applied and (
+        instance.pk is None
+        or Recommendation.objects.filter(pk=instance.pk, is_applied=False).exists()
+    )
+
+
+@receiver(post_save, sender=Recommendation)
+def recommendation_saved(sender, instance, **kwargs):
+    if getattr(instance, '_newly_applied', False):
+        record_applied_recommendations([instance])
+
+
+@receiver(post_save, sender=UserAchievement)
+def achievement_earned(sender, instance, created, **kwargs):
+    if created:
+        leaderboard.record([instance])
@@ -1,3 +1,475 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import requests
+from django.contrib.auth.models import User
+from django.db.models import Sum
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import (Building, ChallengeProgress, ChallengeWindow, EnergyChallenge, EnergyLog, ImpactCounter,
+                     Leaderboard, OccupancyLog, PushNotification, Recommendation, Room, UserAchievement, WeatherCache,
+                     WeatherSample)
+from .services.challenges import ChallengeEvaluator
+from .services.http_client import CLOSED, OPEN, CircuitOpenError, OutboundClient, integration_config, reset_clients
+from .services.impact import batched, reconcile
+from .services.leaderboard import ENERGY_KEY, LeaderboardEngine, achievement_energy
+from .services.push import FCMProvider, PushWorker, enqueue
+from .services.recommendations import apply_recommendations
+from .services.reports import ReportService
+from .services.weather import ForecastFetcher, WeatherRefresher, WeatherSeries
+from .utils import RecommendationEngine, WeatherService
+
+
+@contextmanager
+def stub_server(respond):
+    """
+    Локальный HTTP-сервер вместо внешней интеграции.
+    respond(path, query, body) -> (status, dict); возвращает базовый URL.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            status, body = respond(url.path, parse_qs(url.query), json.loads(raw) if raw else None)
+            payload = json.dumps(body).encode()
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # клиент ушёл по таймауту
+
+        do_POST = do_GET
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def one_call_payload(now, hours=6, temperature=-3.0):
+    """Ответ OpenWeather One Call: current + hourly, температура растёт на градус в час"""
+    base = int(now) - int(now) % 3600
+
+    def entry(ts, temp):
+        return {'dt': ts, 'temp': temp, 'humidity': 80, 'wind_speed': 2.0, 'weather': [{'description': 'snow'}]}
+
+    return {'current': entry(int(now), temperature),
+            'hourly': [entry(base + h * 3600, temperature + h) for h in range(hours)]}
+
+
+class RecommendationDedupTests(TestCase):
+    """Повторная генерация рекомендаций не раздувает таблицу"""
+
+    def setUp(self):
+        now = timezone.now()
+        WeatherCache.objects.create(temperature=-5.0, humidity=70, wind_speed=3, description='clear')
+        building = Building.objects.create(name='Main', total_area=1000)
+        for i in range(20):
+            room = Room.objects.create(name=f'Room {i}', building=building, area=20 + i, wall_material='brick',
+                                       heating_status=True)
+            OccupancyLog.objects.create(room=room, start_time=now - timedelta(hours=1),
+                                        end_time=now + timedelta(minutes=90 + i * 7))
+
+    def test_table_size_stays_bounded(self):
+        sizes = []
+        for _ in range(10):
+            RecommendationEngine.generate_recommendations()
+            sizes.append(Recommendation.objects.count())
+        self.assertGreater(sizes[0], 0)
+        self.assertEqual(set(sizes), {sizes[0]})
+
+    def test_applied_are_not_suggested_again(self):
+        recommendations = RecommendationEngine.generate_recommendations()
+        apply_recommendations([r.id for r in recommendations[:5]])
+        RecommendationEngine.generate_recommendations()
+        self.assertEqual(Recommendation.objects.filter(is_applied=False).count(), len(recommendations) - 5)
+        self.assertEqual(Recommendation.objects.count(), len(recommendations))
+
+    def test_expired_are_replaced(self):
+        RecommendationEngine.generate_recommendations()
+        size = Recommendation.objects.count()
+        Recommendation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        RecommendationEngine.generate_recommendations()
+        # Прошедшие удалены, на их место - свежие: размер тот же
+        self.assertEqual(Recommendation.objects.count(), size)
+
+
+class WeatherRefresherTests(TestCase):
+    """Обновление погоды против локальной заглушки OpenWeather: медленной, с ошибками"""
+
+    def setUp(self):
+        self.calls = []
+        self.mode = 'ok'
+        self.sleeps = []
+
+    def tearDown(self):
+        reset_clients()  # размыкатель и пул общего клиента 'weather' - не для следующих тестов
+
+    def respond(self, path, query, body):
+        self.calls.append(path)
+        if self.mode == 'slow':
+            time.sleep(1.0)
+        elif self.mode == 'fail':
+            return 503, {'message': 'upstream unavailable'}
+        elif self.mode == 'flaky' and len(self.calls) == 1:
+            return 500, {'message': 'temporary error'}
+        if path.endswith('/weather'):
+            return 200, {'main': {'temp': 4.0, 'humidity': 60}, 'wind': {'speed': 1.0},
+                         'weather': [{'description': 'clear'}]}
+        return 200, one_call_payload(time.time())
+
+    def refresher(self, url, **kwargs):
+        kwargs.setdefault('timeout', 0.2)
+        return WeatherRefresher(
+            fetcher=ForecastFetcher(url=f"{url}/data/3.0/onecall", api_key='stub', timeout=kwargs['timeout']),
+            current_url=f"{url}/data/2.5/weather", backoff_base=0.01, sleep=self.sleeps.append, **kwargs,
+        )
+
+    def test_refresh_stores_observation_and_forecast(self):
+        with stub_server(self.respond) as url:
+            summary = self.refresher(url).refresh()
+        self.assertIsNone(summary['error'])
+        self.assertTrue(summary['observation'])
+        self.assertEqual(summary['forecasts'], 6)
+        self.assertEqual(WeatherService.get_weather_data().temperature, -3.0)
+
+    def test_timeout_is_retried_then_reported(self):
+        self.mode = 'slow'
+        with stub_server(self.respond) as url, self.assertLogs('core.services.weather', 'WARNING'):
+            refresher = self.refresher(url, retries=2)
+            started = time.perf_counter()
+            summary = refresher.refresh()
+        # Два запроса (прогноз + текущая погода) по две попытки, каждая обрывается по таймауту
+        self.assertEqual(refresher.attempts, 4)
+        self.assertLess(time.perf_counter() - started, 2.0)
+        self.assertFalse(summary['observation'])
+        self.assertIn('forecast', summary['error'])
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_error_status_is_retried_with_backoff(self):
+        self.mode = 'flaky'
+        with stub_server(self.respond) as url, self.assertLogs('core.services.weather', 'WARNING') as logs:
+            refresher = self.refresher(url, retries=3)
+            summary = refresher.refresh()
+        self.assertIn('500', logs.output[0])
+        self.assertEqual(refresher.attempts, 2)
+        self.assertTrue(summary['observation'])
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertTrue(0.005 <= self.sleeps[0] <= 0.01)
+
+    def test_failing_upstream_falls_back_to_cached_observation(self):
+        WeatherCache.objects.create(temperature=-7.5, humidity=70, wind_speed=3.0, description='cached')
+        self.mode = 'fail'
+        with stub_server(self.respond) as url, self.assertLogs('core.services.weather', 'WARNING'):
+            summary = self.refresher(url, retries=3).refresh()
+        self.assertFalse(summary['observation'])
+        self.assertIn('503', summary['error'])
+        self.assertEqual(WeatherCache.objects.count(), 1)
+        self.assertEqual(WeatherService.get_weather_data().temperature, -7.5)
+
+    def test_request_path_never_calls_upstream(self):
+        with stub_server(self.respond):
+            weather = WeatherService.get_weather_data()
+        self.assertEqual(self.calls, [])
+        self.assertEqual(WeatherCache.objects.count(), 0)
+        self.assertIsNone(weather.pk)
+
+    def test_prune_drops_old_rows(self):
+        now = timezone.now()
+        WeatherCache.objects.create(temperature=1.0, description='old')
+        WeatherCache.objects.update(cached_at=now - timedelta(days=120))
+        WeatherCache.objects.create(temperature=2.0, description='fresh')
+        WeatherSample.objects.create(kind='forecast', valid_time=now - timedelta(days=3), temperature=0.0)
+        self.assertEqual(WeatherRefresher.prune(now), 2)
+        self.assertEqual(list(WeatherCache.objects.values_list('description', flat=True)), ['fresh'])
+
+
+class WeatherSeriesTests(TestCase):
+    """Почасовой прогноз одним запросом к заглушке One Call и интерполяция по времени"""
+
+    def setUp(self):
+        self.requests = []
+        self.now = time.time()
+
+    def tearDown(self):
+        reset_clients()
+
+    def respond(self, path, query, body):
+        self.requests.append(query)
+        return 200, one_call_payload(self.now)
+
+    def test_fetch_upserts_forecast(self):
+        with stub_server(self.respond) as url:
+            fetcher = ForecastFetcher(url=f"{url}/onecall", api_key='stub')
+            first = fetcher.fetch()
+            fetcher.fetch()
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.requests[0]['appid'], ['stub'])
+        self.assertEqual(first['forecasts'], 6)
+        # Повторная загрузка обновляет точки по (kind, valid_time), а не добавляет
+        self.assertEqual(WeatherSample.objects.filter(kind='forecast').count(), 6)
+        self.assertEqual(WeatherSample.objects.filter(kind='observation').count(), 1)
+
+    def test_interpolates_many_timestamps_at_once(self):
+        with stub_server(self.respond) as url:
+            ForecastFetcher(url=f"{url}/onecall", api_key='stub').fetch()
+        base = self.now - self.now % 3600
+        start = datetime.fromtimestamp(base, dt_timezone.utc)
+        series = WeatherSeries.load(start, start + timedelta(hours=5))
+        # Получасовые моменты между часовыми точками прогноза (-2, -1, ... °C); первый час
+        # пропускаем - внутри него лежит текущее наблюдение
+        moments = base + 3600 + np.arange(8) * 1800.0
+        np.testing.assert_allclose(series.at(moments), -2.0 + np.arange(8) * 0.5)
+
+    def test_empty_series_uses_fallback(self):
+        series = WeatherSeries([], [], fallback=-4.0)
+        np.testing.assert_array_equal(series.at(np.array([0.0, 1.0, 2.0])), [-4.0, -4.0, -4.0])
+
+
+class OutboundClientTests(TestCase):
+    """Общий HTTP-клиент интеграций: пул keep-alive, метрики, размыкатель - против заглушки"""
+
+    def setUp(self):
+        self.status = 200
+        self.delay = 0.0
+        self.calls = 0
+
+    def respond(self, path, query, body):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.status, {'ok': self.status < 400}
+
+    def outbound(self, **config):
+        return OutboundClient('stub', {**integration_config('stub'), **config})
+
+    def test_connections_are_reused(self):
+        client = self.outbound(pool_maxsize=2)
+        with stub_server(self.respond) as url:
+            for _ in range(20):
+                self.assertEqual(client.get(f"{url}/ping").status_code, 200)
+            pools = client.session.get_adapter(url).poolmanager.pools
+            # 20 последовательных запросов - одно TCP-соединение
+            self.assertEqual([pools[key].num_connections for key in pools.keys()], [1])
+        client.close()
+
+    def test_metrics_count_requests_and_errors(self):
+        client = self.outbound(failure_threshold=100)
+        with stub_server(self.respond) as url:
+            client.get(f"{url}/ok")
+            self.status = 503
+            client.get(f"{url}/down")
+            self.status = 404
+            client.get(f"{url}/missing")
+            self.delay = 0.5
+            with self.assertRaises(requests.Timeout):
+                client.get(f"{url}/slow", timeout=0.1)
+        snapshot = client.metrics.snapshot()
+        self.assertEqual(snapshot['requests'], 4)
+        self.assertEqual(snapshot['errors'], {'http_5xx': 1, 'http_4xx': 1, 'timeout': 1})
+        self.assertEqual(snapshot['latency_buckets']['+Inf'], 4)
+        client.close()
+
+    def test_circuit_opens_and_recovers(self):
+        now = [0.0]
+        client = self.outbound(failure_threshold=3, reset_timeout=30)
+        client.breaker.clock = lambda: now[0]
+        self.status = 500
+        with stub_server(self.respond) as url:
+            for _ in range(3):
+                client.get(f"{url}/down")
+            self.assertEqual(client.breaker.state, OPEN)
+            # Разомкнутая цепь отклоняет запрос без обращения к сети
+            with self.assertRaises(CircuitOpenError):
+                client.get(f"{url}/down")
+            self.assertEqual(self.calls, 3)
+            now[0] = 31.0
+            self.status = 200
+            self.assertEqual(client.get(f"{url}/up").status_code, 200)
+        self.assertEqual(client.breaker.state, CLOSED)
+        self.assertEqual(client.metrics.snapshot()['errors']['circuit_open'], 1)
+        client.close()
+
+
+class PushWorkerTests(TestCase):
+    """Outbox push-уведомлений: воркер шлёт multicast-пакетами на заглушку FCM"""
+
+    def setUp(self):
+        self.batches = []
+        self.seen = {}
+        self.now = timezone.now()
+
+    def tearDown(self):
+        reset_clients()
+
+    def respond(self, path, query, body):
+        self.batches.append(body['registration_ids'])
+        results = []
+        for token in body['registration_ids']:
+            self.seen[token] = self.seen.get(token, 0) + 1
+            if token.startswith('bad-'):
+                results.append({'error': 'NotRegistered'})
+            elif token == 'flaky' and self.seen[token] == 1:
+                results.append({'error': 'Unavailable'})
+            else:
+                results.append({'message_id': f'0:{token}'})
+        return 200, {'results': results}
+
+    def worker(self, url):
+        provider = FCMProvider(url=f"{url}/fcm/send", key='stub', max_batch=10, rate=0)
+        return PushWorker(providers={'fcm': provider}, backoff_base=1.0, backoff_max=1.0, now=lambda: self.now)
+
+    def test_enqueue_deduplicates(self):
+        tokens = [f'dev-{i}' for i in range(5)]
+        enqueue(tokens, 'Room 101 is cold', now=self.now)
+        rows = enqueue(tokens + tokens[:2], 'Room 101 is cold', now=self.now)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(PushNotification.objects.count(), 5)
+
+    def test_worker_batches_retries_and_records_status(self):
+        enqueue([f'dev-{i}' for i in range(25)] + ['bad-1', 'flaky'], 'Heating off tonight', now=self.now)
+        with stub_server(self.respond) as url:
+            worker = self.worker(url)
+            first = dict(worker.run())
+            self.assertEqual([len(batch) for batch in self.batches], [10, 10, 7])
+            self.assertEqual((first['sent'], first['retried'], first['failed']), (25, 1, 1))
+            # Повтор - только после паузы
+            worker.run()
+            self.assertEqual(len(self.batches), 3)
+            self.now += timedelta(seconds=2)
+            worker.run()
+        self.assertEqual(self.batches[-1], ['flaky'])
+        statuses = dict(PushNotification.objects.values_list('device_token', 'status'))
+        self.assertEqual(statuses['bad-1'], PushNotification.FAILED)
+        self.assertEqual(statuses['flaky'], PushNotification.SENT)
+        self.assertEqual(PushNotification.objects.get(device_token='flaky').attempts, 2)
+        self.assertEqual(PushNotification.objects.get(device_token='dev-0').provider_message_id, '0:dev-0')
+
+    def test_stale_sending_rows_are_requeued(self):
+        rows = enqueue(['dev-1', 'dev-2'], 'Crash test', now=self.now)
+        PushNotification.objects.filter(id__in=[r['id'] for r in rows]).update(
+            status=PushNotification.SENDING, claimed_at=self.now - timedelta(minutes=10))
+        with stub_server(self.respond) as url:
+            self.assertEqual(self.worker(url).run()['sent'], 2)
+
+
+class EnergyIntervalTests(TestCase):
+    """Энергия считается по шагу записи лога, а не по числу логов"""
+
+    def setUp(self):
+        building = Building.objects.create(name='Main', total_area=100)
+        self.room = Room.objects.create(name='Office', building=building, area=50, wall_material='brick')
+
+    def write(self, count, interval_hours):
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        with batched():
+            for i in range(count):
+                EnergyLog.objects.create(room=self.room, timestamp=now - timedelta(hours=interval_hours * i),
+                                         temperature_inside=21.0, temperature_outside=-5.0,
+                                         heating_power=2.0, interval_hours=interval_hours)
+
+    @staticmethod
+    def counters():
+        # Логи могут попасть в два месяца (запуск сразу после полуночи 1-го числа) - суммируем
+        return ImpactCounter.objects.aggregate(consumed=Sum('energy_consumed_kwh'), saved=Sum('energy_saved_kwh'),
+                                               logs=Sum('log_count'))
+
+    def test_five_minute_samples_count_as_one_hour(self):
+        # Час записей раз в 5 минут: 2 kW * 1 ч потребления и (5 - 2) kW * 1 ч экономии
+        self.write(12, 5 / 60)
+        totals = self.counters()
+        self.assertAlmostEqual(totals['consumed'], 2.0)
+        self.assertAlmostEqual(totals['saved'], 3.0)
+        self.assertEqual(totals['logs'], 12)
+        self.assertEqual(reconcile(), [])
+        report = ReportService(days=2).build()
+        self.assertAlmostEqual(sum(report['consumed_data']), 2.0)
+        self.assertAlmostEqual(sum(report['energy_data']), 3.0)
+
+    def test_hourly_samples(self):
+        self.write(3, 1.0)
+        self.assertAlmostEqual(self.counters()['consumed'], 6.0)
+
+
+class ChallengeEvaluatorTests(TestCase):
+    """Поздно закоммиченные строки с меньшим id не теряются, kWh не зачитываются дважды"""
+
+    def setUp(self):
+        building = Building.objects.create(name='Main', total_area=100)
+        self.room = Room.objects.create(name='Office', building=building, area=50, wall_material='brick')
+        self.user = User.objects.create(username='student')
+        now = timezone.now()
+        OccupancyLog.objects.create(room=self.room, user=self.user, start_time=now - timedelta(hours=1),
+                                    end_time=now + timedelta(hours=1))
+        self.start, self.end = now - timedelta(days=1), now + timedelta(days=1)
+        for target in (8, 12):
+            EnergyChallenge.objects.create(name=f'Save {target}', description='', target_savings=target,
+                                           duration_days=2, start_date=self.start, end_date=self.end,
+                                           reward_points=10)
+
+    def log(self, **kwargs):
+        # Комната 50 м² без отопления: 5 kWh экономии на часовой лог
+        return EnergyLog.objects.create(room=self.room, temperature_inside=20.0, temperature_outside=-5.0,
+                                        heating_power=0.0, **kwargs).id
+
+    def test_row_committed_below_the_watermark_is_counted(self):
+        first = self.log()
+        ChallengeEvaluator().run()
+        # Строка first + 2 видна раньше first + 1 (транзакция с меньшим id коммитится позже)
+        self.log(id=first + 2)
+        self.assertEqual(ChallengeEvaluator().run()['awarded'], 1)
+        self.log(id=first + 1)
+        self.assertEqual(ChallengeEvaluator().run()['awarded'], 1)
+        self.assertEqual(ChallengeProgress.objects.get().saved_kwh, 15.0)
+        self.assertEqual(ChallengeEvaluator().run()['awarded'], 0)
+        achievements = UserAchievement.objects.order_by('id')
+        self.assertEqual([achievement_energy(a) for a in achievements], [10.0, 5.0])
+
+    def test_load_reads_only_requested_windows(self):
+        self.log()
+        ChallengeEvaluator().run()
+        stale = ChallengeWindow.objects.create(start=self.start - timedelta(days=30), end=self.start)
+        ChallengeProgress.objects.create(window=stale, user=self.user, saved_kwh=100.0)
+        key = int(self.start.timestamp()), int(self.end.timestamp())
+        windows = ChallengeEvaluator().load({key})
+        self.assertEqual(list(windows), [key])
+        self.assertEqual(windows[key].totals, {self.user.id: 5.0})
+
+
+class LeaderboardWindowTests(TestCase):
+    """Строки периода прошлого окна не отдаются: первое чтение в новом окне пересчитывает таблицу"""
+
+    def test_weekly_board_rolls_over_on_read(self):
+        engine = LeaderboardEngine()
+        user = User.objects.create(username='student')
+        # Строки таблиц пишет сигнал post_save
+        UserAchievement.objects.create(user=user, achievement_type='energy_saver', points_earned=50,
+                                       data={ENERGY_KEY: 3.0})
+        self.assertEqual([row.points for row in engine.top('weekly')], [50])
+        self.assertEqual(engine.rank('weekly', user.id), 1)
 
-# Create your tests here.
+        next_week = timezone.now() + timedelta(days=7)
+        self.assertEqual(engine.top('weekly', now=next_week), [])
+        self.assertIsNone(engine.rank('weekly', user.id, now=next_week))
+        self.assertFalse(Leaderboard.objects.filter(period='weekly').exists())
+        self.assertEqual(engine.rank('all_time', user.id, now=next_week), 1)
@@ -1,8 +1,6 @@
 import math
 from datetime import timedelta
 from django.utils import timezone
-import requests
-from django.conf import settings
 
 
 class ThermalCalculator:
@@ -46,69 +44,54 @@ class ThermalCalculator:
 class WeatherService:
     @staticmethod
     def get_weather_data():
+        """
+        Последнее сохранённое наблюдение - без сетевых запросов. Обновляет
+        погоду WeatherRefresher (manage.py refresh_weather или фоновый поток);
+        устаревшее наблюдение лучше, чем ожидание внешнего API в запросе.
+        """
         from .models import WeatherCache
 
         latest_weather = WeatherCache.objects.first()
-        if latest_weather and not latest_weather.is_expired():
+        if latest_weather:
             return latest_weather
-
-        try:
-            api_key = getattr(settings, 'OPENWEATHER_API_KEY', '')
-            city = getattr(settings, 'WEATHER_CITY', 'Moscow')
-
-            if api_key:
-                url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-                response = requests.get(url, timeout=10)
-                data = response.json()
-
-                weather = WeatherCache.objects.create(
-                    temperature=data['main']['temp'],
-                    humidity=data['main']['humidity'],
-                    wind_speed=data['wind']['speed'],
-                    description=data['weather'][0]['description']
-                )
-                return weather
-            else:
-                return WeatherService._get_demo_weather()
-
-        except Exception as e:
-            print(f"Weather API error: {e}")
-            return WeatherService._get_demo_weather()
+        return WeatherService._get_demo_weather()
 
     @staticmethod
     def _get_demo_weather():
-        from .models import WeatherCache
+        from .services.weather import demo_weather
 
-        weather = WeatherCache.objects.create(
-            temperature=-5.0,
-            humidity=75,
-            wind_speed=3.0,
-            description="Cloudy"
-        )
-        return weather
+        return demo_weather()
 
 
 class RecommendationEngine:
     @staticmethod
     def generate_recommendations():
+        """
+        Рекомендации выключить отопление в комнатах, которые скоро освободятся.
+        Повторный вызов не создаёт дублей: строки сопоставляются по отпечатку
+        (комната, действие, окно времени освобождения) и обновляются, прошедшие - удаляются.
+        """
         from .models import Room, OccupancyLog, Recommendation
         from .utils import WeatherService, ThermalCalculator
+        from .services.recommendations import expire_recommendations, fingerprint, upsert_recommendations
 
-        recommendations = []
+        now = timezone.now()
+        expire_recommendations(now)
+        candidates = []
         weather = WeatherService.get_weather_data()
         rooms = Room.objects.all()
 
         for room in rooms:
             active_occupancies = room.occupancy_logs.filter(
                 is_active=True,
-                end_time__gte=timezone.now()
+                end_time__gte=now
             ).order_by('end_time')
 
             if not active_occupancies.exists():
                 continue
 
             next_end = active_occupancies.first().end_time
-            time_to_end = (next_end - timezone.now()).total_seconds() / 60
+            time_to_end = (next_end - now).total_seconds() / 60
             current_temp = room.target_temperature if room.heating_status else room.comfort_temperature
 
             cooldown_time = ThermalCalculator.calculate_cooldown_time(
@@ -121,14 +104,16 @@ class RecommendationEngine:
                     room, hours_saved, weather.temperature
                 )
 
-                recommendation = Recommendation.objects.create(
+                action = "Turn off heating now"
+                candidates.append(Recommendation(
                     room=room,
                     message=f"Room {room.name} will be free in {time_to_end:.0f} min. "
                             f"Heat will last for {cooldown_time:.0f} more min.",
-                    recommended_action="Turn off heating now",
+                    recommended_action=action,
                     estimated_savings=savings['energy_saved_kwh'],
-                    priority='high'
-                )
-                recommendations.append(recommendation)
+                    priority=Recommendation.HIGH,
+                    fingerprint=fingerprint(room.id, action, next_end),
+                    expires_at=next_end,
+                ))
 
-        return recommendations
\ No newline at end of file
+        return upsert_recommendations(candidates)
@@ -1,8 +1,13 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from .models import Room, OccupancyLog
 from .utils import WeatherService, ThermalCalculator
+from .services.heating_control import set_heating
+from .middleware import render_prometheus
 
 
 
@@ -82,8 +87,7 @@ def room_detail(request, pk):
 
 def toggle_heating(request, pk):
     room = get_object_or_404(Room, pk=pk)
-    room.heating_status = not room.heating_status
-    room.save()
+    set_heating(Room.objects.filter(pk=room.pk), not room.heating_status)
 
     return room_detail(request, pk)
 
@@ -97,4 +101,15 @@ def generate_recommendations(request):
         'recommendations': recommendations,
     }
 
-    return render(request, 'core/recommendations.html', context)
\ No newline at end of file
+    return render(request, 'core/recommendations.html', context)
+
+
+def metrics(request):
+    """Метрики процесса для Prometheus: только с Authorization: Bearer METRICS_TOKEN, без токена - лишь при DEBUG"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -6,4 +6,9 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('reports/', views.reports, name='reports'),
     path('thermal/', views.thermal_visualization, name='thermal_viz'),
+    path('thermal/data/', views.thermal_data, name='thermal_data'),
+    path('thermal/tiles/<int:floor>/', views.thermal_tile, name='thermal_tile'),
+    path('predictions/', views.predictions, name='predictions'),
+    path('analytics/', views.energy_analytics, name='energy_analytics'),
+    path('impact/', views.impact, name='impact'),
 ]
\ No newline at end of file
@@ -1,42 +1,42 @@
 from django.shortcuts import render
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import BadRequest
 from django.utils import timezone
 from datetime import timedelta
-from core.models import Room, OccupancyLog, WeatherCache, Recommendation
+from core.models import Building, Room, OccupancyLog, WeatherCache, Recommendation, Leaderboard
 from core.utils import WeatherService, RecommendationEngine
+from core.services.energy_forecast import EnergyForecaster
+from core.services.reports import ReportService, PERIODS
+from core.services.analytics import EnergyAnalytics
+from core.services.thermal_map import HeatmapTile, ThermalMapService
+from core.services.impact import ImpactService
+from core.services.leaderboard import leaderboard
 
 
 
 
+def building_param(request):
+    """?building= - id существующего здания или None; не число - 400, нет такого - 404"""
+    building = request.GET.get('building') or None
+    if building is None:
+        return None
+    try:
+        building = int(building)
+    except ValueError:
+        raise BadRequest("building must be an integer id")
+    if not Building.objects.filter(pk=building).exists():
+        raise Http404("Building not found")
+    return building
+
+
 def reports(request):
-    # Sample data for charts
-    labels = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-    energy_data = [12, 19, 8, 15, 22, 18, 24]
-    co2_data = [4.8, 7.6, 3.2, 6.0, 8.8, 7.2, 9.6]
-
-    # Sample top rooms
-    top_rooms = [
-        {'name': 'Room 101', 'area': 50, 'savings': 45.2, 'percent_saved': 25},
-        {'name': 'Conference Hall', 'area': 120, 'savings': 38.7, 'percent_saved': 22},
-        {'name': 'Lab 301', 'area': 60, 'savings': 32.5, 'percent_saved': 20},
-        {'name': 'Office 205', 'area': 35, 'savings': 28.3, 'percent_saved': 18},
-    ]
+    period = request.GET.get('period', 'week')
+    days = PERIODS.get(period, 7)
+    building = building_param(request)
 
-    context = {
-        'labels': labels,
-        'energy_data': energy_data,
-        'co2_data': co2_data,
-        'total_energy': sum(energy_data),
-        'total_co2': sum(co2_data),
-        'total_cost_savings': sum(energy_data) * 5.0,
-        'period_start': (timezone.now() - timedelta(days=7)).date(),
-        'period_end': timezone.now().date(),
-        'rooms_optimized': len(top_rooms),
-        'optimization_rate': 75.5,
-        'top_rooms': top_rooms,
-        'car_equivalent': sum(co2_data) / 8.9,  # kg CO2 per liter of gasoline
-        'tree_equivalent': sum(co2_data) / 21.8,  # kg CO2 absorbed per tree per year
-    }
+    context = ReportService(days=days, building=building).build()
+    context['period'] = period
 
     return render(request, 'dashboard/reports.html', context)
 
@@ -44,123 +44,93 @@ def reports(request):
 
 def energy_analytics(request):
     """Расширенная аналитика энергопотребления"""
-
-    # Реальные расчеты вместо демо данных
-    rooms = Room.objects.all()
-    week_ago = timezone.now() - timedelta(days=7)
-
-    # Собираем реальные данные
-    analytics_data = {
-        'total_energy_consumed': 0,
-        'total_energy_saved': 0,
-        'peak_consumption_hours': [],
-        'room_efficiency_scores': [],
-        'trends': []
-    }
-
-    for room in rooms:
-        # Расчет потребления
-        energy_data = calculate_room_energy(room)
-        analytics_data['total_energy_consumed'] += energy_data['consumed']
-        analytics_data['total_energy_saved'] += energy_data['saved']
-
-        # Расчет эффективности
-        efficiency_score = calculate_efficiency_score(room)
-        analytics_data['room_efficiency_scores'].append({
-            'room': room.name,
-            'score': efficiency_score,
-            'savings_potential': calculate_savings_potential(room)
-        })
-
-    # Выявление трендов
-    analytics_data['trends'] = identify_energy_trends()
-
-    # Рекомендации на основе аналитики
-    analytics_data['recommendations'] = generate_analytics_recommendations(analytics_data)
+    analytics = EnergyAnalytics(days=7)
 
     context = {
-        'analytics': analytics_data,
-        'period_start': week_ago,
-        'period_end': timezone.now(),
+        'analytics': analytics.build(),
+        'period_start': analytics.since,
+        'period_end': analytics.now,
         'comparison_period': 'previous week'
     }
 
     return render(request, 'dashboard/analytics.html', context)
 
 
-def calculate_room_energy(room):
-    """Расчет энергии для комнаты"""
-    # Реальные расчеты
-    heating_hours = room.occupancy_logs.filter(
-        is_active=True,
-        end_time__gte=timezone.now() - timedelta(days=7)
-    ).aggregate(
-        total_hours=Sum(F('end_time') - F('start_time'))
-    )['total_hours'] or 0
-
-    # Конвертация в часы
-    if isinstance(heating_hours, timedelta):
-        heating_hours = heating_hours.total_seconds() / 3600
-
-    # Потребление (кВт·ч)
-    power_kw = room.area * 0.1  # 100 Вт/м²
-    energy_consumed = power_kw * heating_hours
-
-    # Потенциальная экономия
-    # (если бы нагревали по расписанию, а не по occupancy)
-    scheduled_hours = 10 * 5  # 10 часов в день, 5 дней
-    potential_consumption = power_kw * scheduled_hours
-    energy_saved = max(0, potential_consumption - energy_consumed)
-
-    return {
-        'consumed': energy_consumed,
-        'saved': energy_saved,
-        'efficiency': (energy_saved / potential_consumption * 100) if potential_consumption > 0 else 0
-    }
+def impact(request):
+    """Экологический эффект - из накопительных счётчиков ImpactCounter"""
+    building = building_param(request)
+    context = dict(ImpactService(building).build(), building=building)
+    return render(request, 'dashboard/impact.html', context)
 
 
 def thermal_visualization(request):
     """3D тепловая визуализация здания"""
-    rooms = Room.objects.all()
-
-    # Группируем комнаты по этажам
-    floors = {}
-    for room in rooms:
-        # Простая логика: если в названии есть 1xx - первый этаж, 2xx - второй
-        floor_num = '1'
-        if any(str(i) in room.name for i in ['2', '20', '20']):
-            floor_num = '2'
-        elif any(str(i) in room.name for i in ['3', '30', '30']):
-            floor_num = '3'
-
-        if floor_num not in floors:
-            floors[floor_num] = []
-
-        # Определяем статус комнаты
-        if room.heating_status and room.target_temperature > 21:
-            status = 'hot'
-        elif not room.heating_status and room.target_temperature <= 18:
-            status = 'cold'
-        else:
-            status = 'optimal'
-
-        floors[floor_num].append({
-            'room': room,
-            'status': status,
-            'temperature': room.target_temperature if room.heating_status else room.comfort_temperature
-        })
+    building = building_param(request)
+    thermal_map = ThermalMapService(building).summary()
 
     context = {
-        'floors': floors,
-        'total_rooms': rooms.count(),
-        'hot_rooms': rooms.filter(heating_status=True, target_temperature__gt=21).count(),
-        'optimal_rooms': rooms.filter(heating_status=True, target_temperature__range=(19, 21)).count(),
-        'cold_rooms': rooms.filter(heating_status=False).count(),
+        'floors': thermal_map['floors'],
+        'map_version': thermal_map['version'],
+        'building': building,
+        'total_rooms': thermal_map['total_rooms'],
+        'hot_rooms': thermal_map['totals']['hot'],
+        'optimal_rooms': thermal_map['totals']['optimal'],
+        'cold_rooms': thermal_map['totals']['cold'],
     }
 
     return render(request, 'dashboard/thermal_viz.html', context)
 
 
+def thermal_data(request):
+    """JSON тепловой карты (целиком или один этаж); ETag = версия карты здания"""
+    floor = request.GET.get('floor')
+    if floor is not None:
+        try:
+            floor = int(floor)
+        except ValueError:
+            raise BadRequest("floor must be an integer")
+
+    service = ThermalMapService(building_param(request))
+    etag = f'"thermal-{service.building or "all"}-{service.version()}-{"" if floor is None else floor}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified()
+
+    if floor is not None:
+        data = service.floor(floor)
+        if data is None:
+            raise Http404("Floor not found")
+    else:
+        data = service.payload()
+
+    response = JsonResponse(data)
+    response['ETag'] = etag
+    return response
+
+
+def thermal_tile(request, floor):
+    """Бинарная сетка температур/статусов этажа для тепловой карты (см. HeatmapTile)"""
+    tile = HeatmapTile(building_param(request), floor)
+    version, data = tile.payload()
+    etag = f'"tile-{tile.building or "all"}-{floor}-{version}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified()
+
+    response = HttpResponse(data, content_type='application/octet-stream')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def predictions(request):
+    """Прогноз потребления на завтра и на неделю"""
+    rooms = Room.objects.all()
+    weather = WeatherService.get_weather_data()
+
+    context = EnergyForecaster().predictions(rooms, weather)
+
+    return render(request, 'dashboard/predictions.html', context)
+
+
 
 def dashboard(request):
     rooms = Room.objects.all()
@@ -168,16 +138,21 @@ def dashboard(request):
 
     # Gamification data
     leaders = [
-        {'name': 'Physics Department', 'points': 2540, 'savings': 45.2, 'description': 'Best optimization rate'},
-        {'name': 'Computer Science', 'points': 1980, 'savings': 38.7, 'description': 'Most consistent savings'},
-        {'name': 'Mathematics', 'points': 1750, 'savings': 32.5, 'description': 'Perfect schedule adherence'},
-        {'name': 'Chemistry', 'points': 1420, 'savings': 28.3, 'description': 'Great weekend optimization'},
-        {'name': 'Biology', 'points': 1150, 'savings': 22.1, 'description': 'Improving rapidly'},
+        {
+            'name': row.user.get_full_name() or row.user.username,
+            'points': row.points,
+            'savings': round(row.energy_saved, 1),
+            'description': f"{row.co2_reduced:.1f} kg CO₂ reduced this week",
+        }
+        for row in leaderboard.top('weekly', 5)
     ]
 
-    # Calculate user points (simulated for demo)
-    import random
-    user_points = random.randint(800, 1500)
+    user_points = 0
+    user_rank = None
+    if request.user.is_authenticated:
+        entry = Leaderboard.objects.filter(period='all_time', user=request.user).values_list('points', 'rank').first()
+        if entry:
+            user_points, user_rank = entry
     user_level = min(5, user_points // 300 + 1)
 
     # Calculate statistics
@@ -217,6 +192,8 @@ def dashboard(request):
         'user_points': user_points,  # NEW
         'user_level': user_level,  # NEW
         'next_level_points': user_level * 300,  # NEW
+        'level_progress': round(user_points % 300 / 3),
+        'user_rank': user_rank,
     }
 
     return render(request, 'dashboard/dashboard.html', context)
\ No newline at end of file
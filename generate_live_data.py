@@ -8,8 +8,10 @@ import time
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'thermasense_project.settings')
 django.setup()
 
+from django.db import transaction
 from django.utils import timezone
 from core.models import Room, EnergyLog, WeatherCache
+from core.services.impact import batched
 
 
 class LiveDataGenerator:
@@ -43,8 +45,8 @@ class LiveDataGenerator:
         else:
             return random.random() > 0.7  # 30% chance
 
-    def generate_hourly_data(self):
-        """Генерация данных за час"""
+    def generate_hourly_data(self, interval_hours=1.0):
+        """Генерация данных за такт; interval_hours - шаг записи, часть часа, которую представляет лог"""
         now = timezone.now()
         hour = now.hour
 
@@ -61,33 +63,36 @@ class LiveDataGenerator:
         )
 
 
-        for room in self.rooms:
-            is_occupied = self.simulate_occupancy_pattern(room, hour)
+        # Логи тика - одной транзакцией, счётчики impact - одним пакетом на тик
+        with transaction.atomic(), batched():
+            for room in self.rooms:
+                is_occupied = self.simulate_occupancy_pattern(room, hour)
 
-            if is_occupied and not room.heating_status:
-                room.heating_status = True
-                room.save()
-            elif not is_occupied and room.heating_status:
-                if random.random() > 0.3:
-                    room.heating_status = False
+                if is_occupied and not room.heating_status:
+                    room.heating_status = True
                     room.save()
-
-
-            if room.heating_status:
-                temp_inside = room.target_temperature
-                heating_power = room.area * 0.1 * random.uniform(0.8, 1.2)
-            else:
-                temp_inside = max(room.comfort_temperature, current_temp + 5)
-                heating_power = 0
-
-            EnergyLog.objects.create(
-                room=room,
-                timestamp=now,
-                temperature_inside=temp_inside,
-                temperature_outside=current_temp,
-                heating_power=heating_power,
-                co2_saved=0 if room.heating_status else heating_power * 0.4
-            )
+                elif not is_occupied and room.heating_status:
+                    if random.random() > 0.3:
+                        room.heating_status = False
+                        room.save()
+
+
+                if room.heating_status:
+                    temp_inside = room.target_temperature
+                    heating_power = room.area * 0.1 * random.uniform(0.8, 1.2)
+                else:
+                    temp_inside = max(room.comfort_temperature, current_temp + 5)
+                    heating_power = 0
+
+                EnergyLog.objects.create(
+                    room=room,
+                    timestamp=now,
+                    temperature_inside=temp_inside,
+                    temperature_outside=current_temp,
+                    heating_power=heating_power,
+                    co2_saved=0 if room.heating_status else heating_power * 0.4,
+                    interval_hours=interval_hours,
+                )
 
         print(f"[{now.strftime('%Y-%m-%d %H:%M')}] Generated data: {current_temp}°C, {len(self.rooms)} rooms")
 
@@ -112,7 +117,7 @@ class LiveDataGenerator:
 
         try:
             while True:
-                self.generate_hourly_data()
+                self.generate_hourly_data(interval_hours=interval_minutes / 60)
                 time.sleep(interval_minutes * 60)  # Конвертируем минуты в секунды
         except KeyboardInterrupt:
             print("\n🛑 Live data generation stopped")
@@ -7,9 +7,11 @@ from datetime import timedelta
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'thermasense_project.settings')
 django.setup()
 
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
 from core.models import Building, Room, OccupancyLog, WeatherCache, EnergyLog, Recommendation
+from core.services.impact import batched
 
 
 def create_demo_data():
@@ -121,19 +123,21 @@ def create_demo_data():
 
     # Создаем энергетические логи
     print("\n⚡ Creating energy consumption data...")
-    for room in rooms:
-        for hour in range(24):
-            timestamp = now - timedelta(hours=hour)
-            heating_power = room.area * 0.1 if room.heating_status else 0
-
-            EnergyLog.objects.create(
-                room=room,
-                timestamp=timestamp,
-                temperature_inside=room.target_temperature if room.heating_status else 18.0,
-                temperature_outside=weather.temperature + random.uniform(-2, 2),
-                heating_power=heating_power * random.uniform(0.8, 1.2),
-                co2_saved=0 if room.heating_status else heating_power * 0.4
-            )
+    with transaction.atomic(), batched():  # счётчики impact - одним пакетом
+        for room in rooms:
+            for hour in range(24):
+                timestamp = now - timedelta(hours=hour)
+                heating_power = room.area * 0.1 if room.heating_status else 0
+
+                EnergyLog.objects.create(
+                    room=room,
+                    timestamp=timestamp,
+                    temperature_inside=room.target_temperature if room.heating_status else 18.0,
+                    temperature_outside=weather.temperature + random.uniform(-2, 2),
+                    heating_power=heating_power * random.uniform(0.8, 1.2),
+                    co2_saved=0 if room.heating_status else heating_power * 0.4,
+                    interval_hours=1.0,  # по логу на час
+                )
 
     print(f"  ✓ Created 24h energy logs for {len(rooms)} rooms")
 
@@ -178,7 +182,7 @@ def create_demo_data():
             message=rec_data['message'],
             recommended_action=rec_data['action'],
             estimated_savings=rec_data['savings'],
-            priority=rec_data['priority'],
+            priority=Recommendation.PRIORITY_BY_NAME[rec_data['priority']],
             is_applied=False
         )
 
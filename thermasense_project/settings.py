@@ -23,6 +23,7 @@ INSTALLED_APPS = [
 
     # Third party
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
 
     # Local
@@ -32,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',  # первым: время ответа включает остальные middleware
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -108,15 +110,50 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Колоночный архив EnergyLog (manage.py archive_energy_logs)
+ENERGY_ARCHIVE_DIR = BASE_DIR / 'archive' / 'energy_logs'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# API: читать может любой, изменять - только вошедший пользователь (сессия + CSRF)
 REST_FRAMEWORK = {
-    'DEFAULT_PERMISSION_CLASSES': [],
-    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticatedOrReadOnly'],
+    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.SessionAuthentication'],
 }
 
 OPENWEATHER_API_KEY = os.environ.get('OPENWEATHER_API_KEY', '')
 WEATHER_CITY = 'Moscow'
+WEATHER_LATITUDE = 55.7558
+WEATHER_LONGITUDE = 37.6173
+WEATHER_FORECAST_URL = os.environ.get('WEATHER_FORECAST_URL', 'https://api.openweathermap.org/data/3.0/onecall')
+WEATHER_CURRENT_URL = os.environ.get('WEATHER_CURRENT_URL', 'https://api.openweathermap.org/data/2.5/weather')
+# Погоду обновляет только WeatherRefresher: manage.py refresh_weather --loop
+# или фоновый поток в веб-процессе (один на все воркеры - по файловой блокировке)
+WEATHER_BACKGROUND_REFRESH = os.environ.get('WEATHER_BACKGROUND_REFRESH', 'False') == 'True'
+WEATHER_REFRESH_INTERVAL = int(os.environ.get('WEATHER_REFRESH_INTERVAL', '600'))
+WEATHER_REFRESH_LOCK = BASE_DIR / 'run' / 'weather_refresher.lock'
+
+# Исходящие HTTP-интеграции (core/services/http_client.py): пул, таймауты, размыкатель
+OUTBOUND_HTTP = {
+    'default': {'timeout': (3.05, 10), 'pool_maxsize': 10, 'failure_threshold': 5, 'reset_timeout': 30},
+    'weather': {'pool_maxsize': 2},
+    'push': {'pool_maxsize': 8},
+}
+
+# Профилирование запросов (core.middleware.PerformanceMiddleware): Server-Timing, /metrics, лог медленных
+PERF_SLOW_REQUEST_MS = int(os.environ.get('PERF_SLOW_REQUEST_MS', '500'))
+# /metrics отдаётся только с Authorization: Bearer <METRICS_TOKEN>; без токена - только при DEBUG
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Push-уведомления: API кладёт в outbox, отправляет manage.py send_push_notifications
+PUSH_PROVIDERS = {
+    'fcm': {
+        'url': os.environ.get('PUSH_FCM_URL', 'https://fcm.googleapis.com/fcm/send'),
+        'key': os.environ.get('PUSH_FCM_SERVER_KEY', ''),
+        'max_batch': 500,  # токенов в одном multicast-запросе
+        'rate': 1000,  # сообщений в секунду
+    },
+}
 
 LOGIN_URL = '/admin/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import metrics
 from dashboard.views import dashboard
 
 urlpatterns = [
@@ -11,4 +12,6 @@ urlpatterns = [
     path('', dashboard, name='dashboard'),
     path('dashboard/', include('dashboard.urls')),
     path('core/', include('core.urls')),
+    path('api/', include('api.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
\ No newline at end of file